@@ -2,9 +2,11 @@ from . import encoder
 from . import decoder
 
 
-def decode(tile, y_coord_down=False):
+def decode(tile, y_coord_down=False, geometry_format=decoder.GEOMETRY_NESTED,
+           layer_filter=None):
     vector_tile = decoder.TileData()
-    message = vector_tile.getMessage(tile, y_coord_down)
+    message = vector_tile.getMessage(tile, y_coord_down, geometry_format,
+                                     layer_filter)
     return message
 
 
@@ -1,11 +1,22 @@
 from .Mapbox import vector_tile_pb2 as vector_tile
+from array import array
+from itertools import accumulate
+from operator import mul, sub
 import sys
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 if sys.version_info[0] < 3:
     range = xrange
+else:
+    from sys import intern
 
 
 cmd_bits = 3
+cmd_mask = (1 << cmd_bits) - 1
 
 CMD_MOVE_TO = 1
 CMD_LINE_TO = 2
@@ -16,6 +27,21 @@ POINT = 1
 LINESTRING = 2
 POLYGON = 3
 
+WIRE_TYPE_VARINT = 0
+WIRE_TYPE_FIXED64 = 1
+WIRE_TYPE_LENGTH = 2
+WIRE_TYPE_FIXED32 = 5
+
+TILE_LAYERS_FIELD = 3
+LAYER_NAME_FIELD = 1
+
+GEOMETRY_NESTED = 'nested'
+GEOMETRY_FLAT = 'flat'
+GEOMETRY_NUMPY = 'numpy'
+
+# below this number of points the numpy setup costs more than it saves
+_numpy_min_points = 512
+
 
 class TileData:
     """
@@ -24,33 +50,43 @@ class TileData:
     def __init__(self):
         self.tile = vector_tile.tile()
 
-    def getMessage(self, pbf_data, y_coord_down=False):
-        self.tile.ParseFromString(pbf_data)
+    def getMessage(self, pbf_data, y_coord_down=False,
+                   geometry_format=GEOMETRY_NESTED, layer_filter=None):
+        if geometry_format == GEOMETRY_NUMPY and np is None:
+            raise ImportError('numpy is required for geometry_format=numpy')
+        if layer_filter is None:
+            self.tile.ParseFromString(pbf_data)
+            layers = self.tile.layers
+        else:
+            layers = self.parse_layers(pbf_data, layer_filter)
 
         tile = {}
-        for layer in self.tile.layers:
-            keys = layer.keys
-            vals = layer.values
+        for layer in layers:
+            # keys and values are decoded once per layer, the features only
+            # reference them by index
+            keys = [intern(key) for key in layer.keys]
+            vals = self.parse_values(layer.values)
 
             features = []
             for feature in layer.features:
                 tags = feature.tags
-                props = {}
                 assert len(tags) % 2 == 0, 'Unexpected number of tags'
-                for key_idx, val_idx in zip(tags[::2], tags[1::2]):
-                    key = keys[key_idx]
-                    val = vals[val_idx]
-                    value = self.parse_value(val)
-                    props[key] = value
-
-                geometry = self.parse_geometry(feature.geometry, feature.type,
-                                               layer.extent, y_coord_down)
+                props = {keys[key_idx]: vals[val_idx]
+                         for key_idx, val_idx in zip(tags[::2], tags[1::2])}
+
                 new_feature = {
-                    "geometry": geometry,
                     "properties": props,
                     "id": feature.id,
                     "type": feature.type
                 }
+                if geometry_format == GEOMETRY_NESTED:
+                    new_feature["geometry"] = self.parse_geometry(
+                        feature.geometry, feature.type, layer.extent,
+                        y_coord_down)
+                else:
+                    new_feature.update(self.parse_geometry_flat(
+                        feature.geometry, feature.type, layer.extent,
+                        y_coord_down, geometry_format == GEOMETRY_NUMPY))
                 features.append(new_feature)
 
             tile[layer.name] = {
@@ -60,8 +96,31 @@ class TileData:
             }
         return tile
 
-    def zero_pad(self, val):
-        return '0' + val if val[0] == 'b' else val
+    def parse_layers(self, pbf_data, layer_filter):
+        """
+        Parses only the layers named in layer_filter. The other layer
+        messages are skipped without decoding their features, keys or values.
+        """
+        layers = []
+        for name, layer_data in iter_layers(pbf_data):
+            if name in layer_filter:
+                layer = vector_tile.tile.layer()
+                layer.ParseFromString(layer_data)
+                layers.append(layer)
+        return layers
+
+    def parse_values(self, values):
+        """
+        Decodes the value table of a layer into a list of Python values.
+        """
+        parsed = []
+        for val in values:
+            fields = val.ListFields()
+            if len(fields) == 1:
+                parsed.append(fields[0][1])
+            else:
+                parsed.append(self.parse_value(val))
+        return parsed
 
     def parse_value(self, val):
         for candidate in ('bool_value',
@@ -80,108 +139,266 @@ class TileData:
 
     def parse_geometry(self, geom, ftype, extent, y_coord_down):
         # [9 0 8192 26 0 10 2 0 0 2 15]
-        i = 0
-        coords = []
-        dx = 0
-        dy = 0
-        parts = []  # for multi linestrings and polygons
-
-        while i != len(geom):
-            item = bin(geom[i])
-            ilen = len(item)
-            cmd = int(self.zero_pad(item[(ilen - cmd_bits):ilen]), 2)
-            cmd_len = int(self.zero_pad(item[:ilen - cmd_bits]), 2)
-
-            i = i + 1
-
-            def _ensure_polygon_closed(coords):
-                if coords and coords[0] != coords[-1]:
-                    coords.append(coords[0])
-
-            if cmd == CMD_SEG_END:
-                if ftype == POLYGON:
-                    _ensure_polygon_closed(coords)
-                parts.append(coords)
-                coords = []
-
-            elif cmd == CMD_MOVE_TO or cmd == CMD_LINE_TO:
-
-                if coords and cmd == CMD_MOVE_TO:
-                    if ftype in (LINESTRING, POLYGON):
-                        # multi line string or polygon
-                        # our encoder includes CMD_SEG_END to denote
-                        # the end of a polygon ring, but this path
-                        # would also handle the case where we receive
-                        # a move without a previous close on polygons
-
-                        # for polygons, we want to ensure that it is
-                        # closed
-                        if ftype == POLYGON:
-                            _ensure_polygon_closed(coords)
-                        parts.append(coords)
-                        coords = []
-
-                for point in range(0, cmd_len):
-                    x = geom[i]
-                    i = i + 1
-
-                    y = geom[i]
-                    i = i + 1
-
-                    # zipzag decode
-                    x = self.zig_zag_decode(x)
-                    y = self.zig_zag_decode(y)
-
-                    x = x + dx
-                    y = y + dy
-
-                    dx = x
-                    dy = y
-
-                    if not y_coord_down:
-                        y = extent - y
-
-                    coords.append([x, y])
+        coords, offsets = _decode_values(geom, ftype, extent, y_coord_down)
 
         if ftype == POINT:
-            return coords
+            return _points(coords, 0, len(coords) >> 1)
         elif ftype == LINESTRING:
-            if parts:
-                if coords:
-                    parts.append(coords)
-                return parts[0] if len(parts) == 1 else parts
-            else:
-                return coords
+            parts = [_points(coords, offsets[n], offsets[n + 1])
+                     for n in range(len(offsets) - 1)]
+            if not parts:
+                return []
+            return parts[0] if len(parts) == 1 else parts
         elif ftype == POLYGON:
-            if coords:
-                parts.append(coords)
-
-            def _area_sign(ring):
-                a = sum(ring[i][0]*ring[i+1][1] - ring[i+1][0]*ring[i][1] for i in range(0, len(ring)-1))  # noqa
-                return -1 if a < 0 else 1 if a > 0 else 0
-
-            polygon = []
-            polygons = []
-            winding = 0
-
-            for ring in parts:
-                a = _area_sign(ring)
-                if a == 0:
-                    continue
-                if winding == 0:
-                    winding = a
-
-                if winding == a:
-                    if polygon:
-                        polygons.append(polygon)
-                    polygon = [ring]
-                else:
-                    polygon.append(ring)
+            polygons = [
+                [_points(coords, offsets[r], offsets[r + 1]) for r in rings]
+                for rings in group_polygon_rings(coords, offsets)]
+            return polygons[0] if len(polygons) == 1 else polygons
+        else:
+            raise ValueError('Unknown geometry type: %s' % ftype)
 
-            if polygon:
-                polygons.append(polygon)
+    def parse_geometry_flat(self, geom, ftype, extent, y_coord_down,
+                            as_numpy=False):
+        """
+        Returns the geometry as flat buffers instead of nested lists:
+         * geometry: interleaved x/y values
+         * ring_offsets: the point index at which each part starts, followed
+           by the total number of points
+         * polygon_offsets (polygons only): the ring index at which each
+           polygon starts, followed by the total number of rings.
+           Rings with an area of zero are dropped, like parse_geometry does.
+        """
+        if ftype not in (POINT, LINESTRING, POLYGON):
+            raise ValueError('Unknown geometry type: %s' % ftype)
+        coords, offsets = decode_geometry(geom, ftype, extent, y_coord_down)
+        result = {}
+        if ftype == POLYGON:
+            coords, offsets, polygon_offsets = _compact_polygons(
+                coords, offsets)
+            result["polygon_offsets"] = polygon_offsets
+        result["geometry"] = coords
+        result["ring_offsets"] = offsets
+        if as_numpy:
+            for name, values in result.items():
+                result[name] = np.frombuffer(values, dtype=np.int32)
+        return result
+
+
+def iter_layers(pbf_data):
+    """
+    Yields the name and the serialized message of each layer of a tile,
+    reading only the wire format of the tile and the layer fields.
+    """
+    data = memoryview(pbf_data)
+    pos = 0
+    end = len(data)
+    while pos < end:
+        field_number, wire_type, pos = _read_key(data, pos)
+        if field_number == TILE_LAYERS_FIELD and wire_type == WIRE_TYPE_LENGTH:
+            length, pos = _read_varint(data, pos)
+            layer_data = data[pos:pos + length]
+            pos += length
+            yield _read_layer_name(layer_data), layer_data.tobytes()
+        else:
+            pos = _skip_field(data, pos, wire_type)
+
+
+def _read_layer_name(layer_data):
+    pos = 0
+    end = len(layer_data)
+    while pos < end:
+        field_number, wire_type, pos = _read_key(layer_data, pos)
+        if field_number == LAYER_NAME_FIELD and wire_type == WIRE_TYPE_LENGTH:
+            length, pos = _read_varint(layer_data, pos)
+            return layer_data[pos:pos + length].tobytes().decode('utf-8')
+        pos = _skip_field(layer_data, pos, wire_type)
+    return ''
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_key(data, pos):
+    key, pos = _read_varint(data, pos)
+    return key >> 3, key & 0x7, pos
+
+
+def _skip_field(data, pos, wire_type):
+    if wire_type == WIRE_TYPE_VARINT:
+        return _read_varint(data, pos)[1]
+    elif wire_type == WIRE_TYPE_FIXED64:
+        return pos + 8
+    elif wire_type == WIRE_TYPE_LENGTH:
+        length, pos = _read_varint(data, pos)
+        return pos + length
+    elif wire_type == WIRE_TYPE_FIXED32:
+        return pos + 4
+    raise ValueError('Unsupported wire type: %s' % wire_type)
+
+
+def decode_geometry(geom, ftype, extent, y_coord_down):
+    """
+    Decodes the command integers of a feature geometry.
 
-            return polygons[0] if len(polygons) == 1 else polygons
+    Returns the coordinates as a flat array('i') of interleaved x/y values
+    and an array('i') with the point index at which each part starts,
+    followed by the total number of points. Parts are split and polygon
+    rings are closed the same way the nested representation does it.
+    """
+    coords, offsets = _decode_values(geom, ftype, extent, y_coord_down)
+    return array('i', coords), array('i', offsets)
+
+
+def _decode_values(geom, ftype, extent, y_coord_down):
+    # same as decode_geometry, but returns plain lists which are cheaper to
+    # fill and slice while the nested representation is being built
+    coords = []
+    append = coords.append
+    offsets = [0]
+    is_polygon = ftype == POLYGON
+    splits_parts = is_polygon or ftype == LINESTRING
+    start = 0  # index of the first value of the current part in coords
+    x = 0
+    y = 0
+    i = 0
+    geom_len = len(geom)
+
+    while i < geom_len:
+        cmd_int = geom[i]
+        cmd = cmd_int & cmd_mask
+        i += 1
+
+        if cmd == CMD_SEG_END:
+            if ftype == POINT:
+                # points are never split, a closed part is dropped
+                del coords[:]
+                continue
+            if is_polygon:
+                _close_ring(coords, start)
+            start = len(coords)
+            offsets.append(start >> 1)
+
+        elif cmd == CMD_MOVE_TO or cmd == CMD_LINE_TO:
+            if cmd == CMD_MOVE_TO and splits_parts and len(coords) > start:
+                # multi line string or polygon. This handles the case
+                # where we receive a move without a previous close.
+                if is_polygon:
+                    _close_ring(coords, start)
+                start = len(coords)
+                offsets.append(start >> 1)
+
+            end = i + 2 * (cmd_int >> cmd_bits)
+            if end > geom_len:
+                raise IndexError('Geometry command exceeds geometry length')
+            params = iter(geom[i:end])
+            i = end
+            for dx, dy in zip(params, params):
+                # zigzag decode and resolve the deltas
+                x += (dx >> 1) ^ -(dx & 1)
+                y += (dy >> 1) ^ -(dy & 1)
+                append(x)
+                append(y if y_coord_down else extent - y)
+
+    if ftype == POINT or len(coords) > start:
+        offsets.append(len(coords) >> 1)
+    return coords, offsets
+
+
+def ring_area_signs(coords, offsets):
+    """
+    Returns the sign (-1, 0 or 1) of the area of each part, computed from
+    the cumulative cross products of all points in one pass.
+    The closing segment is not added, rings are expected to be closed.
+    """
+    nr_points = len(coords) >> 1
+    if np is not None and nr_points >= _numpy_min_points:
+        values = np.asarray(coords, dtype=np.int64)
+        xs = values[0::2]
+        ys = values[1::2]
+        cumulative = np.zeros(nr_points, dtype=np.int64)
+        np.cumsum(xs[:-1] * ys[1:] - xs[1:] * ys[:-1], out=cumulative[1:])
+        cumulative = cumulative.tolist()
+    else:
+        xs = coords[0::2]
+        ys = coords[1::2]
+        cumulative = [0]
+        cumulative.extend(accumulate(map(
+            sub, map(mul, xs[:-1], ys[1:]), map(mul, xs[1:], ys[:-1]))))
+
+    signs = []
+    for n in range(len(offsets) - 1):
+        ring_start = offsets[n]
+        ring_end = offsets[n + 1]
+        a = 0
+        if ring_end - ring_start > 1:
+            a = cumulative[ring_end - 1] - cumulative[ring_start]
+        signs.append(-1 if a < 0 else 1 if a > 0 else 0)
+    return signs
+
+
+def group_polygon_rings(coords, offsets):
+    """
+    Groups the ring indexes into polygons: each ring with the winding of the
+    first ring starts a new polygon, the other rings are its holes.
+    Rings with an area of zero are dropped.
+    """
+    polygon = []
+    polygons = []
+    winding = 0
+
+    for ring_index, a in enumerate(ring_area_signs(coords, offsets)):
+        if a == 0:
+            continue
+        if winding == 0:
+            winding = a
 
+        if winding == a:
+            if polygon:
+                polygons.append(polygon)
+            polygon = [ring_index]
         else:
-            raise ValueError('Unknown geometry type: %s' % ftype)
+            polygon.append(ring_index)
+
+    if polygon:
+        polygons.append(polygon)
+    return polygons
+
+
+def _close_ring(coords, start):
+    if len(coords) > start and (coords[start] != coords[-2]
+                                or coords[start + 1] != coords[-1]):
+        coords.append(coords[start])
+        coords.append(coords[start + 1])
+
+
+def _points(coords, start, end):
+    values = iter(coords[2 * start:2 * end])
+    return list(map(list, zip(values, values)))
+
+
+def _compact_polygons(coords, offsets):
+    polygons = group_polygon_rings(coords, offsets)
+    polygon_offsets = array('i', [0])
+    kept_rings = []
+    for rings in polygons:
+        kept_rings.extend(rings)
+        polygon_offsets.append(len(kept_rings))
+
+    if len(kept_rings) != len(offsets) - 1:
+        compacted = array('i')
+        compacted_offsets = array('i', [0])
+        for r in kept_rings:
+            compacted.extend(coords[2 * offsets[r]:2 * offsets[r + 1]])
+            compacted_offsets.append(len(compacted) >> 1)
+        coords = compacted
+        offsets = compacted_offsets
+    return coords, offsets, polygon_offsets
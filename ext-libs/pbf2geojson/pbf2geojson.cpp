@@ -1,6 +1,8 @@
 #include <vtzero/vector_tile.hpp>
 #include <vtzero/feature.hpp>
 
+#include <algorithm>
+#include <cstring>
 #include <fstream>
 #include <getopt.h>
 #include <iostream>
@@ -369,7 +371,7 @@ void getJson(tile_location& loc, vtzero::layer& layer, std::stringstream& result
 	result << '}';
 }
 
-std::string decodeAsJson(tile_location& loc, const char* hex){
+std::string hexToBytes(const char* hex) {
 	std::string hexString(hex);
 	std::string data;
 	data.reserve(hexString.size() / 2);
@@ -380,7 +382,27 @@ std::string decodeAsJson(tile_location& loc, const char* hex){
 		iss >> std::hex >> temp;
 		data += static_cast<char>(temp);
 	}
+	return data;
+}
+
+std::vector<std::string> getLayerFilter(const char** layerNames, const int nrLayerNames) {
+	std::vector<std::string> layerFilter;
+	for (int i = 0; i < nrLayerNames; i++) {
+		layerFilter.push_back(std::string(layerNames[i]));
+	}
+	return layerFilter;
+}
+
+// Without a filter all layers are included, an empty filter includes none of them
+bool isLayerIncluded(const std::vector<std::string>* layerFilter, const vtzero::layer& layer) {
+	if (layerFilter == nullptr) {
+		return true;
+	}
+	std::string name{layer.name()};
+	return std::find(layerFilter->begin(), layerFilter->end(), name) != layerFilter->end();
+}
 
+std::string decodeAsJson(tile_location& loc, const vtzero::data_view data, const std::vector<std::string>* layerFilter){
 	std::stringstream test;
 
 	vtzero::vector_tile tile{data};
@@ -388,6 +410,10 @@ std::string decodeAsJson(tile_location& loc, const char* hex){
 	test << '{';
 	int layerCount = 0;
 	while (auto layer = tile.next_layer()) {
+		// layers which are filtered out are skipped before any of their features, keys or values are decoded
+		if (!isLayerIncluded(layerFilter, layer)) {
+			continue;
+		}
 		if (layerCount++ > 0) {
 			test << ',';
 		}
@@ -399,17 +425,41 @@ std::string decodeAsJson(tile_location& loc, const char* hex){
 	return test.str();
 }
 
+// The layer names are null if the layers aren't filtered
+std::string decodeAsJsonFiltered(tile_location& loc, const vtzero::data_view data, const char** layerNames, const int nrLayerNames){
+	if (layerNames == nullptr) {
+		return decodeAsJson(loc, data, nullptr);
+	}
+	auto layerFilter = getLayerFilter(layerNames, nrLayerNames);
+	return decodeAsJson(loc, data, &layerFilter);
+}
+
+char* toCString(const std::string& res) {
+	return strdup(res.c_str());
+}
+
 extern "C" {
 	char* decodeMvtToJson(const bool clipTile, const int zoom, const int col, const int row, const double tileX, const double tileY, const double tileSpanX, const double tileSpanY, const char* data) {
 		tile_location loc{clipTile, zoom, col, row, tileX, tileY, tileSpanX, tileSpanY};
-		auto res = decodeAsJson(loc, data);
-		const char* result = res.c_str();
-		char *new_buf = strdup(result);
-		return new_buf;
+		auto bytes = hexToBytes(data);
+		return toCString(decodeAsJson(loc, vtzero::data_view{bytes}, nullptr));
+	}
+
+	char* decodeMvtToJsonFiltered(const bool clipTile, const int zoom, const int col, const int row, const double tileX, const double tileY, const double tileSpanX, const double tileSpanY, const char* data, const char** layerNames, const int nrLayerNames) {
+		tile_location loc{clipTile, zoom, col, row, tileX, tileY, tileSpanX, tileSpanY};
+		auto bytes = hexToBytes(data);
+		return toCString(decodeAsJsonFiltered(loc, vtzero::data_view{bytes}, layerNames, nrLayerNames));
+	}
+
+	// Decodes the tile directly from the passed buffer, which is neither copied nor hex encoded.
+	// Pass null as layer names to decode all layers, an empty list of layer names decodes none of them.
+	char* decodeMvtBytesToJson(const bool clipTile, const int zoom, const int col, const int row, const double tileX, const double tileY, const double tileSpanX, const double tileSpanY, const char* data, const size_t length, const char** layerNames, const int nrLayerNames) {
+		tile_location loc{clipTile, zoom, col, row, tileX, tileY, tileSpanX, tileSpanY};
+		return toCString(decodeAsJsonFiltered(loc, vtzero::data_view{data, length}, layerNames, nrLayerNames));
 	}
 
 	void freeme(char *ptr) {
 		//printf("freeing address: %p\n", ptr);
 		free(ptr);
 	}
-}
\ No newline at end of file
+}
@@ -11,6 +11,7 @@ from PyQt5.QtWidgets import QApplication, QDialog, QFileDialog, QMessageBox
 from ..util.connection import (
     DIRECTORY_CONNECTION_TEMPLATE,
     MBTILES_CONNECTION_TEMPLATE,
+    PMTILES_CONNECTION_TEMPLATE,
     TILEJSON_CONNECTION_TEMPLATE,
     ConnectionTypes,
 )
@@ -26,6 +27,8 @@ if "VTR_TESTS" not in os.environ or os.environ["VTR_TESTS"] != "1":
 
 
 _HELP_URL = "https://github.com/geometalab/Vector-Tiles-Reader-QGIS-Plugin/wiki/Help"
+# the connections of the file tab
+_FILE_CONNECTION_TYPES = [ConnectionTypes.MBTiles, ConnectionTypes.PMTiles]
 
 
 def _update_size(dialog: QDialog):
@@ -193,7 +196,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
         directory_conn = self.settings.value("directory_connection")
         if mbtiles_conn:
             mbtiles_conn = ast.literal_eval(mbtiles_conn)
-            if mbtiles_conn["type"] == ConnectionTypes.MBTiles:
+            if mbtiles_conn["type"] in _FILE_CONNECTION_TYPES:
                 if mbtiles_conn["path"]:
                     self.txtPath.setText(mbtiles_conn["path"])
                 if mbtiles_conn["style"]:
@@ -215,7 +218,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
             widget = None
             if connection["type"] == ConnectionTypes.TileJSON:
                 widget = self.tabServer
-            elif connection["type"] == ConnectionTypes.MBTiles:
+            elif connection["type"] in _FILE_CONNECTION_TYPES:
                 widget = self.tabFile
             elif connection["type"] == ConnectionTypes.Directory:
                 widget = self.tabDirectory
@@ -246,13 +249,16 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
 
     def _select_file_path(self):
         open_file_name = QFileDialog.getOpenFileName(
-            None, "Select Mapbox Tiles", self.browse_path, "Mapbox Tiles (*.mbtiles)"
+            None, "Select Mapbox Tiles", self.browse_path, "Mapbox Tiles (*.mbtiles);;PMTiles (*.pmtiles)"
         )
         if isinstance(open_file_name, tuple):
             open_file_name = open_file_name[0]
         if open_file_name and os.path.isfile(open_file_name):
             self.txtPath.setText(open_file_name)
-            connection = copy.deepcopy(MBTILES_CONNECTION_TEMPLATE)
+            if open_file_name.lower().endswith(".pmtiles"):
+                connection = copy.deepcopy(PMTILES_CONNECTION_TEMPLATE)
+            else:
+                connection = copy.deepcopy(MBTILES_CONNECTION_TEMPLATE)
             connection["name"] = os.path.basename(open_file_name)
             connection["path"] = open_file_name
             self._handle_path_or_folder_selection(connection)
@@ -302,7 +308,7 @@ class ConnectionsDialog(QDialog, Ui_DlgConnections):
         indexes = self.tblLayers.selectionModel().selectedRows()
         selected_layers = list(map(lambda i: self.model.item(i.row()).text(), indexes))
         active_tab = self.tabConnections.currentWidget()
-        if active_tab == self.tabFile and self._current_connection["type"] == ConnectionTypes.MBTiles:
+        if active_tab == self.tabFile and self._current_connection["type"] in _FILE_CONNECTION_TYPES:
             self._current_connection["style"] = self.txtMbtilesStyleJsonUrl.text()
             self.settings.setValue("mbtiles_connection", str(self._current_connection))
         elif active_tab == self.tabDirectory and self._current_connection["type"] == ConnectionTypes.Directory:
@@ -1,6 +1,7 @@
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QAbstractButton, QGroupBox
 
+from ..util.tile_cache import TIER_DECODED, TIER_RAW, get_cache_statistics, get_memory_tile_cache, set_cache_budgets
 from .qt.options_qt5 import Ui_OptionsGroup
 
 
@@ -20,6 +21,10 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
     _SET_BACKGROUND_COLOR = "set_background_color"
     _MODE = "mode"
     _IGNORE_CRS = "ignore_crs"
+    _MAX_CACHE_SIZE_PER_SOURCE = "max_cache_size_per_source"
+    _MAX_CACHE_SIZE = "max_cache_size"
+    _MAX_RAW_CACHE_SIZE_PER_SOURCE = "max_raw_cache_size_per_source"
+    _MAX_RAW_CACHE_SIZE = "max_raw_cache_size"
 
     class Mode(object):
         MANUAL = "manual"
@@ -40,6 +45,10 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
         _SET_BACKGROUND_COLOR: True,
         _MODE: Mode.MANUAL,
         _IGNORE_CRS: False,
+        _MAX_CACHE_SIZE_PER_SOURCE: 128,
+        _MAX_CACHE_SIZE: 512,
+        _MAX_RAW_CACHE_SIZE_PER_SOURCE: 256,
+        _MAX_RAW_CACHE_SIZE: 1024,
     }
 
     def __init__(self, settings, target_groupbox, zoom_change_handler):
@@ -67,7 +76,13 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
         self._load_options()
         self.spinNrOfLoadedTiles.valueChanged.connect(lambda v: self._set_option(self._TILE_LIMIT, v))
         self.zoomSpin.valueChanged.connect(self._on_manual_zoom_change)
+        self.spinCacheSizePerSource.valueChanged.connect(self._on_cache_size_changed)
+        self.spinCacheSizeTotal.valueChanged.connect(self._on_cache_size_changed)
+        self.spinRawCacheSizePerSource.valueChanged.connect(self._on_raw_cache_size_changed)
+        self.spinRawCacheSizeTotal.valueChanged.connect(self._on_raw_cache_size_changed)
         self._current_zoom = None
+        self._on_cache_size_changed()
+        self._on_raw_cache_size_changed()
 
     def _on_bg_color_change(self, enabled: bool) -> None:
         self._set_option(self._SET_BACKGROUND_COLOR, enabled)
@@ -104,6 +119,14 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
             self.set_checked(self.chkSetBackgroundColor, self._SET_BACKGROUND_COLOR)
         if opt[self._IGNORE_CRS]:
             self.set_checked(self.chkIgnoreCrsFromMetadata, self._IGNORE_CRS)
+        if opt[self._MAX_CACHE_SIZE_PER_SOURCE]:
+            self.spinCacheSizePerSource.setValue(int(opt[self._MAX_CACHE_SIZE_PER_SOURCE]))
+        if opt[self._MAX_CACHE_SIZE]:
+            self.spinCacheSizeTotal.setValue(int(opt[self._MAX_CACHE_SIZE]))
+        if opt[self._MAX_RAW_CACHE_SIZE_PER_SOURCE]:
+            self.spinRawCacheSizePerSource.setValue(int(opt[self._MAX_RAW_CACHE_SIZE_PER_SOURCE]))
+        if opt[self._MAX_RAW_CACHE_SIZE]:
+            self.spinRawCacheSizeTotal.setValue(int(opt[self._MAX_RAW_CACHE_SIZE]))
         if opt[self._MODE]:
             val = opt[self._MODE]
             self._enable_manual_mode(val == self.Mode.MANUAL)
@@ -114,6 +137,33 @@ class OptionsGroup(QGroupBox, Ui_OptionsGroup):
         else:
             self.btnManualSettings.setChecked(True)
 
+    def _on_cache_size_changed(self):
+        size_per_source = self.spinCacheSizePerSource.value()
+        size = self.spinCacheSizeTotal.value()
+        self._set_option(self._MAX_CACHE_SIZE_PER_SOURCE, size_per_source)
+        self._set_option(self._MAX_CACHE_SIZE, size)
+        set_cache_budgets(
+            max_bytes_per_cache=size_per_source * 1024 * 1024, max_total_bytes=size * 1024 * 1024, tier=TIER_DECODED
+        )
+
+    def _on_raw_cache_size_changed(self):
+        size_per_source = self.spinRawCacheSizePerSource.value()
+        size = self.spinRawCacheSizeTotal.value()
+        self._set_option(self._MAX_RAW_CACHE_SIZE_PER_SOURCE, size_per_source)
+        self._set_option(self._MAX_RAW_CACHE_SIZE, size)
+        set_cache_budgets(
+            max_bytes_per_cache=size_per_source * 1024 * 1024, max_total_bytes=size * 1024 * 1024, tier=TIER_RAW
+        )
+
+    def update_cache_statistics(self):
+        self.lblCacheStatistics.setText(
+            "Decoded tiles: {}\nOriginal tiles: {}\nMemory: {}".format(
+                get_cache_statistics(TIER_DECODED),
+                get_cache_statistics(TIER_RAW),
+                get_memory_tile_cache().statistics(),
+            )
+        )
+
     def _on_apply_styles_changed(self, enabled):
         self._set_option(self._APPLY_STYLES, enabled)
         self.chkSetBackgroundColor.setChecked(enabled)
@@ -89,7 +89,7 @@ class Ui_OptionsGroup(object):
         self.horizontalLayout_2.addWidget(self.btnManualSettings)
         spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.horizontalLayout_2.addItem(spacerItem1)
-        self.gridLayout.addLayout(self.horizontalLayout_2, 12, 0, 1, 2)
+        self.gridLayout.addLayout(self.horizontalLayout_2, 15, 0, 1, 2)
         self.chkAutoZoom = QtWidgets.QCheckBox(OptionsGroup)
         self.chkAutoZoom.setChecked(True)
         self.chkAutoZoom.setObjectName("chkAutoZoom")
@@ -126,6 +126,53 @@ class Ui_OptionsGroup(object):
         self.chkIgnoreCrsFromMetadata = QtWidgets.QCheckBox(OptionsGroup)
         self.chkIgnoreCrsFromMetadata.setObjectName("chkIgnoreCrsFromMetadata")
         self.gridLayout.addWidget(self.chkIgnoreCrsFromMetadata, 11, 0, 1, 2)
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.lblCacheSize = QtWidgets.QLabel(OptionsGroup)
+        self.lblCacheSize.setObjectName("lblCacheSize")
+        self.horizontalLayout_3.addWidget(self.lblCacheSize)
+        self.spinCacheSizePerSource = QtWidgets.QSpinBox(OptionsGroup)
+        self.spinCacheSizePerSource.setKeyboardTracking(False)
+        self.spinCacheSizePerSource.setMinimum(16)
+        self.spinCacheSizePerSource.setMaximum(999999)
+        self.spinCacheSizePerSource.setProperty("value", 128)
+        self.spinCacheSizePerSource.setObjectName("spinCacheSizePerSource")
+        self.horizontalLayout_3.addWidget(self.spinCacheSizePerSource)
+        self.spinCacheSizeTotal = QtWidgets.QSpinBox(OptionsGroup)
+        self.spinCacheSizeTotal.setKeyboardTracking(False)
+        self.spinCacheSizeTotal.setMinimum(16)
+        self.spinCacheSizeTotal.setMaximum(999999)
+        self.spinCacheSizeTotal.setProperty("value", 512)
+        self.spinCacheSizeTotal.setObjectName("spinCacheSizeTotal")
+        self.horizontalLayout_3.addWidget(self.spinCacheSizeTotal)
+        spacerItem3 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout_3.addItem(spacerItem3)
+        self.gridLayout.addLayout(self.horizontalLayout_3, 12, 0, 1, 2)
+        self.horizontalLayout_4 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_4.setObjectName("horizontalLayout_4")
+        self.lblRawCacheSize = QtWidgets.QLabel(OptionsGroup)
+        self.lblRawCacheSize.setObjectName("lblRawCacheSize")
+        self.horizontalLayout_4.addWidget(self.lblRawCacheSize)
+        self.spinRawCacheSizePerSource = QtWidgets.QSpinBox(OptionsGroup)
+        self.spinRawCacheSizePerSource.setKeyboardTracking(False)
+        self.spinRawCacheSizePerSource.setMinimum(16)
+        self.spinRawCacheSizePerSource.setMaximum(999999)
+        self.spinRawCacheSizePerSource.setProperty("value", 256)
+        self.spinRawCacheSizePerSource.setObjectName("spinRawCacheSizePerSource")
+        self.horizontalLayout_4.addWidget(self.spinRawCacheSizePerSource)
+        self.spinRawCacheSizeTotal = QtWidgets.QSpinBox(OptionsGroup)
+        self.spinRawCacheSizeTotal.setKeyboardTracking(False)
+        self.spinRawCacheSizeTotal.setMinimum(16)
+        self.spinRawCacheSizeTotal.setMaximum(999999)
+        self.spinRawCacheSizeTotal.setProperty("value", 1024)
+        self.spinRawCacheSizeTotal.setObjectName("spinRawCacheSizeTotal")
+        self.horizontalLayout_4.addWidget(self.spinRawCacheSizeTotal)
+        spacerItem4 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout_4.addItem(spacerItem4)
+        self.gridLayout.addLayout(self.horizontalLayout_4, 13, 0, 1, 2)
+        self.lblCacheStatistics = QtWidgets.QLabel(OptionsGroup)
+        self.lblCacheStatistics.setObjectName("lblCacheStatistics")
+        self.gridLayout.addWidget(self.lblCacheStatistics, 14, 0, 1, 2)
 
         self.retranslateUi(OptionsGroup)
         QtCore.QMetaObject.connectSlotsByName(OptionsGroup)
@@ -136,7 +183,11 @@ class Ui_OptionsGroup(object):
         OptionsGroup.setTabOrder(self.rbZoomMax, self.rbZoomManual)
         OptionsGroup.setTabOrder(self.rbZoomManual, self.zoomSpin)
         OptionsGroup.setTabOrder(self.zoomSpin, self.chkApplyStyles)
-        OptionsGroup.setTabOrder(self.chkApplyStyles, self.btnResetToBasemapDefaults)
+        OptionsGroup.setTabOrder(self.chkApplyStyles, self.spinCacheSizePerSource)
+        OptionsGroup.setTabOrder(self.spinCacheSizePerSource, self.spinCacheSizeTotal)
+        OptionsGroup.setTabOrder(self.spinCacheSizeTotal, self.spinRawCacheSizePerSource)
+        OptionsGroup.setTabOrder(self.spinRawCacheSizePerSource, self.spinRawCacheSizeTotal)
+        OptionsGroup.setTabOrder(self.spinRawCacheSizeTotal, self.btnResetToBasemapDefaults)
         OptionsGroup.setTabOrder(self.btnResetToBasemapDefaults, self.btnResetToAnalysisDefaults)
         OptionsGroup.setTabOrder(self.btnResetToAnalysisDefaults, self.btnResetToInspectionDefaults)
 
@@ -176,3 +227,34 @@ class Ui_OptionsGroup(object):
             )
         )
         self.chkIgnoreCrsFromMetadata.setText(_translate("OptionsGroup", "Ignore CRS from metadata"))
+        self.lblCacheSize.setText(_translate("OptionsGroup", "Max. size of decoded tiles"))
+        self.spinCacheSizePerSource.setToolTip(
+            _translate(
+                "OptionsGroup",
+                "Decoded tiles of a source beyond this size are removed, the least recently used first",
+            )
+        )
+        self.spinCacheSizePerSource.setSuffix(_translate("OptionsGroup", " MB per source"))
+        self.spinCacheSizeTotal.setToolTip(
+            _translate(
+                "OptionsGroup",
+                "Decoded tiles of all sources beyond this size are removed, the least recently used first",
+            )
+        )
+        self.spinCacheSizeTotal.setSuffix(_translate("OptionsGroup", " MB in total"))
+        self.lblRawCacheSize.setText(_translate("OptionsGroup", "Max. size of original tiles"))
+        self.spinRawCacheSizePerSource.setToolTip(
+            _translate(
+                "OptionsGroup",
+                "Original tiles of a source beyond this size are removed, the least recently used first",
+            )
+        )
+        self.spinRawCacheSizePerSource.setSuffix(_translate("OptionsGroup", " MB per source"))
+        self.spinRawCacheSizeTotal.setToolTip(
+            _translate(
+                "OptionsGroup",
+                "Original tiles of all sources beyond this size are removed, the least recently used first",
+            )
+        )
+        self.spinRawCacheSizeTotal.setSuffix(_translate("OptionsGroup", " MB in total"))
+        self.lblCacheStatistics.setText(_translate("OptionsGroup", "Cache: no statistics yet"))
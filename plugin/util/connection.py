@@ -4,6 +4,7 @@ class _ConnectionTypes(object):
 
     TileJSON = "TileJSON"
     MBTiles = "MBTiles"
+    PMTiles = "PMTiles"
     Directory = "Directory"
     PostGIS = "PostGIS"
 
@@ -12,6 +13,8 @@ ConnectionTypes = _ConnectionTypes()
 
 MBTILES_CONNECTION_TEMPLATE = {"name": None, "path": None, "type": ConnectionTypes.MBTiles, "style": None}
 
+PMTILES_CONNECTION_TEMPLATE = {"name": None, "path": None, "type": ConnectionTypes.PMTiles, "style": None}
+
 DIRECTORY_CONNECTION_TEMPLATE = {"name": None, "path": None, "type": ConnectionTypes.Directory, "style": None}
 
 TILEJSON_CONNECTION_TEMPLATE = {
@@ -0,0 +1,78 @@
+from .log_helper import info
+
+
+class DecodeScheduler:
+    """
+     * Decides for each tile whether it is decoded on the loading thread or handed to the decoder pool.
+     * The decoding time of a tile is estimated from its compressed size and the decoding throughput measured for the
+       previous tiles. Tiles which are decoded faster than they could be dispatched to the pool are decoded on the
+       loading thread, all others in parallel.
+    """
+
+    # the throughput that is assumed until the first tiles have been decoded
+    _INITIAL_BYTES_PER_SECOND = 2 * 1024 * 1024
+    # the weight of a new measurement in the moving average of the throughput
+    _SMOOTHING = 0.2
+
+    def __init__(self, dispatch_overhead_seconds: float):
+        """
+        :param dispatch_overhead_seconds: The time it takes to hand a tile to the decoder pool and get the result back
+        """
+        self.dispatch_overhead_seconds = dispatch_overhead_seconds
+        self._bytes_per_second = float(self._INITIAL_BYTES_PER_SECOND)
+        self._nr_measurements = 0
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self._nr_serial = 0
+        self._nr_parallel = 0
+        self._bytes_serial = 0
+        self._bytes_parallel = 0
+
+    def bytes_per_second(self) -> float:
+        return self._bytes_per_second
+
+    def estimate_seconds(self, nr_bytes: int) -> float:
+        return nr_bytes / self._bytes_per_second
+
+    def decode_in_parallel(self, nr_bytes: int) -> bool:
+        """
+         * Returns whether the tile with the specified compressed size is worth being decoded in parallel
+        """
+        parallel = self.estimate_seconds(nr_bytes) > self.dispatch_overhead_seconds
+        if parallel:
+            self._nr_parallel += 1
+            self._bytes_parallel += nr_bytes
+        else:
+            self._nr_serial += 1
+            self._bytes_serial += nr_bytes
+        return parallel
+
+    def add_measurement(self, nr_bytes: int, seconds: float) -> None:
+        """
+         * Updates the throughput with the time it took to decode a tile
+        """
+        if nr_bytes <= 0 or seconds <= 0:
+            return
+        bytes_per_second = nr_bytes / seconds
+        if self._nr_measurements == 0:
+            self._bytes_per_second = bytes_per_second
+        else:
+            self._bytes_per_second += self._SMOOTHING * (bytes_per_second - self._bytes_per_second)
+        self._nr_measurements += 1
+
+    def log_decisions(self) -> None:
+        """
+         * Logs the decisions made since the last call, thus the overhead and the throughput can be tuned
+        """
+        info(
+            "Decode scheduling: {} tiles ({} bytes) serial, {} tiles ({} bytes) parallel, "
+            "throughput {:.0f} bytes/s, dispatch overhead {}s",
+            self._nr_serial,
+            self._bytes_serial,
+            self._nr_parallel,
+            self._bytes_parallel,
+            self._bytes_per_second,
+            self.dispatch_overhead_seconds,
+        )
+        self._reset_counters()
@@ -0,0 +1,97 @@
+from typing import Collection, Dict, List, Optional
+
+from PyQt5.QtCore import QUrl
+
+from .log_helper import info
+
+# the number of requests to the same host that are running at the same time, like the connections Qt opens per host
+MAX_REQUESTS_PER_HOST = 6
+
+
+class EndpointBalancer:
+    """
+     * Chooses the endpoint of each request if the tiles are available from several endpoints, e.g. the tile URLs of a
+       TileJSON. The endpoint is chosen by the expected time until its response, which depends on the latency and the
+       error rate observed so far and on the number of requests that are running already.
+     * An endpoint which failed several times in a row is backed off: Only a single request at a time is sent to it,
+       until one succeeds again.
+    """
+
+    # the latency that is assumed until the first response of an endpoint has been received
+    _INITIAL_LATENCY_SECONDS = 0.2
+    # the weight of a new measurement in the moving averages of the latency and the error rate
+    _SMOOTHING = 0.2
+    # the number of consecutive errors after which an endpoint is backed off
+    _ERRORS_UNTIL_BACKOFF = 2
+    _MAX_ERROR_RATE = 0.9
+
+    def __init__(self, max_requests_per_host: int = MAX_REQUESTS_PER_HOST):
+        self.max_requests_per_host = max_requests_per_host
+        self._latency_by_host: Dict[str, float] = {}
+        self._error_rate_by_host: Dict[str, float] = {}
+        self._consecutive_errors_by_host: Dict[str, int] = {}
+        self._nr_running_by_host: Dict[str, int] = {}
+
+    def choose(self, urls: List[str], excluded_hosts: Collection[str] = ()) -> Optional[str]:
+        """
+         * Returns the URL of the endpoint the request should be sent to
+        :param urls: The URLs of the same tile at the different endpoints
+        :param excluded_hosts: The hosts that have been tried already
+        :return: The URL or None if all endpoints are busy
+        """
+        best_url = None
+        best_cost = None
+        for url in urls:
+            host = get_host(url)
+            if host in excluded_hosts or self._nr_running_by_host.get(host, 0) >= self._get_capacity(host):
+                continue
+            cost = self._get_expected_seconds(host)
+            if best_cost is None or cost < best_cost:
+                best_url = url
+                best_cost = cost
+        return best_url
+
+    def is_backed_off(self, host: str) -> bool:
+        return self._consecutive_errors_by_host.get(host, 0) >= self._ERRORS_UNTIL_BACKOFF
+
+    def request_started(self, url: str) -> None:
+        host = get_host(url)
+        self._nr_running_by_host[host] = self._nr_running_by_host.get(host, 0) + 1
+
+    def request_finished(self, url: str, seconds: Optional[float], failed: bool) -> None:
+        """
+         * Updates the statistics of the endpoint
+        :param url:
+        :param seconds: The time until the response or None if the request has been aborted
+        :param failed: Whether the endpoint failed to respond, e.g. a network error or a server error
+        """
+        host = get_host(url)
+        self._nr_running_by_host[host] = max(0, self._nr_running_by_host.get(host, 0) - 1)
+        if seconds is None:
+            return
+        error_rate = self._error_rate_by_host.get(host, 0.0)
+        self._error_rate_by_host[host] = error_rate + self._SMOOTHING * (float(failed) - error_rate)
+        if failed:
+            was_backed_off = self.is_backed_off(host)
+            self._consecutive_errors_by_host[host] = self._consecutive_errors_by_host.get(host, 0) + 1
+            if self.is_backed_off(host) and not was_backed_off:
+                info("Backing off from '{}' after {} failed requests", host, self._ERRORS_UNTIL_BACKOFF)
+        else:
+            self._consecutive_errors_by_host[host] = 0
+            latency = self._latency_by_host.get(host)
+            if latency is None:
+                self._latency_by_host[host] = seconds
+            else:
+                self._latency_by_host[host] = latency + self._SMOOTHING * (seconds - latency)
+
+    def _get_capacity(self, host: str) -> int:
+        return 1 if self.is_backed_off(host) else self.max_requests_per_host
+
+    def _get_expected_seconds(self, host: str) -> float:
+        latency = self._latency_by_host.get(host, self._INITIAL_LATENCY_SECONDS)
+        error_rate = min(self._error_rate_by_host.get(host, 0.0), self._MAX_ERROR_RATE)
+        return latency * (self._nr_running_by_host.get(host, 0) + 1) / (1 - error_rate)
+
+
+def get_host(url: str) -> str:
+    return QUrl(url).host()
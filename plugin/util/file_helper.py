@@ -1,17 +1,11 @@
 import os
 import re
 import shutil
-import sys
 import tempfile
-import time
-
-from .log_helper import critical, info, warn
-
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle as pickle
+from functools import lru_cache
+from typing import Optional
 
+from .log_helper import info
 
 geojson_folder = "tmp"
 max_cache_age_minutes = 1440  # 24 hours
@@ -24,6 +18,17 @@ def get_plugin_directory():
     return path
 
 
+@lru_cache(maxsize=None)
+def get_plugin_version() -> Optional[str]:
+    version = None
+    with open(os.path.join(get_plugin_directory(), "metadata.txt"), "r") as f:
+        content = f.read()
+    match = re.search(r"version=\d+\.\d+.\d+", content)
+    if match:
+        version = match.group().replace("version=", "")
+    return version
+
+
 def get_style_folder(connection_name):
     folder = os.path.join(get_temp_dir(), "styles", connection_name)
     return folder
@@ -45,43 +50,6 @@ def get_cache_directory():
     return get_temp_dir("cache")
 
 
-def _get_cache_entry_path(cache_name, zoom_level, x, y):
-    return os.path.join(get_cache_directory(), cache_name, str(zoom_level), str(x), "{}.bin".format(y))
-
-
-def get_cache_entry(cache_name, zoom_level, x, y):
-    file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
-    decoded_data = None
-    try:
-        if os.path.isfile(file_path):
-            age_in_seconds = int(time.time()) - os.path.getmtime(file_path)
-            is_deprecated = age_in_seconds > max_cache_age_minutes * 60
-            if is_deprecated:
-                os.remove(file_path)
-            else:
-                with open(file_path, "rb") as f:
-                    decoded_data = pickle.load(f)
-    except:
-        critical("Error while reading cache entry {}: {}", file_path, sys.exc_info()[1])
-    return decoded_data
-
-
-def cache_tile(cache_name, zoom_level, x, y, decoded_data):
-    file_path = _get_cache_entry_path(cache_name=cache_name, zoom_level=zoom_level, x=x, y=y)
-    if not os.path.isfile(file_path):
-        if not decoded_data:
-            warn("Trying to cache a tile without data: {}: {},{},{}", cache_name, zoom_level, x, y)
-        else:
-            try:
-                directory = os.path.dirname(file_path)
-                if not os.path.isdir(directory):
-                    os.makedirs(directory)
-                with open(file_path, "wb") as f:
-                    pickle.dump(decoded_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-            except:
-                critical("Error during caching of '{}': {}", file_path, sys.exc_info()[1])
-
-
 def get_sample_data_directory():
     return os.path.join(get_plugin_directory(), "sample_data")
 
@@ -97,6 +65,9 @@ def clear_cache():
     """
      * Removes all files from the cache
     """
+    from .tile_cache import close_tile_caches
+
+    close_tile_caches()
     cache = os.path.join(get_cache_directory())
     if not os.path.exists(cache):
         return
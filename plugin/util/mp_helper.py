@@ -1,11 +1,30 @@
+import gzip
 import os
 import platform
 import shutil
 import sys
+import time
 import traceback
-from ctypes import c_bool, c_char_p, c_double, c_uint16, c_void_p, cast, cdll
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from ctypes import (
+    POINTER,
+    c_bool,
+    c_char,
+    c_char_p,
+    c_double,
+    c_int,
+    c_size_t,
+    c_uint16,
+    c_void_p,
+    cast,
+    cdll,
+)
 from datetime import datetime
+from heapq import heappop, heappush
+from itertools import count
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Set, Tuple
 
 import mapbox_vector_tile
 
@@ -19,15 +38,36 @@ except ImportError:
 
 _native_lib_handle = None
 
+_GZIP_MAGIC = b"\x1f\x8b"
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def unzip(data):
+    """
+     * If the passed data is gzipped, it will be unzipped. Otherwise it will be returned untouched.
+     * This runs in the decoder threads and processes, thus the tiles are decompressed in parallel.
+    :param data:
+    :return:
+    """
+    if not data or bytes(data[:2]) != _GZIP_MAGIC:
+        return data
+    decompressor = zlib.decompressobj(_GZIP_WBITS)
+    content = decompressor.decompress(data)
+    if decompressor.unused_data:
+        # multiple gzip members, which zlib doesn't handle in one call
+        content = gzip.decompress(data)
+    return content
+
 
 def decode_tile_python(tile_data_clip):
     tile = tile_data_clip[0]
-    encoded_data = tile_data_clip[1]
+    encoded_data = unzip(tile_data_clip[1])
     # clip_tile = tile_data_clip[2]
+    layer_filter = tile_data_clip[3]
 
     decoded_data = None
     if encoded_data and not tile.decoded_data:
-        decoded_data = mapbox_vector_tile.decode(encoded_data)
+        decoded_data = mapbox_vector_tile.decode(encoded_data, layer_filter=layer_filter)
     return tile, decoded_data
 
 
@@ -86,6 +126,20 @@ def load_lib():
                     c_char_p,
                 ]
                 lib.decodeMvtToJson.restype = c_void_p
+                if hasattr(lib, "decodeMvtToJsonFiltered"):
+                    lib.decodeMvtToJsonFiltered.argtypes = lib.decodeMvtToJson.argtypes + [POINTER(c_char_p), c_int]
+                    lib.decodeMvtToJsonFiltered.restype = c_void_p
+                else:
+                    info("The native lib doesn't support layer filters, filtering after decoding")
+                if hasattr(lib, "decodeMvtBytesToJson"):
+                    lib.decodeMvtBytesToJson.argtypes = lib.decodeMvtToJson.argtypes + [
+                        c_size_t,
+                        POINTER(c_char_p),
+                        c_int,
+                    ]
+                    lib.decodeMvtBytesToJson.restype = c_void_p
+                else:
+                    info("The native lib doesn't support raw tile data, tiles will be passed hex encoded")
                 lib.freeme.argtypes = [c_void_p]
                 lib.freeme.restype = None
                 _native_lib_handle = lib
@@ -108,7 +162,10 @@ def unload_lib():
 
                 windll.kernel32.FreeLibrary(_native_lib_handle._handle)
             else:
-                _native_lib_handle.dlclose()
+                # the CDLL would resolve dlclose as a function of the lib, which ends up in libc's without a handle
+                import _ctypes
+
+                _ctypes.dlclose(_native_lib_handle._handle)
         else:
             info("Native lib already unloaded")
     except Exception:
@@ -121,38 +178,100 @@ def native_decoding_supported() -> bool:
     return _native_lib_handle is not None
 
 
+def _get_layer_filter_args(layer_filter):
+    """
+     * Returns the layer names and their number as passed to the native lib. The layer names are null if all layers
+       are decoded, an empty layer filter is passed as non-null array and decodes none of them, like the python decoder.
+    """
+    if layer_filter is None:
+        return None, 0
+    names = [name.encode(encoding="UTF-8") for name in layer_filter]
+    return (c_char_p * max(len(names), 1))(*names), len(names)
+
+
+def _get_location_args(tile, clip_tile) -> list:
+    tile_span_x = tile.extent[2] - tile.extent[0]
+    tile_span_y = tile.extent[1] - tile.extent[3]
+    tile_x = tile.extent[0]
+    tile_y = tile.extent[1] - tile_span_y  # subtract tile size because Y starts from top, not from bottom
+    return [
+        clip_tile,
+        int(tile.zoom_level),
+        int(tile.column),
+        int(tile.row),
+        tile_x,
+        tile_y,
+        tile_span_x,
+        tile_span_y,
+    ]
+
+
+def _as_native_buffer(data):
+    """
+     * Returns an object which ctypes passes as pointer to the tile data, without copying the data if possible
+    """
+    if isinstance(data, bytes):
+        return data
+    view = memoryview(data)
+    if not view.readonly and view.contiguous:
+        return (c_char * view.nbytes).from_buffer(view)
+    if isinstance(view.obj, bytes) and view.nbytes == len(view.obj):
+        return view.obj
+    return view.tobytes()
+
+
+def raw_decoding_supported() -> bool:
+    return hasattr(_native_lib_handle, "decodeMvtBytesToJson")
+
+
+def _decode_native_raw(location_args: list, data, layer_filter) -> bytes:
+    buffer = _as_native_buffer(data)
+    ptr = _native_lib_handle.decodeMvtBytesToJson(
+        *location_args, buffer, len(buffer), *_get_layer_filter_args(layer_filter)
+    )
+    try:
+        return cast(ptr, c_char_p).value
+    finally:
+        _native_lib_handle.freeme(ptr)
+
+
+def _decode_native_hex(location_args: list, data, layer_filter) -> Tuple[bytes, bool]:
+    """
+     * Decodes the tile with the hex string based functions of native libs which don't support raw tile data
+    :return: The JSON and whether the layer filter has been applied
+    """
+    hex_bytes = bytes(data).hex().encode(encoding="UTF-8")
+    filter_natively = layer_filter is not None and hasattr(_native_lib_handle, "decodeMvtToJsonFiltered")
+    if filter_natively:
+        ptr = _native_lib_handle.decodeMvtToJsonFiltered(
+            *location_args, hex_bytes, *_get_layer_filter_args(layer_filter)
+        )
+    else:
+        ptr = _native_lib_handle.decodeMvtToJson(*location_args, hex_bytes)
+    try:
+        return cast(ptr, c_char_p).value, filter_natively
+    finally:
+        _native_lib_handle.freeme(ptr)
+
+
 def decode_tile_native(tile_data_clip):
-    tile, data, clip_tile = tile_data_clip
+    tile, data, clip_tile, layer_filter = tile_data_clip
     decoded_data = None
     if not tile.decoded_data:
         try:
-            encoded_data = bytearray(data)
-
-            hex_string = "".join("%02x" % b for b in encoded_data)
-            hex_bytes = hex_string.encode(encoding="UTF-8")
-
-            tile_span_x = tile.extent[2] - tile.extent[0]
-            tile_span_y = tile.extent[1] - tile.extent[3]
-            tile_x = tile.extent[0]
-            tile_y = tile.extent[1] - tile_span_y  # subtract tile size because Y starts from top, not from bottom
-
-            ptr = _native_lib_handle.decodeMvtToJson(
-                clip_tile,
-                int(tile.zoom_level),
-                int(tile.column),
-                int(tile.row),
-                tile_x,
-                tile_y,
-                tile_span_x,
-                tile_span_y,
-                hex_bytes,
-            )
-            decoded_data = cast(ptr, c_char_p).value
-            _native_lib_handle.freeme(ptr)
+            data = unzip(data)
+            location_args = _get_location_args(tile, clip_tile)
+            if raw_decoding_supported():
+                decoded_data = _decode_native_raw(location_args, data, layer_filter)
+                is_filtered = True
+            else:
+                decoded_data, is_filtered = _decode_native_hex(location_args, data, layer_filter)
 
             # with open(r"c:\temp\output.txt", 'w') as f:
             #     f.write(decoded_data)
             decoded_data = json.loads(decoded_data)
+            if layer_filter is not None and not is_filtered:
+                decoded_data = {name: layer for name, layer in decoded_data.items() if name in layer_filter}
         except:
             exc_txt = traceback.format_exc()
             info("Decoding failed: {}", exc_txt)
@@ -162,3 +281,114 @@ def decode_tile_native(tile_data_clip):
             tb_data.write_text(json.dumps(decode(data)))
 
     return tile, decoded_data
+
+
+def decode_tiles_streaming(
+    tiles_with_encoded_data: Iterable[Tuple],
+    submit_func: Callable[[Tuple], Future],
+    max_in_flight: int,
+    should_cancel_func: Optional[Callable[[], bool]] = None,
+    size_func: Optional[Callable[[Tuple], int]] = None,
+    max_waiting: int = 0,
+) -> Iterator:
+    """
+     * Decodes the tiles while they are still being loaded and yields the result of each tile as soon as the tile has
+       been decoded.
+     * At most max_in_flight tiles are decoded at the same time. While all decoders are busy, up to max_waiting
+       further tiles are taken from tiles_with_encoded_data, then no more until a decoder is done. This limits the
+       memory used by loaded but not yet decoded tiles (backpressure).
+     * The largest of the waiting tiles, according to size_func, is decoded first, which balances the work of the
+       decoders.
+    :param tiles_with_encoded_data: The tiles in the format expected by the decoder functions
+    :param submit_func: Starts decoding a tile and returns the future of the result
+    :param max_in_flight: The maximum number of tiles which are decoded at the same time
+    :param should_cancel_func: If it returns True, no further tiles are decoded
+    :param size_func: Returns the size of a tile
+    :param max_waiting: The maximum number of tiles waiting for a decoder
+    """
+
+    def is_cancelled() -> bool:
+        return should_cancel_func is not None and should_cancel_func()
+
+    tiles = iter(tiles_with_encoded_data)
+    all_loaded = False
+    order = count()
+    waiting = []
+    in_flight = set()
+    try:
+        while not is_cancelled():
+            while waiting and len(in_flight) < max_in_flight:
+                in_flight.add(submit_func(heappop(waiting)[2]))
+
+            if not all_loaded and len(in_flight) + len(waiting) < max_in_flight + max_waiting:
+                t = next(tiles, None)
+                if t is None:
+                    all_loaded = True
+                else:
+                    heappush(waiting, (-size_func(t) if size_func else 0, next(order), t))
+                done = {f for f in in_flight if f.done()}
+            elif in_flight:
+                done = _wait_for_any(in_flight, is_cancelled)
+            else:
+                break
+
+            in_flight -= done
+            for f in done:
+                yield f.result()
+    finally:
+        for f in in_flight:
+            f.cancel()
+
+
+def _wait_for_any(futures: Set[Future], is_cancelled: Callable[[], bool]) -> Set[Future]:
+    done = set()
+    while not done and not is_cancelled():
+        done, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+    return done
+
+
+def decode_tile_timed(decoder_func: Callable, tile_data_clip) -> Tuple:
+    """
+     * Decodes the tile with the decoder function and measures the time the decoding took
+    :return: The tile, the decoded data, the size of the encoded data and the decoding time in seconds
+    """
+    start = time.perf_counter()
+    tile, decoded_data = decoder_func(tile_data_clip)
+    return tile, decoded_data, len(tile_data_clip[1]), time.perf_counter() - start
+
+
+def submit_to_pool(pool, func: Callable, arg) -> Future:
+    """
+     * Runs the function in the multiprocessing pool and returns a future of the result, thus tasks of a process pool
+       can be waited for the same way as tasks of a thread pool executor
+    """
+    future = Future()
+    future.set_running_or_notify_cancel()
+    pool.apply_async(func, (arg,), callback=future.set_result, error_callback=future.set_exception)
+    return future
+
+
+def run_inline(func: Callable, arg) -> Future:
+    """
+     * Runs the function on the current thread and returns the result as completed future
+    """
+    future = Future()
+    future.set_running_or_notify_cancel()
+    try:
+        future.set_result(func(arg))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def create_decoder_executor(nr_threads: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=nr_threads, thread_name_prefix="vtr_decoder")
+
+
+def init_decoder_process():
+    """
+     * Initializer of the decoder processes, which warms up the decoder once per process instead of once per load
+    """
+    from mapbox_vector_tile import decoder
+
+    decoder.TileData()
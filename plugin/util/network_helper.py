@@ -1,13 +1,19 @@
 # from time import sleep
-from typing import Callable, List, Optional, Tuple
+import time
+from collections import deque
+from functools import partial
+from typing import Callable, Deque, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
 
 # from PyQt5.QtCore import QRunnable, QThreadPool, QUrl
-from PyQt5.QtCore import QUrl
+from PyQt5.QtCore import QEventLoop, QTimer, QUrl
 from PyQt5.QtNetwork import QNetworkReply, QNetworkRequest
 from PyQt5.QtWidgets import QApplication
 from qgis.core import QgsNetworkAccessManager
 
-from .log_helper import info, remove_key, warn
+from .endpoint_balancer import MAX_REQUESTS_PER_HOST, EndpointBalancer, get_host
+from .log_helper import debug, info, remove_key, warn
+
+_CANCEL_CHECK_INTERVAL_MSEC = 100
 
 
 def url_exists(url: str) -> Tuple[bool, Optional[str], str]:
@@ -38,9 +44,21 @@ def url_exists(url: str) -> Tuple[bool, Optional[str], str]:
     return success, error, url
 
 
-def http_get_async(url: str, head_only: bool = False) -> QNetworkReply:
+def http_get_async(url: str, head_only: bool = False, validators: Optional[dict] = None) -> QNetworkReply:
+    """
+     * Starts the request
+    :param url:
+    :param head_only:
+    :param validators: The validators of a cached response as returned by get_cache_validators(), the request is
+     conditional then and the server responds with 304 if the response didn't change
+    """
     m = QgsNetworkAccessManager.instance()
     req = QNetworkRequest(QUrl(url))
+    if validators:
+        if validators.get("etag"):
+            req.setRawHeader(b"If-None-Match", validators["etag"].encode("utf-8"))
+        if validators.get("last_modified"):
+            req.setRawHeader(b"If-Modified-Since", validators["last_modified"].encode("utf-8"))
     if head_only:
         reply = m.head(req)
     else:
@@ -95,51 +113,206 @@ def http_get_async(url: str, head_only: bool = False) -> QNetworkReply:
 #     return results
 
 
+def get_cache_validators(reply: QNetworkReply) -> dict:
+    """
+     * Returns the headers of the response which are required to revalidate it later on: The etag, the last_modified
+       date and the max_age in seconds (None if the server doesn't specify it)
+    """
+    return {
+        "etag": _get_header(reply, b"ETag"),
+        "last_modified": _get_header(reply, b"Last-Modified"),
+        "max_age": get_max_age(_get_header(reply, b"Cache-Control")),
+    }
+
+
+def get_max_age(cache_control: Optional[str]) -> Optional[int]:
+    """
+     * Returns the max-age of the Cache-Control header in seconds. Responses which must not be reused without
+       revalidation have a max-age of 0.
+    """
+    if not cache_control:
+        return None
+    max_age = None
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        name = name.strip().lower()
+        if name in ("no-cache", "no-store"):
+            return 0
+        if name == "max-age":
+            try:
+                max_age = max(0, int(value.strip().strip('"')))
+            except ValueError:
+                pass
+    return max_age
+
+
+def _get_header(reply: QNetworkReply, name: bytes) -> Optional[str]:
+    value = reply.rawHeader(name).data()
+    return value.decode("utf-8", errors="replace") if value else None
+
+
 def load_tiles_async(
-    urls_with_col_and_row, on_progress_changed: Callable = None, cancelling_func: Callable[[], bool] = None
-) -> List:
-    replies: List[Tuple[QNetworkReply, Tuple[int, int]]] = [
-        (http_get_async(url), (col, row)) for url, col, row in urls_with_col_and_row
-    ]
-    total_nr_of_requests = len(replies)
-    all_finished = False
-    nr_finished_before = 0
-    finished_tiles = set()
+    urls_with_col_and_row,
+    on_progress_changed: Callable = None,
+    cancelling_func: Callable[[], bool] = None,
+    max_requests_per_host: int = MAX_REQUESTS_PER_HOST,
+    validators_by_coord: Optional[Dict[Tuple[int, int], dict]] = None,
+    balancer: Optional[EndpointBalancer] = None,
+) -> Iterator[Tuple[Tuple[int, int], Optional[bytes], dict]]:
+    """
+     * Requests the tiles and yields the content of each tile as soon as its request has finished.
+     * A tile can be available from several endpoints, the balancer chooses the endpoint of each request and limits
+       the number of requests running per host. The next request is started as soon as one of them has finished.
+       Meanwhile the thread waits in an event loop for the finished signals of the replies.
+     * If an endpoint fails, the tile is requested from another one, if there is any.
+     * The requests that are still running when cancelling or when the caller stops iterating are aborted.
+     * Tiles with validators of a cached response are requested conditionally. If such a tile didn't change, its content
+       is None.
+    :param urls_with_col_and_row: (url, col, row) for each tile, where url is either a single URL or a list of URLs of
+     the tile at the different endpoints
+    :param balancer: Chooses the endpoints, keeps the statistics of the endpoints for subsequent loads
+    :return: (tile coord, content, validators of the response) for each tile that has been loaded successfully
+    """
+    validators_by_coord = validators_by_coord or {}
+    if not balancer:
+        balancer = EndpointBalancer(max_requests_per_host=max_requests_per_host)
+    # (urls, tile coord, hosts of the urls, hosts tried already) of each request
+    waiting: Deque[Tuple[List[str], Tuple[int, int], FrozenSet[str], Set[str]]] = deque()
+    for url, col, row in urls_with_col_and_row:
+        urls = [url] if isinstance(url, str) else list(url)
+        if urls:
+            waiting.append((urls, (col, row), frozenset(get_host(u) for u in urls), set()))
+    all_hosts = frozenset().union(*(hosts for _, _, hosts, _ in waiting))
+    running: Dict[QNetworkReply, Tuple[Tuple[List[str], Tuple[int, int], FrozenSet[str], Set[str]], str, float]] = {}
+    finished: Deque[Tuple[QNetworkReply, Tuple[int, int]]] = deque()
+    closing = False
+
+    loop = QEventLoop()
+    # wakes the loop up regularly, thus cancelling is noticed even if no request finishes
+    cancel_check_timer = QTimer()
+    cancel_check_timer.setInterval(_CANCEL_CHECK_INTERVAL_MSEC)
+    cancel_check_timer.timeout.connect(loop.quit)
+
+    def take_finished(reply: QNetworkReply):
+        """
+         * Moves the finished request either to the finished ones or back to the waiting ones, to retry it on another
+           endpoint
+        """
+        request, url, start_time = running.pop(reply)
+        failed = _is_endpoint_failure(reply)
+        balancer.request_finished(url, seconds=time.monotonic() - start_time, failed=failed)
+        urls, tile_coord, hosts, tried_hosts = request
+        tried_hosts.add(get_host(url))
+        if failed and not hosts <= tried_hosts:
+            debug("Retrying {} on another endpoint", remove_key(url))
+            reply.deleteLater()
+            waiting.appendleft(request)
+        else:
+            finished.append((reply, tile_coord))
+
+    def on_finished(reply: QNetworkReply):
+        if reply not in running:
+            return
+        if closing:
+            _, url, _ = running.pop(reply)
+            balancer.request_finished(url, seconds=None, failed=False)
+            reply.deleteLater()
+            return
+        take_finished(reply)
+        start_requests()
+        loop.quit()
+
+    def start_requests():
+        """
+         * Starts the waiting requests in their order, as long as a host has capacity left. A request that can't be
+           placed, e.g. a retry whose untried hosts are busy, doesn't hold up the requests behind it.
+        """
+        finished_synchronously = True
+        while finished_synchronously:
+            finished_synchronously = []
+            busy_hosts = set()
+            i = 0
+            while i < len(waiting) and not all_hosts <= busy_hosts:
+                request = waiting[i]
+                urls, tile_coord, hosts, tried_hosts = request
+                untried_hosts = hosts - tried_hosts
+                if untried_hosts <= busy_hosts:
+                    i += 1
+                    continue
+                url = balancer.choose(urls, excluded_hosts=tried_hosts)
+                if not url:
+                    busy_hosts.update(untried_hosts)
+                    i += 1
+                    continue
+                del waiting[i]
+                reply = http_get_async(url, validators=validators_by_coord.get(tile_coord))
+                balancer.request_started(url)
+                running[reply] = (request, url, time.monotonic())
+                reply.finished.connect(partial(on_finished, reply))
+                if reply.isFinished():
+                    # taken after the scan, a retry would change the waiting requests while they're iterated
+                    finished_synchronously.append(reply)
+            for reply in finished_synchronously:
+                take_finished(reply)
+
+    nr_remaining = len(waiting)
     nr_finished = 0
-    all_results = []
-    cancelling = False
-    while not all_finished:
-        cancelling: bool = cancelling_func and cancelling_func()
-        if cancelling:
-            break
-
-        new_finished = list(filter(lambda r: r[0].isFinished() and r[1] not in finished_tiles, replies))
-        nr_finished += len(new_finished)
-        for reply, tile_coord in new_finished:
-            finished_tiles.add(tile_coord)
+    try:
+        start_requests()
+        while nr_remaining:
+            if cancelling_func and cancelling_func():
+                break
+            if not finished:
+                cancel_check_timer.start()
+                loop.exec_()
+                cancel_check_timer.stop()
+                continue
+
+            reply, tile_coord = finished.popleft()
+            nr_remaining -= 1
+            nr_finished += 1
+            content = None
+            loaded = False
             if reply.error():
                 warn(
                     "Error during network request: {}, {}",
                     remove_key(reply.errorString()),
                     remove_key(reply.url().toDisplayString()),
                 )
+            elif reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) == 304:
+                loaded = True
             else:
                 content = reply.readAll().data()
-                all_results.append((tile_coord, content))
+                loaded = True
+            validators = get_cache_validators(reply) if loaded else None
             reply.deleteLater()
-        QApplication.processEvents()
-        all_finished = nr_finished == total_nr_of_requests
-        if nr_finished != nr_finished_before:
-            nr_finished_before = nr_finished
             if on_progress_changed:
                 on_progress_changed(nr_finished)
-    if not all_finished and cancelling:
-        unfinished_requests = [reply for reply, tile_coord in replies if not reply.isFinished]
-        for r in unfinished_requests:
-            r.abort()
-    if cancelling:
-        all_results = []
-    return all_results
+            if loaded:
+                yield tile_coord, content, validators
+    finally:
+        cancel_check_timer.stop()
+        closing = True
+        waiting.clear()
+        for reply in list(running):
+            reply.abort()
+        for reply, (_, url, _) in list(running.items()):
+            balancer.request_finished(url, seconds=None, failed=False)
+            reply.deleteLater()
+        running.clear()
+        for reply, _ in finished:
+            reply.deleteLater()
+
+
+def _is_endpoint_failure(reply: QNetworkReply) -> bool:
+    """
+     * Returns whether the endpoint failed to respond, in contrast to responses like 404 that another endpoint would
+       respond with as well
+    """
+    status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+    if status is None:
+        return bool(reply.error())
+    return status >= 500 or status == 429
 
 
 def http_get(url: str) -> Tuple[int, str]:
@@ -0,0 +1,221 @@
+"""
+ * Reads PMTiles v3 archives (https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md).
+ * An archive is a single file: a header, the root directory, the metadata, the leaf directories and the tile data.
+   The directories map the tile ids, i.e. the positions of the tiles on a Hilbert curve over all zoom levels, to byte
+   ranges of the tile data. An entry with a run length greater than 1 stands for consecutive tiles with the same
+   content, an entry with run length 0 points to a leaf directory.
+"""
+import gzip
+import mmap
+import struct
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+_MAGIC = b"PMTiles"
+_VERSION = 3
+_HEADER = struct.Struct("<7sB8Q3Q4B2B4iB2i")
+
+COMPRESSION_UNKNOWN = 0
+COMPRESSION_NONE = 1
+COMPRESSION_GZIP = 2
+# brotli and zstd aren't available in the standard library, gzipped tiles are unzipped by the decoders
+SUPPORTED_COMPRESSIONS = (COMPRESSION_UNKNOWN, COMPRESSION_NONE, COMPRESSION_GZIP)
+TILE_TYPE_MVT = 1
+
+# the root directory and up to three levels of leaf directories
+_MAX_DIRECTORY_DEPTH = 4
+_MAX_CACHED_DIRECTORIES = 128
+
+
+def zxy_to_tile_id(zoom_level: int, x: int, y: int) -> int:
+    """
+     * Returns the tile id of the tile, i.e. the number of tiles of the lower zoom levels plus the position of the tile
+       on the Hilbert curve of its zoom level
+    """
+    size = 1 << zoom_level
+    if not 0 <= x < size or not 0 <= y < size:
+        raise ValueError("The tile {}/{}/{} is out of bounds".format(zoom_level, x, y))
+    tile_id = ((1 << (2 * zoom_level)) - 1) // 3
+    s = size >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = size - 1 - x
+                y = size - 1 - y
+            x, y = y, x
+        s >>= 1
+    return tile_id
+
+
+class PMTilesArchive:
+    """
+     * A local archive, which is mapped into memory. Thus only the pages of the directories and the tiles that are
+       actually read are loaded from the file, and they are shared by all threads.
+     * The decompressed directories are cached, the most recently used ones are kept.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header = _read_header(self._data)
+        except:
+            self.close()
+            raise
+        self._directories: "OrderedDict[Tuple[int, int], _Directory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        data = getattr(self, "_data", None)
+        if data is not None:
+            data.close()
+        self._file.close()
+
+    def metadata(self) -> dict:
+        data = self.read(self.header["metadata_offset"], self.header["metadata_length"])
+        if not data:
+            return {}
+        return json.loads(self._decompress(data).decode("utf-8"))
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self._data[offset : offset + length]
+
+    def find_tile(self, tile_id: int) -> Optional[Tuple[int, int]]:
+        """
+         * Returns the byte range of the tile in the file, tiles with the same content have the same range
+        :return: (offset, length) or None if the archive doesn't contain the tile
+        """
+        offset = self.header["root_offset"]
+        length = self.header["root_length"]
+        for _ in range(_MAX_DIRECTORY_DEPTH):
+            entry = self._get_directory(offset, length).find(tile_id)
+            if not entry:
+                return None
+            entry_offset, entry_length, run_length = entry
+            if run_length:
+                return self.header["tile_data_offset"] + entry_offset, entry_length
+            offset = self.header["leaf_directory_offset"] + entry_offset
+            length = entry_length
+        return None
+
+    def _get_directory(self, offset: int, length: int) -> "_Directory":
+        key = (offset, length)
+        with self._lock:
+            directory = self._directories.get(key)
+            if directory:
+                self._directories.move_to_end(key)
+                return directory
+        directory = _Directory(self._decompress(self.read(offset, length)))
+        with self._lock:
+            self._directories[key] = directory
+            if len(self._directories) > _MAX_CACHED_DIRECTORIES:
+                self._directories.popitem(last=False)
+        return directory
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.header["internal_compression"] == COMPRESSION_GZIP:
+            return gzip.decompress(data)
+        return data
+
+
+class _Directory:
+    def __init__(self, data: bytes):
+        nr_entries, pos = _read_varint(data, 0)
+        self.tile_ids: List[int] = []
+        tile_id = 0
+        for _ in range(nr_entries):
+            delta, pos = _read_varint(data, pos)
+            tile_id += delta
+            self.tile_ids.append(tile_id)
+        self.run_lengths: List[int] = []
+        for _ in range(nr_entries):
+            run_length, pos = _read_varint(data, pos)
+            self.run_lengths.append(run_length)
+        self.lengths: List[int] = []
+        for _ in range(nr_entries):
+            length, pos = _read_varint(data, pos)
+            self.lengths.append(length)
+        self.offsets: List[int] = []
+        for i in range(nr_entries):
+            value, pos = _read_varint(data, pos)
+            if value == 0 and i > 0:
+                # the data of the entry follows the data of the previous entry
+                self.offsets.append(self.offsets[i - 1] + self.lengths[i - 1])
+            else:
+                self.offsets.append(value - 1)
+
+    def find(self, tile_id: int) -> Optional[Tuple[int, int, int]]:
+        """
+         * Returns the entry containing the tile, or the entry of the leaf directory that may contain it
+        :return: (offset, length, run_length) or None
+        """
+        i = bisect_right(self.tile_ids, tile_id) - 1
+        if i < 0:
+            return None
+        run_length = self.run_lengths[i]
+        if run_length and tile_id - self.tile_ids[i] >= run_length:
+            return None
+        return self.offsets[i], self.lengths[i], run_length
+
+
+def _read_header(data) -> dict:
+    if len(data) < _HEADER.size:
+        raise ValueError("The file is too small")
+    values = _HEADER.unpack_from(data, 0)
+    if values[0] != _MAGIC:
+        raise ValueError("The file is not a PMTiles archive")
+    if values[1] != _VERSION:
+        raise ValueError("The PMTiles version {} is not supported".format(values[1]))
+    names = [
+        "root_offset",
+        "root_length",
+        "metadata_offset",
+        "metadata_length",
+        "leaf_directory_offset",
+        "leaf_directory_length",
+        "tile_data_offset",
+        "tile_data_length",
+        "nr_addressed_tiles",
+        "nr_tile_entries",
+        "nr_tile_contents",
+        "clustered",
+        "internal_compression",
+        "tile_compression",
+        "tile_type",
+        "min_zoom",
+        "max_zoom",
+        "min_lon_e7",
+        "min_lat_e7",
+        "max_lon_e7",
+        "max_lat_e7",
+        "center_zoom",
+        "center_lon_e7",
+        "center_lat_e7",
+    ]
+    header = dict(zip(names, values[2:]))
+    if header["internal_compression"] not in SUPPORTED_COMPRESSIONS:
+        raise ValueError("The compression of the directories is not supported")
+    return header
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .mp_helper import unzip
+from .tile_helper import VectorTile
+
+
+class SharedTiles:
+    """
+     * Keeps track of the tiles which share their data, i.e. tiles with the same content_id like the tiles of a
+       deduplicated mbtiles file. The data of these tiles is decompressed and decoded only once.
+     * The python decoder returns the features in tile coordinates, thus only the first tile with a content is decoded
+       and the others get its decoded data. The native decoder returns georeferenced features, thus each tile is
+       decoded, but from the data which has been decompressed only once. The data of a content with a single tile is
+       passed on compressed, thus it's decompressed by the decoder worker rather than on the loading thread.
+    """
+
+    def __init__(self, share_decoded_data: bool):
+        """
+        :param share_decoded_data: Whether the decoded data doesn't depend on the location of the tile
+        """
+        self._share_decoded_data = share_decoded_data
+        self._waiting: Dict[object, List[VectorTile]] = {}
+        self._decoded: Dict[object, dict] = {}
+        self._ready: List[VectorTile] = []
+        self._last_unzipped: Tuple[object, bytes] = (None, None)
+
+    def filter(self, tiles: Iterable[Tuple[VectorTile, bytes]]) -> Iterator[Tuple[VectorTile, bytes]]:
+        """
+         * Yields the tiles which have to be decoded. The others are returned by pop_ready() as soon as the decoded data
+           of their content is available.
+        :param tiles: The (tile, data) tuples of the source
+        """
+        for tile, data in tiles:
+            content_id = tile.content_id
+            if content_id is None:
+                yield tile, data
+            elif not self._share_decoded_data and tile.nr_of_tiles_with_content < 2:
+                yield tile, data
+            elif not self._share_decoded_data:
+                if self._last_unzipped[0] != content_id:
+                    self._last_unzipped = (content_id, unzip(data))
+                yield tile, self._last_unzipped[1]
+            elif content_id in self._decoded:
+                self._set_decoded_data(tile, self._decoded[content_id])
+            elif content_id in self._waiting:
+                self._waiting[content_id].append(tile)
+            else:
+                self._waiting[content_id] = []
+                yield tile, data
+
+    def set_decoded(self, tile: VectorTile, decoded_data: dict) -> None:
+        """
+         * Shares the decoded data of the tile with the other tiles of its content
+        """
+        content_id = tile.content_id
+        if content_id is None or not self._share_decoded_data:
+            return
+        self._decoded[content_id] = decoded_data
+        for t in self._waiting.pop(content_id, []):
+            self._set_decoded_data(t, decoded_data)
+
+    def pop_ready(self) -> List[VectorTile]:
+        """
+         * Returns the tiles which got the decoded data of another tile since the last call
+        """
+        ready = self._ready
+        self._ready = []
+        return ready
+
+    def _set_decoded_data(self, tile: VectorTile, decoded_data: dict) -> None:
+        if decoded_data:
+            tile.decoded_data = decoded_data
+            self._ready.append(tile)
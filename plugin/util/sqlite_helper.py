@@ -0,0 +1,91 @@
+"""
+ * Pool of read-only SQLite connections, thus a file is opened once per session instead of once per load.
+ * A connection is used by one thread at a time only, but may be reused by another thread afterwards, since each load
+   runs on a new thread.
+"""
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .log_helper import debug
+
+# the files are mapped into memory up to this size, which saves copying the pages into the page cache of SQLite
+_MMAP_SIZE = 1024 * 1024 * 1024
+_CACHE_SIZE_KIB = 32 * 1024
+_MAX_IDLE_CONNECTIONS_PER_FILE = 4
+
+_lock = threading.Lock()
+_idle_connections: Dict[Tuple[str, int, int], List[sqlite3.Connection]] = {}
+_keys_of_acquired_connections: Dict[sqlite3.Connection, Tuple[str, int, int]] = {}
+
+
+def get_read_only_uri(path: str) -> str:
+    """
+     * Returns the URI to open the file read-only. The file is treated as immutable, i.e. SQLite neither locks it nor
+       checks it for changes by other connections.
+    """
+    return "{}?mode=ro&immutable=1".format(pathlib.Path(os.path.abspath(path)).as_uri())
+
+
+def acquire_connection(path: str) -> sqlite3.Connection:
+    """
+     * Returns an idle connection to the file or opens a new one. The connection has to be returned to the pool with
+       release_connection() as soon as the current thread doesn't use it anymore.
+    """
+    key = _get_key(path)
+    with _lock:
+        idle = _idle_connections.get(key)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        conn = _open_connection(path)
+    with _lock:
+        _keys_of_acquired_connections[conn] = key
+    return conn
+
+
+def release_connection(conn: sqlite3.Connection) -> None:
+    """
+     * Returns the connection to the pool, thus it can be reused by the next load of the file
+    """
+    with _lock:
+        key = _keys_of_acquired_connections.pop(conn, None)
+        idle = _idle_connections.setdefault(key, []) if key else None
+        if idle is not None and len(idle) < _MAX_IDLE_CONNECTIONS_PER_FILE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def close_idle_connections(path: Optional[str] = None) -> None:
+    """
+     * Closes the idle connections to the specified file or to all files
+    """
+    if path:
+        path = os.path.abspath(path)
+    with _lock:
+        keys = [k for k in _idle_connections if not path or k[0] == path]
+        connections = [conn for k in keys for conn in _idle_connections.pop(k)]
+    for conn in connections:
+        conn.close()
+
+
+def _get_key(path: str) -> Tuple[str, int, int]:
+    """
+     * The connections are immutable, thus a file which has been replaced must not be read with the connections to
+       its previous version
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    debug("Opening connection to: {}", path)
+    conn = sqlite3.connect(get_read_only_uri(path), uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute("PRAGMA mmap_size = {}".format(_MMAP_SIZE))
+    conn.execute("PRAGMA cache_size = -{}".format(_CACHE_SIZE_KIB))
+    return conn
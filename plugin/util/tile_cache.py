@@ -0,0 +1,816 @@
+"""
+ * Cache of the tiles in two tiers: The original tiles of remote sources, as they have been loaded, and the decoded
+   tiles on top of it. Thus a tile isn't loaded again if only the options of the decoding changed.
+ * The tiles of each cache name are stored in a single SQLite database in WAL mode instead of a file per tile. Thus
+   the visible tiles are looked up with one query. The decoded tiles are cached per source and namespace, i.e. the
+   plugin version and the options of the decoding, the original tiles per source.
+ * The decoded data is pickled and compressed, the original tiles are stored as they are. Entries expire after the
+   max_age of the server's response or after max_cache_age_minutes. Expired entries with validators are kept, thus
+   they can be revalidated by the server.
+ * The size of the caches of each tier is bounded by a budget per cache and a budget for all caches of the tier,
+   which count the bytes of the stored data. Once a budget is exceeded, a background janitor evicts the least
+   recently used entries. It also removes the expired entries periodically, thus they don't stay on disk until they
+   are requested again, and the caches which haven't been used for a while, e.g. the ones of a previous version.
+ * The most recently used decoded tiles are kept in memory in front of the databases, thus panning over the same area
+   neither reads nor unpickles them again.
+"""
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, Type
+
+from .file_helper import get_cache_directory, get_valid_filename, max_cache_age_minutes
+from .log_helper import critical, debug, info, warn
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle as pickle
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+# (zoom_level, column, row)
+TileKey = Tuple[int, int, int]
+
+# the cached data is written once but read on every pan, thus it's compressed quickly rather than tightly
+_COMPRESSION_LEVEL = 1
+
+TIER_DECODED = "decoded"
+TIER_RAW = "raw"
+
+# the decoded tiles are several times larger than the original ones, they're kept for a shorter time thus
+DEFAULT_MAX_BYTES_PER_CACHE = 128 * 1024 * 1024
+DEFAULT_MAX_TOTAL_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_RAW_BYTES_PER_CACHE = 256 * 1024 * 1024
+DEFAULT_MAX_RAW_TOTAL_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+
+# measured with the sample data: the objects of a decoded tile take about 32 to 40 times its stored, compressed size
+_MEMORY_BYTES_PER_STORED_BYTE = 35
+
+# the janitor evicts entries until the size is below this fraction of the budget, thus it doesn't run after every write
+_LOW_WATER_MARK = 0.9
+_EVICTION_BATCH_SIZE = 256
+_JANITOR_INTERVAL_SECONDS = 10 * 60
+# a cache without an access for this time is removed as a whole, e.g. the namespace of a previous plugin version
+_UNUSED_CACHE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+# the access time of an entry is only updated if it's older, thus panning doesn't write on every read
+_ACCESS_TIME_RESOLUTION_SECONDS = 60
+
+_SCHEMA_VERSION = 2
+# the small columns precede the data, thus they are read without loading the overflow pages of the data
+_CREATE_TABLE_SQL = """CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    validators TEXT,
+    data BLOB NOT NULL,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+) WITHOUT ROWID"""
+_CREATE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS tiles_accessed_at ON tiles (accessed_at)"
+_WHERE_KEY_SQL = "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?"
+
+_lock = threading.Lock()
+_caches_by_path: Dict[str, "TileCache"] = {}
+_janitor: Optional["_Janitor"] = None
+# (max. bytes per cache, max. bytes of all caches) by tier
+_budgets: Dict[str, Tuple[int, int]] = {
+    TIER_DECODED: (DEFAULT_MAX_BYTES_PER_CACHE, DEFAULT_MAX_TOTAL_BYTES),
+    TIER_RAW: (DEFAULT_MAX_RAW_BYTES_PER_CACHE, DEFAULT_MAX_RAW_TOTAL_BYTES),
+}
+_memory_cache: Optional["MemoryTileCache"] = None
+
+
+class CacheStatistics:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.written_bytes = 0
+        self.stored_bytes = 0
+
+    def add(self, other: "CacheStatistics") -> None:
+        self.hits += other.hits
+        self.misses += other.misses
+        self.evictions += other.evictions
+        self.evicted_bytes += other.evicted_bytes
+        self.written_bytes += other.written_bytes
+        self.stored_bytes += other.stored_bytes
+
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def __str__(self):
+        return "{} hits, {} misses ({:.0%} hits), {} evictions ({}), {} written, {} stored".format(
+            self.hits,
+            self.misses,
+            self.hit_ratio(),
+            self.evictions,
+            format_bytes(self.evicted_bytes),
+            format_bytes(self.written_bytes),
+            format_bytes(self.stored_bytes),
+        )
+
+
+def format_bytes(nr_of_bytes: int) -> str:
+    if nr_of_bytes < 1024 * 1024:
+        return "{:.1f} KB".format(nr_of_bytes / 1024)
+    return "{:.1f} MB".format(nr_of_bytes / 1024 / 1024)
+
+
+def get_tile_cache(cache_name: str) -> "TileCache":
+    """
+     * Returns the cache of the decoded tiles with the specified name, which is shared by all readers
+    """
+    return _get_cache_at(TileCache, cache_name)
+
+
+def get_raw_tile_cache(cache_name: str) -> "RawTileCache":
+    """
+     * Returns the cache of the original tiles with the specified name, which is shared by all readers
+    """
+    return _get_cache_at(RawTileCache, cache_name)
+
+
+def close_tile_caches() -> None:
+    """
+     * Stops the janitor and closes all caches, e.g. before the cache directory is removed
+    """
+    global _janitor
+    with _lock:
+        janitor = _janitor
+        _janitor = None
+    if janitor:
+        janitor.stop()
+    with _lock:
+        caches = list(_caches_by_path.values())
+        _caches_by_path.clear()
+    for cache in caches:
+        cache.close()
+    get_memory_tile_cache().clear()
+
+
+def get_memory_tile_cache() -> "MemoryTileCache":
+    """
+     * Returns the memory cache of the decoded tiles, which is shared by all readers
+    """
+    global _memory_cache
+    with _lock:
+        if not _memory_cache:
+            _memory_cache = MemoryTileCache(DEFAULT_MAX_MEMORY_BYTES)
+    return _memory_cache
+
+
+def set_cache_budgets(max_bytes_per_cache: int, max_total_bytes: int, tier: str = TIER_DECODED) -> None:
+    """
+     * Sets the budgets of the caches of the tier. The janitor evicts entries, if a cache or all caches of the tier
+       together exceed them. It isn't woken up here, but on its next periodic run or write beyond a budget, thus a
+       budget being edited doesn't evict entries in between.
+    """
+    _budgets[tier] = (max_bytes_per_cache, max_total_bytes)
+    debug(
+        "Budgets of the {} tiles: {} per cache, {} in total",
+        tier,
+        format_bytes(max_bytes_per_cache),
+        format_bytes(max_total_bytes),
+    )
+
+
+def get_cache_statistics(tier: str = TIER_DECODED) -> CacheStatistics:
+    """
+     * Returns the sum of the statistics of the open caches of the tier
+    """
+    with _lock:
+        caches = [cache for cache in _caches_by_path.values() if cache.tier == tier]
+    statistics = CacheStatistics()
+    for cache in caches:
+        statistics.add(cache.statistics())
+    return statistics
+
+
+def clean_up_caches() -> None:
+    """
+     * Removes the expired entries and evicts the least recently used entries of the caches which exceed their budget.
+       Then the least recently used entries of all caches of a tier are evicted, until they are within the total
+       budget of the tier.
+     * The caches of previous sessions are included, thus they are part of the total budget as well. The ones which
+       haven't been used for _UNUSED_CACHE_MAX_AGE_SECONDS are removed.
+    """
+    caches = _remove_unused_caches(_get_caches_on_disk())
+    for tier, (max_bytes_per_cache, max_total_bytes) in _budgets.items():
+        _clean_up_tier([cache for cache in caches if cache.tier == tier], max_bytes_per_cache, max_total_bytes)
+    for cache in caches:
+        cache.compact()
+
+
+def _remove_unused_caches(caches: List["TileCache"]) -> List["TileCache"]:
+    """
+     * Removes the databases of the caches without a recent access. Namespaces aren't cleared when the options or the
+       plugin version change, they're garbage collected here instead.
+    :return: The remaining caches
+    """
+    unused_since = time.time() - _UNUSED_CACHE_MAX_AGE_SECONDS
+    remaining_caches = []
+    for cache in caches:
+        last_access_time = cache.newest_access_time()
+        if last_access_time is not None and last_access_time < unused_since:
+            info("Removing the cache '{}', which hasn't been used since {}", cache.name, time.ctime(last_access_time))
+            cache.remove()
+            with _lock:
+                _caches_by_path.pop(cache.path, None)
+        else:
+            remaining_caches.append(cache)
+    return remaining_caches
+
+
+def _clean_up_tier(caches: List["TileCache"], max_bytes_per_cache: int, max_total_bytes: int) -> None:
+    for cache in caches:
+        cache.remove_expired()
+        cache.evict(int(max_bytes_per_cache * _LOW_WATER_MARK))
+
+    total_bytes = sum(cache.stored_bytes for cache in caches)
+    max_total_bytes = int(max_total_bytes * _LOW_WATER_MARK)
+    while total_bytes > max_total_bytes:
+        access_times = [(cache.oldest_access_time(), cache) for cache in caches]
+        access_times = [(accessed_at, cache) for accessed_at, cache in access_times if accessed_at is not None]
+        if not access_times:
+            break
+        _, cache = min(access_times, key=lambda a: a[0])
+        evicted_bytes = cache.evict_least_recently_used(_EVICTION_BATCH_SIZE, max_bytes=total_bytes - max_total_bytes)
+        if not evicted_bytes:
+            break
+        total_bytes -= evicted_bytes
+
+
+class TileCache:
+    """
+     * The decoded tiles of a source and namespace
+    """
+
+    tier = TIER_DECODED
+    file_extension = ".sqlite"
+
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path or _get_cache_path(name, self.file_extension)
+        self.stored_bytes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._statistics = CacheStatistics()
+        self._nr_of_removals_since_compaction = 0
+
+    def statistics(self) -> CacheStatistics:
+        with self._lock:
+            statistics = CacheStatistics()
+            statistics.add(self._statistics)
+            statistics.stored_bytes = self.stored_bytes
+        return statistics
+
+    def get_many(self, keys: Iterable[TileKey]) -> Tuple[Dict[TileKey, dict], Dict[TileKey, dict]]:
+        """
+         * Looks up the tiles, one query per zoom level.
+         * Expired entries are removed, unless they can be revalidated with the validators of their response.
+        :return: The decoded data of the cached tiles which aren't expired, and the validators of the expired tiles
+        """
+        entries_by_key, validators_by_key = self.get_entries(keys)
+        return {key: decoded_data for key, (decoded_data, _, _) in entries_by_key.items()}, validators_by_key
+
+    def get_entries(
+        self, keys: Iterable[TileKey]
+    ) -> Tuple[Dict[TileKey, Tuple[dict, float, int]], Dict[TileKey, dict]]:
+        """
+         * Like get_many(), but returns the time of expiry and the stored size along with the decoded data of each entry
+        :return: (decoded data, expires_at, stored size) of the cached tiles which aren't expired, and the validators
+         of the expired tiles
+        """
+        keys = set(keys)
+        entries_by_key = {}
+        validators_by_key = {}
+        if not keys:
+            return entries_by_key, validators_by_key
+
+        now = time.time()
+        sql = """SELECT tile_column, tile_row, stored_at, accessed_at, size, validators, data FROM tiles
+            WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?"""
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                expired_keys = []
+                accessed_keys = []
+                for zoom_level, x_min, x_max, y_min, y_max in _get_bounds_by_zoom_level(keys):
+                    for col, row, stored_at, accessed_at, size, validators, data in conn.execute(
+                        sql, (zoom_level, x_min, x_max, y_min, y_max)
+                    ):
+                        key = (zoom_level, col, row)
+                        if key not in keys:
+                            continue
+                        validators = json.loads(validators) if validators else None
+                        expires_at = get_expiry_time(stored_at, validators)
+                        if now <= expires_at:
+                            entries_by_key[key] = (data, expires_at, size)
+                            if now - accessed_at > _ACCESS_TIME_RESOLUTION_SECONDS:
+                                accessed_keys.append((now, *key))
+                        elif _can_be_revalidated(validators):
+                            validators_by_key[key] = validators
+                        else:
+                            expired_keys.append(key)
+                            self.stored_bytes -= size
+                if expired_keys or accessed_keys:
+                    with conn:
+                        conn.executemany("DELETE FROM tiles {}".format(_WHERE_KEY_SQL), expired_keys)
+                        conn.executemany("UPDATE tiles SET accessed_at = ? {}".format(_WHERE_KEY_SQL), accessed_keys)
+                    self._nr_of_removals_since_compaction += len(expired_keys)
+                self._statistics.hits += len(entries_by_key)
+                self._statistics.misses += len(keys) - len(entries_by_key)
+            entries_by_key = {
+                key: (self._deserialize(data), expiry, size) for key, (data, expiry, size) in entries_by_key.items()
+            }
+        except:
+            critical("Error while reading cache '{}': {}", self.path, sys.exc_info()[1])
+            entries_by_key = {}
+        return entries_by_key, validators_by_key
+
+    def put_many(self, entries: Iterable[Tuple[TileKey, dict, Optional[dict]]]) -> Dict[TileKey, int]:
+        """
+         * Stores the decoded data of the tiles in one transaction.
+         * The janitor is woken up, if the cache exceeds its budget or all caches exceed the total budget.
+        :param entries: (key, decoded data, validators of the response of the tile as returned by
+         network_helper.get_cache_validators())
+        :return: The stored sizes of the tiles which have been cached
+        """
+        now = time.time()
+        rows = []
+        for key, decoded_data, validators in entries:
+            if not decoded_data:
+                warn("Trying to cache a tile without data: {}: {}", self.name, key)
+                continue
+            data = self._serialize(decoded_data)
+            rows.append((*key, now, now, len(data), json.dumps(validators) if validators else None, data))
+        if not rows:
+            return {}
+
+        sql = """INSERT OR REPLACE INTO tiles
+            (zoom_level, tile_column, tile_row, stored_at, accessed_at, size, validators, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                with conn:
+                    for row in rows:
+                        replaced = conn.execute("SELECT size FROM tiles {}".format(_WHERE_KEY_SQL), row[:3]).fetchone()
+                        if replaced:
+                            self.stored_bytes -= replaced[0]
+                    conn.executemany(sql, rows)
+                written_bytes = sum(row[5] for row in rows)
+                self.stored_bytes += written_bytes
+                self._statistics.written_bytes += written_bytes
+                max_bytes_per_cache, max_total_bytes = _budgets[self.tier]
+                is_over_budget = self.stored_bytes > max_bytes_per_cache
+        except:
+            critical("Error during caching in '{}': {}", self.path, sys.exc_info()[1])
+            return {}
+        if is_over_budget or _get_total_stored_bytes(self.tier) > max_total_bytes:
+            _wake_janitor()
+        return {row[:3]: row[5] for row in rows}
+
+    def refresh(self, key: TileKey, validators: dict) -> Optional[dict]:
+        """
+         * Marks the entry as fresh again, after the server confirmed that the tile didn't change
+        :param validators: The validators of the response, which replace the stored ones
+        :return: The decoded data of the entry
+        """
+        entry = self.refresh_entry(key, validators)
+        return entry[0] if entry else None
+
+    def refresh_entry(self, key: TileKey, validators: dict) -> Optional[Tuple[dict, float, int]]:
+        """
+         * Like refresh(), but returns the time of expiry and the stored size along with the decoded data
+        :return: (decoded data, expires_at, stored size) of the entry
+        """
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                row = conn.execute("SELECT data, size, validators FROM tiles {}".format(_WHERE_KEY_SQL), key).fetchone()
+                if not row:
+                    return None
+                data, size, old_validators = row
+                old_validators = json.loads(old_validators) if old_validators else {}
+                validators = {k: v if v is not None else old_validators.get(k) for k, v in validators.items()}
+                now = time.time()
+                with conn:
+                    conn.execute(
+                        "UPDATE tiles SET stored_at = ?, accessed_at = ?, validators = ? {}".format(_WHERE_KEY_SQL),
+                        (now, now, json.dumps(validators), *key),
+                    )
+            return self._deserialize(data), get_expiry_time(now, validators), size
+        except:
+            critical("Error while refreshing cache entry {} of '{}': {}", key, self.path, sys.exc_info()[1])
+            return None
+
+    def evict(self, max_bytes: int) -> int:
+        """
+         * Evicts the least recently used entries, until the stored data fits into max_bytes
+        :return: The number of evicted bytes
+        """
+        evicted_bytes = 0
+        while self.stored_bytes > max_bytes:
+            evicted = self.evict_least_recently_used(_EVICTION_BATCH_SIZE, max_bytes=self.stored_bytes - max_bytes)
+            if not evicted:
+                break
+            evicted_bytes += evicted
+        return evicted_bytes
+
+    def evict_least_recently_used(self, max_entries: int, max_bytes: Optional[int] = None) -> int:
+        """
+         * Evicts up to max_entries of the least recently used entries, or fewer if max_bytes are evicted before
+        :return: The number of evicted bytes
+        """
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                candidates = conn.execute(
+                    "SELECT zoom_level, tile_column, tile_row, size FROM tiles ORDER BY accessed_at LIMIT ?",
+                    (max_entries,),
+                ).fetchall()
+                keys = []
+                evicted_bytes = 0
+                for zoom_level, col, row, size in candidates:
+                    if max_bytes is not None and evicted_bytes >= max_bytes:
+                        break
+                    keys.append((zoom_level, col, row))
+                    evicted_bytes += size
+                with conn:
+                    conn.executemany("DELETE FROM tiles {}".format(_WHERE_KEY_SQL), keys)
+                self.stored_bytes -= evicted_bytes
+                self._statistics.evictions += len(keys)
+                self._statistics.evicted_bytes += evicted_bytes
+                self._nr_of_removals_since_compaction += len(keys)
+            return evicted_bytes
+        except:
+            critical("Error during eviction from cache '{}': {}", self.path, sys.exc_info()[1])
+            return 0
+
+    def oldest_access_time(self) -> Optional[float]:
+        with self._lock:
+            return self._get_connection().execute("SELECT min(accessed_at) FROM tiles").fetchone()[0]
+
+    def newest_access_time(self) -> Optional[float]:
+        with self._lock:
+            return self._get_connection().execute("SELECT max(accessed_at) FROM tiles").fetchone()[0]
+
+    def remove(self) -> None:
+        """
+         * Removes the database. It's recreated if the cache is used again.
+        """
+        try:
+            with self._lock:
+                if self._conn:
+                    self._conn.close()
+                    self._conn = None
+                self._remove_database()
+                self.stored_bytes = 0
+        except:
+            critical("Error while removing cache '{}': {}", self.path, sys.exc_info()[1])
+
+    def remove_expired(self) -> int:
+        """
+         * Removes the expired entries which can't be revalidated
+        :return: The number of removed entries
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                expired_keys = []
+                removed_bytes = 0
+                for zoom_level, col, row, stored_at, size, validators in conn.execute(
+                    "SELECT zoom_level, tile_column, tile_row, stored_at, size, validators FROM tiles"
+                ):
+                    validators = json.loads(validators) if validators else None
+                    if _is_expired(stored_at, validators, now) and not _can_be_revalidated(validators):
+                        expired_keys.append((zoom_level, col, row))
+                        removed_bytes += size
+                if expired_keys:
+                    with conn:
+                        conn.executemany("DELETE FROM tiles {}".format(_WHERE_KEY_SQL), expired_keys)
+                    self.stored_bytes -= removed_bytes
+                    self._nr_of_removals_since_compaction += len(expired_keys)
+            return len(expired_keys)
+        except:
+            critical("Error while removing expired entries from cache '{}': {}", self.path, sys.exc_info()[1])
+            return 0
+
+    def compact(self) -> None:
+        """
+         * Returns the pages of the removed entries to the file system, thus the file shrinks after an eviction
+        """
+        try:
+            with self._lock:
+                if not self._nr_of_removals_since_compaction:
+                    return
+                conn = self._get_connection()
+                conn.execute("PRAGMA incremental_vacuum").fetchall()
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+                self._nr_of_removals_since_compaction = 0
+        except:
+            critical("Error while compacting cache '{}': {}", self.path, sys.exc_info()[1])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+         * Returns the connection to the database, which is used by one thread at a time, guarded by the lock.
+         * The database is created if it doesn't exist (anymore), e.g. after the cache has been cleared.
+        """
+        if self._conn and not os.path.isfile(self.path):
+            self._conn.close()
+            self._conn = None
+        if not self._conn:
+            try:
+                self._conn = self._open_connection()
+            except sqlite3.DatabaseError:
+                warn("The cache '{}' is corrupt and will be recreated: {}", self.path, sys.exc_info()[1])
+                self._remove_database()
+                self._conn = self._open_connection()
+            self.stored_bytes = int(self._conn.execute("SELECT total(size) FROM tiles").fetchone()[0])
+        return self._conn
+
+    def _open_connection(self) -> sqlite3.Connection:
+        debug("Opening cache: {}", self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._remove_files_of_previous_versions()
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            if not _has_current_schema(conn):
+                debug("The cache '{}' has the schema of a previous version and will be recreated", self.path)
+                conn.close()
+                self._remove_database()
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+            # the vacuum mode can only be changed before the table is created
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(_CREATE_TABLE_SQL)
+            conn.execute(_CREATE_INDEX_SQL)
+            conn.execute("PRAGMA user_version = {}".format(_SCHEMA_VERSION))
+        except:
+            conn.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _serialize(decoded_data: dict) -> bytes:
+        return zlib.compress(pickle.dumps(decoded_data, protocol=pickle.HIGHEST_PROTOCOL), _COMPRESSION_LEVEL)
+
+    @staticmethod
+    def _deserialize(data: bytes) -> dict:
+        return pickle.loads(zlib.decompress(data))
+
+    def _remove_database(self) -> None:
+        for path in [self.path, self.path + "-wal", self.path + "-shm"]:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def _remove_files_of_previous_versions(self) -> None:
+        """
+         * Previous versions stored a pickle file per tile in a directory per cache name
+        """
+        directory = os.path.join(get_cache_directory(), self.name)
+        if os.path.isdir(directory):
+            debug("Removing the cache files of previous versions: {}", directory)
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class RawTileCache(TileCache):
+    """
+     * The original tiles of a remote source, which are usually compressed already, thus they're stored as they are
+    """
+
+    tier = TIER_RAW
+    file_extension = ".raw.sqlite"
+
+    @staticmethod
+    def _serialize(data: bytes) -> bytes:
+        return data
+
+    @staticmethod
+    def _deserialize(data: bytes) -> bytes:
+        return data
+
+
+class MemoryTileCache:
+    """
+     * The most recently used decoded tiles, bounded by the estimated size of their objects.
+     * The decoded data is shared with the readers, thus it must not be modified.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.stored_bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[dict, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._statistics = CacheStatistics()
+
+    def statistics(self) -> CacheStatistics:
+        with self._lock:
+            statistics = CacheStatistics()
+            statistics.add(self._statistics)
+            statistics.stored_bytes = self.stored_bytes
+        return statistics
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, dict]:
+        """
+        :return: The decoded data of the tiles in memory which aren't expired
+        """
+        now = time.time()
+        data_by_key = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if not entry:
+                    self._statistics.misses += 1
+                    continue
+                decoded_data, expires_at, _ = entry
+                if now > expires_at:
+                    self._remove(key)
+                    self._statistics.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                data_by_key[key] = decoded_data
+                self._statistics.hits += 1
+        return data_by_key
+
+    def put(self, key: Hashable, decoded_data: dict, expires_at: float, stored_size: int) -> None:
+        """
+         * Keeps the decoded data and evicts the least recently used tiles, if the estimated size exceeds the budget
+        :param stored_size: The size of the data in the cache on disk, from which the size in memory is estimated
+        """
+        size = estimate_size(stored_size)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (decoded_data, expires_at, size)
+            self.stored_bytes += size
+            self._statistics.written_bytes += size
+            while self.stored_bytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._statistics.evictions += 1
+                self._statistics.evicted_bytes += self._entries[evicted_key][2]
+                self._remove(evicted_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stored_bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        self.stored_bytes -= self._entries.pop(key)[2]
+
+
+class _Janitor(threading.Thread):
+    """
+     * Cleans up the caches in the background, when it's woken up after a budget has been exceeded, or periodically
+    """
+
+    def __init__(self):
+        super().__init__(name="vtr_cache_janitor", daemon=True)
+        self._wake_up = threading.Event()
+        self._stopped = False
+
+    def wake_up(self) -> None:
+        self._wake_up.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake_up.set()
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            self._wake_up.wait(_JANITOR_INTERVAL_SECONDS)
+            self._wake_up.clear()
+            if self._stopped:
+                return
+            try:
+                evictions = get_cache_statistics().evictions
+                clean_up_caches()
+                statistics = get_cache_statistics()
+                if statistics.evictions > evictions:
+                    info("Cache cleaned up: {}", statistics)
+            except:
+                critical("Error while cleaning up the caches: {}", sys.exc_info()[1])
+
+
+def _wake_janitor() -> None:
+    global _janitor
+    with _lock:
+        if not _janitor:
+            _janitor = _Janitor()
+            _janitor.start()
+        _janitor.wake_up()
+
+
+def _get_cache_path(cache_name: str, file_extension: str) -> str:
+    return os.path.join(get_cache_directory(), get_valid_filename(cache_name) + file_extension)
+
+
+def _get_cache_at(cache_class: Type[TileCache], cache_name: str) -> TileCache:
+    path = _get_cache_path(cache_name, cache_class.file_extension)
+    with _lock:
+        cache = _caches_by_path.get(path)
+        if not cache:
+            cache = cache_class(cache_name, path)
+            _caches_by_path[path] = cache
+    return cache
+
+
+def _get_caches_on_disk() -> List[TileCache]:
+    """
+     * Returns the caches of all databases in the cache directory, including the ones which haven't been opened yet
+    """
+    for path in glob.glob(os.path.join(get_cache_directory(), "*.sqlite")):
+        file_name = os.path.basename(path)
+        if file_name.endswith(RawTileCache.file_extension):
+            _get_cache_at(RawTileCache, file_name[: -len(RawTileCache.file_extension)])
+        else:
+            _get_cache_at(TileCache, file_name[: -len(TileCache.file_extension)])
+    with _lock:
+        return [cache for path, cache in _caches_by_path.items() if os.path.isfile(path)]
+
+
+def _get_total_stored_bytes(tier: str) -> int:
+    with _lock:
+        return sum(cache.stored_bytes for cache in _caches_by_path.values() if cache.tier == tier)
+
+
+def _has_current_schema(conn: sqlite3.Connection) -> bool:
+    """
+     * Returns False if the database contains the table of a previous version
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+        return True
+    return not conn.execute("SELECT count(*) FROM sqlite_master").fetchone()[0]
+
+
+def _get_bounds_by_zoom_level(keys: Iterable[TileKey]) -> List[Tuple[int, int, int, int, int]]:
+    """
+     * Returns (zoom_level, x_min, x_max, y_min, y_max) of the keys of each zoom level
+    """
+    bounds: Dict[int, List[int]] = {}
+    for zoom_level, col, row in keys:
+        b = bounds.get(zoom_level)
+        if b:
+            b[0] = min(b[0], col)
+            b[1] = max(b[1], col)
+            b[2] = min(b[2], row)
+            b[3] = max(b[3], row)
+        else:
+            bounds[zoom_level] = [col, col, row, row]
+    return [(zoom_level, *b) for zoom_level, b in bounds.items()]
+
+
+def get_expiry_time(stored_at: float, validators: Optional[dict]) -> float:
+    """
+     * Returns the time at which an entry expires, after the max_age of the server's response or after
+       max_cache_age_minutes
+    """
+    max_age_seconds = max_cache_age_minutes * 60
+    if validators and validators.get("max_age") is not None:
+        max_age_seconds = validators["max_age"]
+    return stored_at + max_age_seconds
+
+
+def estimate_size(stored_size: int) -> int:
+    """
+     * Returns the estimated number of bytes of the objects of decoded data, which is derived from its size in the
+       cache on disk, as walking all objects or pickling them again would take much longer
+    """
+    return stored_size * _MEMORY_BYTES_PER_STORED_BYTE
+
+
+def _is_expired(stored_at: float, validators: Optional[dict], now: float) -> bool:
+    return now > get_expiry_time(stored_at, validators)
+
+
+def _can_be_revalidated(validators: Optional[dict]) -> bool:
+    return bool(validators and (validators.get("etag") or validators.get("last_modified")))
@@ -59,6 +59,14 @@ class Bounds(dict):
 
 class VectorTile:
     decoded_data = {}
+    # identifies the data of the tile if the source shares it between tiles, e.g. the tile_id of deduplicated mbtiles
+    content_id = None
+    # the number of tiles the source returns with the content of this tile
+    nr_of_tiles_with_content = 1
+    # the validators of the server's response, thus the cache entry of the tile can be revalidated once it expired
+    cache_validators = None
+    # set if the server confirmed that the cached tile didn't change, the tile has no data then
+    not_modified = False
 
     def __init__(self, scheme, zoom_level, x, y):
         self.scheme = scheme
@@ -1,17 +1,24 @@
 import os
 import sqlite3
 import sys
+import threading
 import traceback
 import urllib.parse
-from typing import List, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from .endpoint_balancer import EndpointBalancer
 from .file_helper import is_sqlite_db
 from .log_helper import critical, debug, info, warn
 from .network_helper import load_tiles_async, url_exists
+from .pmtiles import SUPPORTED_COMPRESSIONS, TILE_TYPE_MVT, PMTilesArchive, zxy_to_tile_id
+from .sqlite_helper import acquire_connection, release_connection
 from .tile_helper import WORLD_BOUNDS, Bounds, VectorTile, get_tile_bounds, get_tiles_from_center
 from .tile_json import TileJSON
+from .tile_stats import get_tile_stats
 
 try:
     import simplejson as json
@@ -20,6 +27,16 @@ except ImportError:
 
 
 _DEFAULT_CRS = "EPSG:3857"
+# each range takes 3 parameters, SQLite allows 999 parameters per query in older versions
+_MAX_TILE_RANGES_PER_QUERY = 300
+_FETCH_BATCH_SIZE = 64
+_MAX_IMAGES_PER_QUERY = 900
+_TILE_SIZE_SAMPLE = 100
+_SERVER_PLACEHOLDER_VALUES = ["a", "b", "c", "d"]
+# the files are read concurrently, which pays off especially for network-mounted folders
+_MAX_FILE_READERS = 8
+_TILE_FILE_EXTENSIONS = [".pbf", ".mvt", ".pbf.gz"]
+_CANCEL_CHECK_INTERVAL_SECONDS = 0.1
 
 
 class AbstractSource(QObject):
@@ -44,6 +61,12 @@ class AbstractSource(QObject):
     def close_connection(self):
         pass
 
+    def release_connection(self) -> None:
+        """
+         * Releases the resources the current thread used for loading, e.g. when the loading finished
+        """
+        pass
+
     def name(self) -> str:
         raise NotImplementedError
 
@@ -81,7 +104,14 @@ class AbstractSource(QObject):
     def crs(self):
         raise NotImplementedError
 
-    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+    def caches_raw_tiles(self) -> bool:
+        """
+         * Whether the original tiles are cached, thus they aren't loaded again when only the decoding changes.
+           A local archive reads its tiles as fast as the cache, thus caching them would only take space.
+        """
+        return False
+
+    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None) -> List[Tuple[VectorTile, bytes]]:
         """
          * Loads the tiles for the specified zoom_level and bounds from the web service,
           this source has been created with
@@ -90,6 +120,17 @@ class AbstractSource(QObject):
         :param max_tiles: The maximum number of tiles to be loaded
         :return:
         """
+        return list(self.iter_tiles(zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=max_tiles))
+
+    def iter_tiles(
+        self, zoom_level, tiles_to_load, max_tiles=None, cache_validators=None
+    ) -> Iterator[Tuple[VectorTile, bytes]]:
+        """
+         * Same as load_tiles, but yields each tile as soon as it is loaded, thus the tiles can be processed while
+          further tiles are still being loaded
+        :param cache_validators: The validators of expired cache entries by tile coordinate. Sources which support
+         revalidation yield the tiles that didn't change without data and with not_modified set.
+        """
         raise NotImplementedError
 
 
@@ -110,6 +151,7 @@ class ServerSource(AbstractSource):
         self.url = url
         self.json = TileJSON(url)
         self.json.load()
+        self._balancer = EndpointBalancer()
 
     def source(self):
         return self.url
@@ -123,6 +165,23 @@ class ServerSource(AbstractSource):
     def close_connection(self):
         pass
 
+    def caches_raw_tiles(self) -> bool:
+        return True
+
+    def _get_endpoints(self) -> List[str]:
+        """
+         * Returns the URL templates of all endpoints the tiles are available from. The requests are balanced between
+           them. A template with the placeholder {s} stands for the servers a to d, e.g. for Nextzen.
+        """
+        endpoints = []
+        for tile_url in self.json.tiles():
+            if "{s}" in tile_url:
+                info("Special treatment for Nextzen url...")
+                endpoints.extend(tile_url.replace("{s}", server) for server in _SERVER_PLACEHOLDER_VALUES)
+            else:
+                endpoints.append(tile_url)
+        return endpoints
+
     def name(self):
         name = self.json.name()
         if not name:
@@ -150,11 +209,9 @@ class ServerSource(AbstractSource):
     def crs(self):
         return self.json.crs()
 
-    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None, cache_validators=None):
         self._cancelling = False
-        base_url = self.json.tiles()[0]
-        if "{s}" in base_url:
-            info("Special treatment for Nextzen url...")
+        endpoints = self._get_endpoints()
 
         urls = []
         if max_tiles and len(tiles_to_load) > max_tiles:
@@ -165,21 +222,22 @@ class ServerSource(AbstractSource):
         api_key = ""
         if "api_key" in list(parameters.keys()):
             api_key = parameters["api_key"][0]
-        nextzen_servers = ["a", "b", "c", "d"]
-        for i, t in enumerate(tiles_to_load):
+        for t in tiles_to_load:
             col = t[0]
             row = t[1]
-            load_url = (
-                base_url.replace("{z}", str(int(zoom_level)))
-                .replace("{x}", str(int(col)))
-                .replace("{y}", str(int(row)))
-                .replace("{api_key}", str(api_key))
-                .replace("{s}", nextzen_servers[divmod(i, len(nextzen_servers))[1]])
-            )  # nextzen server placeholder
-            if api_key:
-                load_url += "?api_key={}".format(api_key)
-            urls.append((load_url, col, row))
-            debug("Loading: {}", load_url)
+            load_urls = []
+            for endpoint in endpoints:
+                load_url = (
+                    endpoint.replace("{z}", str(int(zoom_level)))
+                    .replace("{x}", str(int(col)))
+                    .replace("{y}", str(int(row)))
+                    .replace("{api_key}", str(api_key))
+                )
+                if api_key:
+                    load_url += "?api_key={}".format(api_key)
+                load_urls.append(load_url)
+            urls.append((load_urls, col, row))
+            debug("Loading: {}", load_urls[0])
 
         self.max_progress_changed.emit(len(urls))
         self.message_changed.emit("Getting {} tiles from source...".format(len(urls)))
@@ -187,13 +245,15 @@ class ServerSource(AbstractSource):
             urls_with_col_and_row=urls,
             on_progress_changed=lambda p: self.progress_changed.emit(p),
             cancelling_func=lambda: self._cancelling,
+            validators_by_coord=cache_validators,
+            balancer=self._balancer,
         )
-        tiles_with_data = []
-        for coord, data in tile_coords_with_content:
-            tile = VectorTile(self.scheme(), zoom_level=zoom_level, x=coord[0], y=coord[1])
-            tiles_with_data.append((tile, data))
-
-        return tiles_with_data
+        scheme = self.scheme()
+        for coord, data, validators in tile_coords_with_content:
+            tile = VectorTile(scheme, zoom_level=zoom_level, x=coord[0], y=coord[1])
+            tile.cache_validators = validators
+            tile.not_modified = data is None
+            yield tile, data
 
 
 class MBTilesSource(AbstractSource):
@@ -211,8 +271,10 @@ class MBTilesSource(AbstractSource):
             )
 
         self.path = path
-        self.conn = None
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._connections_lock = threading.Lock()
         self._metadata_cache = {}
+        self._deduplicated = None
 
     def source(self):
         return self.path
@@ -267,7 +329,7 @@ class MBTilesSource(AbstractSource):
     def mask_level(self):
         return self._get_metadata_value("maskLevel")
 
-    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None, cache_validators=None):
         """
          * Loads the tiles listed in tiles_to_load for the specified zoom_level.
         :param zoom_level:
@@ -290,65 +352,164 @@ class MBTilesSource(AbstractSource):
             )
         else:
             center_tiles = tiles_to_load
-        where_clause = self._get_where_clause(tiles_to_load=center_tiles, zoom_level=zoom_level)
-
-        sql_command = "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles {};"
-        sql = sql_command.format(where_clause)
-
-        tile_data_tuples = []
-        rows = self._get_from_db(sql=sql)
-        count_sql = "select count(*) 'nr_of_tiles' from tiles WHERE zoom_level = {}".format(zoom_level)
-        total_nr_of_tiles = self._get_single_value(count_sql, "nr_of_tiles")
+        zoom_stats = self._get_zoom_stats(zoom_level)
+        total_nr_of_tiles = zoom_stats["nr_of_tiles"] if zoom_stats else 0
         if max_tiles is not None and max_tiles < total_nr_of_tiles:
             self.tile_limit_reached.emit()
 
-        if rows:
-            self.max_progress_changed.emit(len(rows))
-            for index, row in enumerate(rows):
-                if self._cancelling or (max_tiles and len(tile_data_tuples) >= max_tiles):
-                    break
-                tile, data = self._create_tile(row)
-                tile_data_tuples.append((tile, data))
-                self.progress_changed.emit(index + 1)
-        return tile_data_tuples
+        tile_ranges = self._get_tile_ranges(center_tiles)
+        if tile_ranges:
+            self.max_progress_changed.emit(len(center_tiles))
+        if self._is_deduplicated():
+            tiles = self._iter_deduplicated_tiles(zoom_level=zoom_level, tile_ranges=tile_ranges)
+        else:
+            tiles = self._iter_tiles_of_ranges(zoom_level=zoom_level, tile_ranges=tile_ranges)
+        nr_loaded = 0
+        with closing(tiles):
+            for tile in tiles:
+                if self._cancelling or (max_tiles and nr_loaded >= max_tiles):
+                    return
+                nr_loaded += 1
+                yield tile
+                self.progress_changed.emit(nr_loaded)
+
+    def _iter_tiles_of_ranges(self, zoom_level, tile_ranges):
+        for i in range(0, len(tile_ranges), _MAX_TILE_RANGES_PER_QUERY):
+            sql, params = self._get_tiles_query(
+                zoom_level=zoom_level, tile_ranges=tile_ranges[i : i + _MAX_TILE_RANGES_PER_QUERY]
+            )
+            with closing(self._iter_from_db(sql=sql, params=params)) as rows:
+                for row in rows:
+                    yield self._create_tile(row)
+
+    def _iter_deduplicated_tiles(self, zoom_level, tile_ranges):
+        """
+         * Loads the tiles of a deduplicated mbtiles file, in which tiles with the same content reference the same
+           image. The tile_ids are looked up first, then each image is read only once and returned for all of its
+           tiles, one after the other. The tile_id is set as content_id of the tiles.
+        """
+        tiles_by_content_id = {}
+        scheme = self.scheme()
+        for i in range(0, len(tile_ranges), _MAX_TILE_RANGES_PER_QUERY):
+            sql, params = self._get_tiles_query(
+                zoom_level=zoom_level,
+                tile_ranges=tile_ranges[i : i + _MAX_TILE_RANGES_PER_QUERY],
+                deduplicated=True,
+            )
+            with closing(self._iter_from_db(sql=sql, params=params)) as rows:
+                for row in rows:
+                    tile = VectorTile(scheme, row["zoom_level"], row["tile_column"], row["tile_row"])
+                    tile.content_id = row["tile_id"]
+                    tiles_by_content_id.setdefault(tile.content_id, []).append(tile)
+
+        content_ids = list(tiles_by_content_id)
+        for i in range(0, len(content_ids), _MAX_IMAGES_PER_QUERY):
+            ids = content_ids[i : i + _MAX_IMAGES_PER_QUERY]
+            sql = "SELECT tile_id, tile_data FROM images WHERE tile_id IN ({});".format(", ".join(["?"] * len(ids)))
+            with closing(self._iter_from_db(sql=sql, params=ids)) as rows:
+                for row in rows:
+                    tiles = tiles_by_content_id[row["tile_id"]]
+                    for tile in tiles:
+                        tile.nr_of_tiles_with_content = len(tiles)
+                        yield tile, row["tile_data"]
+
+    def _is_deduplicated(self) -> bool:
+        """
+         * Returns whether the file uses the normalized schema, in which 'tiles' is a view joining the tables 'map' and
+           'images' and identical tiles are stored only once
+        """
+        if self._deduplicated is None:
+            sql = """select count(*) 'nr_of_tables' from sqlite_master
+                WHERE type = 'table' AND name IN ('map', 'images')"""
+            self._deduplicated = self._get_single_value(sql, "nr_of_tables") == 2
+            if self._deduplicated:
+                debug("The tiles are deduplicated")
+        return self._deduplicated
 
     def _get_bounds_from_data(self, zoom_level):
-        sql = """select 
-                min(tile_column) 'x_min', 
-                max(tile_column) 'x_max', 
-                min(tile_row) 'y_min', 
-                max(tile_row) 'y_max'
-                from tiles
-                WHERE zoom_level = {}""".format(
-            zoom_level
-        )
-        rows = self._get_from_db(sql)
+        zoom_stats = self._get_zoom_stats(zoom_level)
         bounds = None
-        if rows:
-            row = rows[0]
+        if zoom_stats and zoom_stats["nr_of_tiles"]:
             bounds = Bounds.create(
                 zoom=zoom_level,
-                x_min=row["x_min"],
-                x_max=row["x_max"],
-                y_min=row["y_min"],
-                y_max=row["y_max"],
+                x_min=zoom_stats["x_min"],
+                x_max=zoom_stats["x_max"],
+                y_min=zoom_stats["y_min"],
+                y_max=zoom_stats["y_max"],
                 scheme=self.scheme(),
             )
         return bounds
 
+    def _get_zoom_stats(self, zoom_level) -> Optional[dict]:
+        return get_tile_stats(self.path).get(zoom_level, compute_func=self._compute_zoom_stats)
+
+    def _compute_zoom_stats(self, zoom_level) -> Optional[dict]:
+        """
+         * Computes the statistics of the zoom level. The number of tiles and their bounds are read from the index, the
+           average size of the tiles is estimated from a sample.
+        """
+        table = "map" if self._is_deduplicated() else "tiles"
+        sql = """select
+                count(*) 'nr_of_tiles',
+                min(tile_column) 'x_min',
+                max(tile_column) 'x_max',
+                min(tile_row) 'y_min',
+                max(tile_row) 'y_max'
+                from {}
+                WHERE zoom_level = ?""".format(
+            table
+        )
+        rows = self._get_from_db(sql, params=(zoom_level,))
+        if not rows:
+            return None
+        stats = dict(rows[0])
+        sql = """select avg(length(tile_data)) 'average_tile_size'
+                from (select tile_data from tiles WHERE zoom_level = ? limit ?)"""
+        rows = self._get_from_db(sql, params=(zoom_level, _TILE_SIZE_SAMPLE))
+        stats["average_tile_size"] = rows[0]["average_tile_size"] if rows else None
+        return stats
+
     @staticmethod
-    def _get_where_clause(tiles_to_load, zoom_level):
-        where_clause = ""
-        if zoom_level is not None or tiles_to_load is not None:
-            where_clause = "WHERE"
-            if zoom_level is not None:
-                where_clause += " zoom_level = {}".format(zoom_level)
-                if tiles_to_load is not None:
-                    where_clause += " AND"
-            if tiles_to_load is not None:
-                tile_coords = str(["{};{}".format(x[0], x[1]) for x in tiles_to_load]).replace("[", "").replace("]", "")
-                where_clause += ' tile_column || ";" || tile_row IN ({})'.format(tile_coords)
-        return where_clause
+    def _get_tile_ranges(tiles_to_load) -> List[Tuple[int, int, int]]:
+        """
+         * Groups the tiles into runs of consecutive rows within the same column
+        :param tiles_to_load: The (column, row) coordinates of the tiles
+        :return: (column, first row, last row) for each run
+        """
+        tile_ranges = []
+        for col, row in sorted(tiles_to_load):
+            if tile_ranges and tile_ranges[-1][0] == col and tile_ranges[-1][2] == row - 1:
+                tile_ranges[-1][2] = row
+            else:
+                tile_ranges.append([col, row, row])
+        return [tuple(r) for r in tile_ranges]
+
+    @staticmethod
+    def _get_tiles_query(
+        zoom_level: int, tile_ranges: List[Tuple[int, int, int]], deduplicated: bool = False
+    ) -> Tuple[str, list]:
+        """
+         * Creates the query for the tiles in the specified tile ranges.
+         * The ranges are joined as a table of constant rows with the tiles, thus SQLite looks up each range in the
+           (zoom_level, tile_column, tile_row) index instead of scanning the whole zoom level. The CROSS JOIN makes
+           sure the ranges are the outer loop, since the query planner can't rely on statistics in mbtiles files.
+        :param zoom_level:
+        :param tile_ranges: The tile ranges as returned by _get_tile_ranges, must not be empty
+        :param deduplicated: If True, the tile_ids are queried from the table 'map' instead of the tile data
+        :return: The query and its parameters
+        """
+        table, data_column = ("map", "tile_id") if deduplicated else ("tiles", "tile_data")
+        sql = """WITH tile_ranges(col, row_min, row_max) AS (VALUES {values})
+            SELECT zoom_level, tile_column, tile_row, {data_column}
+            FROM tile_ranges CROSS JOIN {table}
+            ON {table}.zoom_level = ?
+            AND {table}.tile_column = tile_ranges.col
+            AND {table}.tile_row BETWEEN tile_ranges.row_min AND tile_ranges.row_max;""".format(
+            values=", ".join(["(?, ?, ?)"] * len(tile_ranges)), data_column=data_column, table=table
+        )
+        params = [value for tile_range in tile_ranges for value in tile_range]
+        params.append(zoom_level)
+        return sql, params
 
     def _create_tile(self, row):
         zoom_level = row["zoom_level"]
@@ -360,16 +521,28 @@ class MBTilesSource(AbstractSource):
 
     def close_connection(self):
         """
-         * Closes the current db connection
+         * Returns the db connections of all threads to the connection pool
         :return: 
         """
-        if self.conn:
+        with self._connections_lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
             try:
-                self.conn.close()
-                debug("Connection closed")
+                release_connection(conn)
+                debug("Connection released")
             except:
-                warn("Closing connection failed: {}".format(sys.exc_info()))
-        self.conn = None
+                warn("Releasing connection failed: {}".format(sys.exc_info()))
+
+    def release_connection(self) -> None:
+        """
+         * Returns the db connection of the current thread to the connection pool, thus the next load can reuse it,
+           even though it runs on another thread
+        """
+        with self._connections_lock:
+            conn = self._connections.pop(threading.get_ident(), None)
+        if conn is not None:
+            release_connection(conn)
 
     def _get_zoom(self, max_zoom=True):
         if max_zoom:
@@ -430,14 +603,14 @@ class MBTilesSource(AbstractSource):
             critical("Loading metadata value '{}' failed: {}", field_name, sys.exc_info())
         return value
 
-    def _get_from_db(self, sql):
-        if not self.conn:
-            debug("Not connected yet.")
-            self._connect_to_db()
+    def _get_from_db(self, sql, params=()):
+        conn = self._get_connection()
+        if not conn:
+            return None
         try:
             debug("Execute SQL: {}", sql)
-            cur = self.conn.cursor()
-            cur.execute(sql)
+            cur = conn.cursor()
+            cur.execute(sql, params)
             return cur.fetchall()
         except sqlite3.OperationalError:
             critical("Getting data from db failed: {}", sql)
@@ -447,17 +620,177 @@ class MBTilesSource(AbstractSource):
                 tb = traceback.format_exc()
             critical("Getting data from db failed: {}, {}", sys.exc_info(), tb)
 
-    def _connect_to_db(self):
+    def _iter_from_db(self, sql, params=(), batch_size=_FETCH_BATCH_SIZE):
         """
-         * Since an mbtile file is a sqlite database, we can connect to it
+         * Executes the query and yields the rows, which are fetched in batches. Thus only a batch of tiles is kept in
+           memory and the first tiles can be processed before all of them have been read.
         """
-        debug("Connecting to: {}", self.path)
+        conn = self._get_connection()
+        if not conn:
+            return
+        debug("Execute SQL: {}", sql)
+        cur = conn.cursor()
         try:
-            self.conn = sqlite3.connect(self.path)
-            self.conn.row_factory = sqlite3.Row
-            debug("Successfully connected")
-        except:
-            critical("Db connection failed:", sys.exc_info())
+            cur.execute(sql, params)
+            rows = cur.fetchmany(batch_size)
+            while rows:
+                yield from rows
+                rows = cur.fetchmany(batch_size)
+        except sqlite3.Error:
+            critical("Getting data from db failed: {}, {}", sql, sys.exc_info())
+        finally:
+            cur.close()
+
+    def _get_connection(self) -> Optional[sqlite3.Connection]:
+        """
+         * Since an mbtile file is a sqlite database, we can connect to it.
+         * SQLite connections mustn't be used by multiple threads at the same time, thus each thread gets a read-only
+           connection of the connection pool.
+        """
+        thread_id = threading.get_ident()
+        with self._connections_lock:
+            conn = self._connections.get(thread_id)
+        if conn is None:
+            debug("Connecting to: {}", self.path)
+            try:
+                conn = acquire_connection(self.path)
+                debug("Successfully connected")
+            except:
+                critical("Db connection failed:", sys.exc_info())
+                return None
+            with self._connections_lock:
+                self._connections[thread_id] = conn
+        return conn
+
+
+class PMTilesSource(AbstractSource):
+    """
+     * Source for local PMTiles archives. The archive is mapped into memory and only the directories and the byte
+       ranges of the requested tiles are read.
+    """
+
+    def __init__(self, path):
+        AbstractSource.__init__(self)
+        if not os.path.isfile(path):
+            raise RuntimeError("The file does not exist: {}".format(path))
+
+        self.path = path
+        self._archive: Optional[PMTilesArchive] = None
+        self._archive_lock = threading.Lock()
+        archive = self._get_archive()
+        if archive.header["tile_type"] != TILE_TYPE_MVT:
+            raise RuntimeError("The file '{}' doesn't contain Mapbox vector tiles.".format(path))
+        if archive.header["tile_compression"] not in SUPPORTED_COMPRESSIONS:
+            raise RuntimeError("The compression of the tiles in '{}' is not supported.".format(path))
+        self._metadata = archive.metadata()
+
+    def source(self):
+        return self.path
+
+    def crs(self):
+        return self._metadata.get("crs", _DEFAULT_CRS)
+
+    def vector_layers(self):
+        layers = self._metadata.get("vector_layers")
+        if not layers:
+            warn("No vector_layers found in metadata")
+            layers = []
+        return layers
+
+    def attribution(self):
+        return self._metadata.get("attribution", "")
+
+    def name(self):
+        name = self._metadata.get("name")
+        if not name:
+            name = os.path.splitext(os.path.basename(self.path))[0]
+        return name
+
+    def scheme(self):
+        return "xyz"
+
+    def min_zoom(self):
+        return self._get_archive().header["min_zoom"]
+
+    def max_zoom(self):
+        return self._get_archive().header["max_zoom"]
+
+    def mask_level(self):
+        return self._metadata.get("maskLevel")
+
+    def bounds(self) -> Tuple:
+        header = self._get_archive().header
+        bounds = tuple(header[k] / 10000000 for k in ["min_lon_e7", "min_lat_e7", "max_lon_e7", "max_lat_e7"])
+        if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+            bounds = WORLD_BOUNDS
+        return bounds
+
+    def bounds_tile(self, zoom):
+        return get_tile_bounds(zoom=zoom, extent=self.bounds(), scheme=self.scheme(), source_crs="4326")
+
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None, cache_validators=None):
+        """
+         * The tiles are looked up in the directories first. Tiles with the same content, e.g. the tiles of a run of
+           an entry, have the same byte range, which is read only once and returned for all of its tiles, one after
+           the other. The offset of the range is set as content_id of the tiles.
+        """
+        self._cancelling = False
+        if zoom_level is None:
+            raise RuntimeError("zoom_level is required")
+
+        if tiles_to_load is None:
+            raise RuntimeError("tiles_to_load is required")
+
+        if max_tiles is not None and len(tiles_to_load) > max_tiles:
+            tiles_to_load = get_tiles_from_center(max_tiles, tiles_to_load, should_cancel_func=lambda: self._cancelling)
+            self.tile_limit_reached.emit()
+
+        archive = self._get_archive()
+        tiles_by_range: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for col, row in tiles_to_load:
+            if self._cancelling:
+                return
+            try:
+                tile_range = archive.find_tile(zxy_to_tile_id(int(zoom_level), int(col), int(row)))
+            except ValueError:
+                tile_range = None
+            if tile_range:
+                tiles_by_range.setdefault(tile_range, []).append((col, row))
+
+        self.max_progress_changed.emit(sum(len(tiles) for tiles in tiles_by_range.values()))
+        scheme = self.scheme()
+        nr_loaded = 0
+        # the ranges are read in the order of the file
+        for tile_range in sorted(tiles_by_range):
+            data = archive.read(*tile_range)
+            for col, row in tiles_by_range[tile_range]:
+                if self._cancelling:
+                    return
+                tile = VectorTile(scheme, zoom_level, col, row)
+                tile.content_id = tile_range[0]
+                tile.nr_of_tiles_with_content = len(tiles_by_range[tile_range])
+                nr_loaded += 1
+                yield tile, data
+                self.progress_changed.emit(nr_loaded)
+
+    def close_connection(self):
+        with self._archive_lock:
+            archive = self._archive
+            self._archive = None
+        if archive:
+            archive.close()
+
+    def _get_archive(self) -> PMTilesArchive:
+        with self._archive_lock:
+            if not self._archive:
+                try:
+                    self._archive = PMTilesArchive(self.path)
+                except (OSError, ValueError) as e:
+                    critical("Opening PMTiles archive failed: {}", e)
+                    raise RuntimeError(
+                        "The file '{}' is not a valid PMTiles file and cannot be loaded.".format(self.path)
+                    )
+            return self._archive
 
 
 class DirectorySource(AbstractSource):
@@ -475,6 +808,10 @@ class DirectorySource(AbstractSource):
     def source(self):
         return self.path
 
+    def caches_raw_tiles(self) -> bool:
+        # the directory may be on a network share and each of its tiles is read from a file of its own
+        return True
+
     def attribution(self):
         return self.json.attribution()
 
@@ -515,11 +852,16 @@ class DirectorySource(AbstractSource):
     def crs(self):
         return self.json.crs()
 
-    def load_tiles(self, zoom_level, tiles_to_load, max_tiles=None):
+    def iter_tiles(self, zoom_level, tiles_to_load, max_tiles=None, cache_validators=None):
+        """
+         * The files of each directory are listed once instead of checking each file for existence. The files are
+           read concurrently by a thread pool, which hides the latency of network-mounted folders.
+         * A tile is read from the file with the extension of the template or with one of the other extensions of
+           _TILE_FILE_EXTENSIONS, e.g. 12.mvt or 12.pbf.gz for the template {y}.pbf.
+        """
         self._cancelling = False
-        tile_data_tuples = []
 
-        if len(tiles_to_load) > max_tiles:
+        if max_tiles and len(tiles_to_load) > max_tiles:
             tiles_to_load = get_tiles_from_center(max_tiles, tiles_to_load, should_cancel_func=lambda: self._cancelling)
             self.tile_limit_reached.emit()
 
@@ -529,17 +871,83 @@ class DirectorySource(AbstractSource):
         else:
             tile_path = os.path.join(self.path, "{z}/{x}/{y}.pbf")
 
-        self.max_progress_changed.emit(tiles_to_load)
-        for index, t in enumerate(tiles_to_load):
-            self.progress_changed.emit(index)
-            full_path = tile_path.format(z=int(zoom_level), x=t[0], y=t[1])
-            col = t[0]
-            row = t[1]
-            tile = VectorTile(self.scheme(), zoom_level, col, row)
-            if os.path.isfile(full_path):
-                with open(full_path, "rb") as f:
-                    encoded_data = f.read()
-                    tile_data_tuples.append((tile, encoded_data))
-            else:
-                info("File not found: {}", full_path)
-        return tile_data_tuples
+        tiles_by_directory: Dict[str, List[Tuple[Tuple[int, int], str]]] = {}
+        for col, row in tiles_to_load:
+            full_path = tile_path.format(z=int(zoom_level), x=col, y=row)
+            tiles_by_directory.setdefault(os.path.dirname(full_path), []).append(((col, row), full_path))
+
+        self.max_progress_changed.emit(len(tiles_to_load))
+        scheme = self.scheme()
+        nr_processed = 0
+        with ThreadPoolExecutor(max_workers=_MAX_FILE_READERS, thread_name_prefix="vtr_file_reader") as executor:
+            # a pending listing has no tile coord, a pending read has the coord of its tile
+            pending: Dict[Future, Optional[Tuple[int, int]]] = {}
+            for directory, tiles in tiles_by_directory.items():
+                pending[executor.submit(_find_tile_files, directory, tiles)] = None
+            try:
+                while pending and not self._cancelling:
+                    done, _ = wait(pending, timeout=_CANCEL_CHECK_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        tile_coord = pending.pop(future)
+                        if tile_coord is None:
+                            for coord, file_path in future.result():
+                                if file_path:
+                                    pending[executor.submit(_read_file, file_path)] = coord
+                                else:
+                                    nr_processed += 1
+                            continue
+
+                        nr_processed += 1
+                        try:
+                            encoded_data = future.result()
+                        except OSError:
+                            warn("Reading tile {} failed: {}", tile_coord, sys.exc_info()[1])
+                            continue
+                        yield VectorTile(scheme, zoom_level, tile_coord[0], tile_coord[1]), encoded_data
+                    self.progress_changed.emit(nr_processed)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def _find_tile_files(
+    directory: str, tiles: List[Tuple[Tuple[int, int], str]]
+) -> List[Tuple[Tuple[int, int], Optional[str]]]:
+    """
+     * Returns the file of each tile in the directory, or None if there is no file for the tile
+    :param directory:
+    :param tiles: (tile coord, path of the tile file according to the template) of the tiles in the directory
+    """
+    try:
+        with os.scandir(directory) as entries:
+            file_names = {e.name for e in entries if e.is_file()}
+    except OSError:
+        file_names = set()
+
+    files = []
+    for coord, full_path in tiles:
+        file_path = None
+        for candidate in _get_tile_file_candidates(os.path.basename(full_path)):
+            if candidate in file_names:
+                file_path = os.path.join(directory, candidate)
+                break
+        if not file_path:
+            info("File not found: {}", full_path)
+        files.append((coord, file_path))
+    return files
+
+
+def _get_tile_file_candidates(file_name: str) -> List[str]:
+    """
+     * Returns the names of the files the tile may be stored in, the name according to the template first
+    """
+    for extension in sorted(_TILE_FILE_EXTENSIONS, key=len, reverse=True):
+        if file_name.endswith(extension):
+            base_name = file_name[: -len(extension)]
+            return [file_name] + [base_name + e for e in _TILE_FILE_EXTENSIONS if e != extension]
+    return [file_name]
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb", buffering=0) as f:
+        return f.readall()
@@ -0,0 +1,100 @@
+"""
+ * Statistics of the tiles of each zoom level of a file, i.e. the number of tiles, their bounds and their average size.
+ * Computing them requires scanning the index of the file, thus they are computed once per zoom level and persisted
+   next to the cache. They are valid as long as the size and the modification time of the file don't change.
+"""
+import hashlib
+import os
+import sys
+import threading
+from typing import Callable, Dict, Optional
+
+from .file_helper import get_temp_dir
+from .log_helper import critical, info
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+
+_lock = threading.Lock()
+# the statistics by path of the file, thus further sources for the same file don't have to read them again
+_stats_by_path: Dict[str, "TileStats"] = {}
+
+
+def get_tile_stats_directory():
+    return get_temp_dir("tile_stats")
+
+
+def get_tile_stats(path: str) -> "TileStats":
+    """
+     * Returns the statistics of the specified file
+    """
+    path = os.path.abspath(path)
+    with _lock:
+        stats = _stats_by_path.get(path)
+        if not stats or not stats.is_valid():
+            stats = TileStats(path=path)
+            _stats_by_path[path] = stats
+    return stats
+
+
+class TileStats:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_state = _get_file_state(path)
+        self._stats_path = os.path.join(
+            get_tile_stats_directory(), "{}.json".format(hashlib.md5(path.encode("utf-8")).hexdigest())
+        )
+        self._stats_by_zoom: Dict[str, dict] = self._read()
+
+    def is_valid(self) -> bool:
+        return self._file_state == _get_file_state(self.path)
+
+    def get(self, zoom_level: int, compute_func: Callable[[int], Optional[dict]]) -> Optional[dict]:
+        """
+         * Returns the statistics of the zoom level: nr_of_tiles, x_min, x_max, y_min, y_max and average_tile_size.
+        :param zoom_level:
+        :param compute_func: Computes the statistics of the zoom level if they aren't known yet, returns None on failure
+        :return: The statistics or None if they can't be computed
+        """
+        key = str(zoom_level)
+        with self._lock:
+            if key not in self._stats_by_zoom:
+                stats = compute_func(zoom_level)
+                if stats is None:
+                    return None
+                info("Tile statistics of zoom level {}: {}", zoom_level, stats)
+                self._stats_by_zoom[key] = stats
+                self._write()
+            return self._stats_by_zoom[key]
+
+    def _read(self) -> Dict[str, dict]:
+        if not os.path.isfile(self._stats_path):
+            return {}
+        try:
+            with open(self._stats_path, "r") as f:
+                data = json.load(f)
+            if data.get("path") == self.path and data.get("file_state") == list(self._file_state):
+                return data["zoom_levels"]
+        except:
+            critical("Reading tile statistics '{}' failed: {}", self._stats_path, sys.exc_info()[1])
+        return {}
+
+    def _write(self) -> None:
+        data = {"path": self.path, "file_state": list(self._file_state), "zoom_levels": self._stats_by_zoom}
+        try:
+            os.makedirs(os.path.dirname(self._stats_path), exist_ok=True)
+            temp_path = "{}.{}.tmp".format(self._stats_path, threading.get_ident())
+            with open(temp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self._stats_path)
+        except:
+            critical("Writing tile statistics '{}' failed: {}", self._stats_path, sys.exc_info()[1])
+
+
+def _get_file_state(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
@@ -1,39 +1,61 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import hashlib
 import json
 import multiprocessing
 import os
 import platform
 import sys
+import threading
 import time
 import traceback
 import uuid
-from gzip import GzipFile
-from io import BytesIO
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Executor, Future
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
-from PyQt5.QtWidgets import QApplication
 from qgis.core import QgsProject, QgsVectorLayer
 
 from .util.connection import ConnectionTypes
+from .util.decode_scheduler import DecodeScheduler
 from .util.feature_helper import FeatureMerger, GeoTypes, clip_features, geo_types, is_multi, map_coordinates_recursive
 from .util.file_helper import (
     assure_temp_dirs_exist,
-    cache_tile,
-    get_cache_entry,
     get_geojson_file_name,
+    get_plugin_version,
     get_style_folder,
     get_styles,
     get_valid_filename,
-    is_gzipped,
 )
 from .util.log_helper import critical, debug, info, remove_key
-from .util.mp_helper import decode_tile_native, decode_tile_python, load_lib, native_decoding_supported, unload_lib
+from .util.mp_helper import (
+    create_decoder_executor,
+    decode_tile_native,
+    decode_tile_python,
+    decode_tile_timed,
+    decode_tiles_streaming,
+    init_decoder_process,
+    load_lib,
+    native_decoding_supported,
+    run_inline,
+    submit_to_pool,
+    unload_lib,
+)
 from .util.qgis_helper import get_loaded_layers_of_connection
-from .util.tile_helper import Bounds, VectorTile, clamp, get_all_tiles, get_code_from_epsg
-from .util.tile_source import AbstractSource, DirectorySource, MBTilesSource, ServerSource
+from .util.shared_tiles import SharedTiles
+from .util.tile_cache import (
+    RawTileCache,
+    TileCache,
+    TileKey,
+    get_expiry_time,
+    get_memory_tile_cache,
+    get_raw_tile_cache,
+    get_tile_cache,
+)
+from .util.tile_helper import Bounds, VectorTile, clamp, get_all_tiles, get_code_from_epsg, get_tiles_from_center
+from .util.tile_source import AbstractSource, DirectorySource, MBTilesSource, PMTilesSource, ServerSource
 
 is_windows = sys.platform.startswith("win32")
 if is_windows:
@@ -55,6 +77,8 @@ class VtReader(QObject):
 
     _ready_for_next_loading_step = pyqtSignal()
 
+    _pool_probe_timeout_seconds = 10
+
     _loading_options = {
         "zoom_level": None,
         "layer_filter": None,
@@ -66,7 +90,13 @@ class VtReader(QObject):
         "bounds": None,
     }
 
-    _nr_tiles_to_process_serial = 30
+    _max_tiles_in_flight_per_worker = 4
+    _max_tiles_waiting_per_worker = 4
+    # the time it takes to hand a tile to the decoding threads or processes, smaller tiles are decoded serially
+    _thread_dispatch_overhead_seconds = 0.0005
+    _process_dispatch_overhead_seconds = 0.01
+    # the decoded tiles are written to the cache in batches, each batch in one transaction
+    _cache_batch_size = 32
     _layers_to_dissolve = []
     _zoom_level_delimiter = "*"
     _DEFAULT_EXTENT = 4096
@@ -96,7 +126,12 @@ class VtReader(QObject):
         self._clip_tiles_at_tile_bounds: False = None
         self._flush = False
         self._feature_count: int = 0
+        # the progress of the source is ignored while the tiles are loaded, decoded and processed in one pipeline
+        self._report_source_progress = True
         self._allowed_sources: List[str] = None
+        self._pool: Optional[multiprocessing.Pool] = None
+        self._decoder_executor: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
         self._ready_for_next_loading_step.connect(self._continue_loading)
         load_lib()
         self.native_decoding_supported = native_decoding_supported()
@@ -110,6 +145,11 @@ class VtReader(QObject):
             info("Native decoding supported!!! ({}, {}bit)", platform.system(), bits)
         else:
             info("Native decoding not supported. ({}, {}bit)", platform.system(), bits)
+        if self.native_decoding_supported:
+            dispatch_overhead_seconds = self._thread_dispatch_overhead_seconds
+        else:
+            dispatch_overhead_seconds = self._process_dispatch_overhead_seconds
+        self._decode_scheduler = DecodeScheduler(dispatch_overhead_seconds=dispatch_overhead_seconds)
 
     def connection(self):
         return self._connection
@@ -140,6 +180,8 @@ class VtReader(QObject):
             source = ServerSource(url=connection["url"])
         elif conn_type == ConnectionTypes.MBTiles:
             source = MBTilesSource(path=connection["path"])
+        elif conn_type == ConnectionTypes.PMTiles:
+            source = PMTilesSource(path=connection["path"])
         elif conn_type == ConnectionTypes.Directory:
             source = DirectorySource(path=connection["path"])
         else:
@@ -157,6 +199,7 @@ class VtReader(QObject):
         self._source.message_changed.disconnect()
         self._ready_for_next_loading_step.disconnect()
         self._source.close_connection()
+        self._shutdown_pools()
         unload_lib()
         info("Reader shutdown")
 
@@ -168,10 +211,12 @@ class VtReader(QObject):
             self.tile_limit_reached.emit(self._loading_options["max_tiles"])
 
     def _source_progress_changed(self, progress: int):
-        self._update_progress(progress=progress)
+        if self._report_source_progress:
+            self._update_progress(progress=progress)
 
     def _source_max_progress_changed(self, max_progress: int):
-        self._update_progress(max_progress=max_progress)
+        if self._report_source_progress:
+            self._update_progress(max_progress=max_progress)
 
     def _source_message_changed(self, msg: str):
         self._update_progress(msg=msg)
@@ -228,11 +273,130 @@ class VtReader(QObject):
         zoom_level = clamp(zoom_level, low=min_zoom, high=max_zoom)
         return zoom_level
 
-    def _load_tiles(self):
-        if not self._source or self.connection()["type"] == ConnectionTypes.MBTiles:
-            # recreate source to assure the source belongs to the new thread, SQLite3 isn't happy about it otherwise
-            self._source = self._create_source(self.connection())
+    def _get_cache_name(self) -> str:
+        """
+        The decoded tiles depend on the plugin version, the decoder, the clipping and the layer filter. They're part of
+        the namespace of the cache, thus changing one of them selects another cache instead of clearing the cache.
+        """
+        clip_tiles = not self._loading_options["inspection_mode"]
+        namespace = [
+            get_plugin_version() or "",
+            "native" if self.native_decoding_supported else "python",
+            "clipped" if clip_tiles else "unclipped",
+            *sorted(self._loading_options["layer_filter"] or []),
+        ]
+        namespace_hash = hashlib.md5("\n".join(namespace).encode("utf-8")).hexdigest()
+        return "{}.{}".format(self._source.name(), namespace_hash[:12])
+
+    def _get_raw_cache(self) -> Optional[RawTileCache]:
+        """
+         * The original tiles are cached per source, as they don't depend on the decoding. The name contains a hash of
+           the URL or path, thus different sources with the same name don't share their tiles.
+        """
+        if not self._source.caches_raw_tiles():
+            return None
+        source_hash = hashlib.md5(self._source.source().encode("utf-8")).hexdigest()
+        return get_raw_tile_cache("{}.{}".format(self._source.name(), source_hash[:12]))
+
+    def _iter_tiles(
+        self,
+        zoom_level: int,
+        tiles_to_load: set,
+        max_tiles: int,
+        raw_cache: Optional[RawTileCache],
+        cache_validators: Optional[Dict[Tuple[int, int], dict]] = None,
+    ):
+        """
+         * Yields the original tiles from the raw cache first, the remaining tiles are loaded from the source.
+         * The tiles loaded from the source are added to the raw cache. If the source confirms that an expired tile
+           didn't change, the original tile is taken from the raw cache.
+        :param cache_validators: The validators of the expired entries of the cache of the decoded tiles
+        """
+        if not raw_cache:
+            yield from self._source.iter_tiles(
+                zoom_level=zoom_level,
+                tiles_to_load=tiles_to_load,
+                max_tiles=max_tiles,
+                cache_validators=cache_validators,
+            )
+            return
+
+        entries, raw_validators = raw_cache.get_entries((zoom_level, t[0], t[1]) for t in tiles_to_load)
+        cache_validators = dict(cache_validators or {})
+        cache_validators.update({(key[1], key[2]): validators for key, validators in raw_validators.items()})
+        cached_tiles = [(key[1], key[2]) for key in entries]
+        if max_tiles and len(cached_tiles) >= max_tiles:
+            cached_tiles = get_tiles_from_center(max_tiles, cached_tiles, lambda: self.cancel_requested)
+            if len(entries) > max_tiles:
+                self._source.tile_limit_reached.emit()
+        debug("{} original tiles in cache", len(cached_tiles))
+
+        scheme = self._source.scheme()
+        now = time.time()
+        for col, row in cached_tiles:
+            if self.cancel_requested:
+                return
+            data, expires_at, _ = entries[(zoom_level, col, row)]
+            tile = VectorTile(scheme=scheme, zoom_level=zoom_level, x=col, y=row)
+            # the decoded tile expires with the original one
+            tile.cache_validators = {"etag": None, "last_modified": None, "max_age": max(0, int(expires_at - now))}
+            yield tile, data
+
+        remaining_tiles = {t for t in tiles_to_load if (zoom_level, t[0], t[1]) not in entries}
+        if not remaining_tiles or (max_tiles and len(cached_tiles) >= max_tiles):
+            return
+        loaded_tiles = self._source.iter_tiles(
+            zoom_level=zoom_level,
+            tiles_to_load=remaining_tiles,
+            max_tiles=max_tiles - len(cached_tiles) if max_tiles else None,
+            cache_validators=cache_validators,
+        )
+        tiles_to_cache = []
+        try:
+            for tile, data in loaded_tiles:
+                key = (zoom_level, tile.column, tile.row)
+                if tile.not_modified:
+                    data = raw_cache.refresh(key, validators=tile.cache_validators)
+                elif data:
+                    tiles_to_cache.append((key, data, tile.cache_validators))
+                    if len(tiles_to_cache) >= self._cache_batch_size:
+                        raw_cache.put_many(tiles_to_cache)
+                        tiles_to_cache.clear()
+                yield tile, data
+        finally:
+            raw_cache.put_many(tiles_to_cache)
+            loaded_tiles.close()
+
+    @staticmethod
+    def _get_memory_key(cache: TileCache, key: TileKey) -> tuple:
+        """
+         * The tiles in memory are kept per cache, whose name contains the namespace of the decode options
+        """
+        return (cache.name, *key)
+
+    def _get_cached_tiles(
+        self, cache: TileCache, keys: List[TileKey]
+    ) -> Tuple[Dict[TileKey, dict], Dict[TileKey, dict]]:
+        """
+         * Looks up the tiles in memory first. Only the remaining tiles are looked up in the cache on disk, the tiles
+           found there are kept in memory as well.
+        :return: The decoded data of the cached tiles, and the validators of the expired tiles
+        """
+        memory_cache = get_memory_tile_cache()
+        memory_keys = {self._get_memory_key(cache, key): key for key in keys}
+        data_in_memory = memory_cache.get_many(memory_keys)
+        cached_data = {memory_keys[memory_key]: decoded_data for memory_key, decoded_data in data_in_memory.items()}
+        keys_on_disk = [key for key in keys if key not in cached_data]
+        if not keys_on_disk:
+            return cached_data, {}
+
+        entries, cached_validators = cache.get_entries(keys_on_disk)
+        for key, (decoded_data, expires_at, stored_size) in entries.items():
+            memory_cache.put(self._get_memory_key(cache, key), decoded_data, expires_at, stored_size)
+            cached_data[key] = decoded_data
+        return cached_data, cached_validators
 
+    def _load_tiles(self):
         try:
             self._feature_count = 0
             self._all_tiles = []
@@ -251,15 +415,19 @@ class VtReader(QObject):
 
             all_tiles = get_all_tiles(bounds=bounds, is_cancel_requested_handler=lambda: self.cancel_requested)
             tiles_to_load = set()
+            cache_validators = {}
             cached_tiles = []
             tiles_to_ignore = set()
-            source_name = self._source.name()
+            cache = get_tile_cache(self._get_cache_name())
+            cached_data, cached_validators = self._get_cached_tiles(
+                cache, [(zoom_level, t[0], t[1]) for t in all_tiles]
+            )
             scheme = self._source.scheme()
             for t in all_tiles:
                 if self.cancel_requested or (max_tiles and len(cached_tiles) >= max_tiles):
                     break
 
-                decoded_data = get_cache_entry(cache_name=source_name, zoom_level=zoom_level, x=t[0], y=t[1])
+                decoded_data = cached_data.get((zoom_level, t[0], t[1]))
                 if decoded_data:
                     tile = VectorTile(scheme=scheme, zoom_level=zoom_level, x=t[0], y=t[1])
                     tile.decoded_data = decoded_data
@@ -267,6 +435,9 @@ class VtReader(QObject):
                     tiles_to_ignore.add((tile.column, tile.row))
                 else:
                     tiles_to_load.add(t)
+                    validators = cached_validators.get((zoom_level, t[0], t[1]))
+                    if validators:
+                        cache_validators[t] = validators
 
             remaining_nr_of_tiles = len(tiles_to_load)
             if max_tiles:
@@ -280,22 +451,21 @@ class VtReader(QObject):
 
             debug("Loading data for zoom level '{}' source '{}'", zoom_level, self._source.name())
 
-            if remaining_nr_of_tiles:
-                tile_data_tuples = self._source.load_tiles(
-                    zoom_level=zoom_level, tiles_to_load=tiles_to_load, max_tiles=remaining_nr_of_tiles
+            if remaining_nr_of_tiles and not self.cancel_requested:
+                tiles = self._load_decode_and_process_tiles(
+                    zoom_level=zoom_level,
+                    tiles_to_load=tiles_to_load,
+                    max_tiles=remaining_nr_of_tiles,
+                    cache=cache,
+                    layer_filter=layer_filter,
+                    cache_validators=cache_validators,
                 )
-                if len(tile_data_tuples) > 0 and not self.cancel_requested:
-                    tiles = self._decode_tiles(tile_data_tuples)
-                    self._process_tiles(tiles, layer_filter)
-                    for t in tiles:
-                        cache_tile(
-                            cache_name=source_name,
-                            zoom_level=zoom_level,
-                            x=t.column,
-                            y=t.row,
-                            decoded_data=t.decoded_data,
-                        )
-                    self._all_tiles.extend(tiles)
+                self._all_tiles.extend(tiles)
+            info("Cache '{}': {}", cache.name, cache.statistics())
+            info("Memory cache: {}", get_memory_tile_cache().statistics())
+            raw_cache = self._get_raw_cache()
+            if raw_cache:
+                info("Cache of the original tiles '{}': {}", raw_cache.name, raw_cache.statistics())
             self._ready_for_next_loading_step.emit()
 
         except Exception as e:
@@ -304,6 +474,9 @@ class VtReader(QObject):
                 tb = traceback.format_exc()
             critical("An exception occured: {}, {}", e, tb)
             self.cancelled.emit()
+        finally:
+            # each load runs on a new thread, the next one reuses the connection
+            self._source.release_connection()
 
     def _continue_loading(self):
         """
@@ -397,94 +570,204 @@ class VtReader(QObject):
         _worker_thread.start()
 
     @staticmethod
-    def _get_pool() -> multiprocessing.Pool:
+    def _get_nr_of_workers() -> int:
         nr_processors = 4
         try:
             nr_processors = multiprocessing.cpu_count()
         except NotImplementedError:
             info("CPU count cannot be retrieved. Falling back to default = 4")
-        pool = multiprocessing.Pool(nr_processors)
-        return pool
+        return nr_processors
 
-    def _decode_tiles(self, tiles_with_encoded_data):
+    def _get_pool(self) -> multiprocessing.Pool:
         """
-        Decodes the PBF data from all the specified tiles and reports the progress
-         * If a tile is loaded from the cache, the decoded_data is already set and doesn't have to be encoded
-        :param tiles_with_encoded_data:
-        :return:
+        Returns the decoder processes of this reader. The pool is created lazily and kept until the reader is shut
+         down, thus the workers only import and warm up the decoder once. A pool which doesn't answer a probe anymore is
+         replaced.
         """
-        clip_tiles = not self._loading_options["inspection_mode"]
+        with self._pool_lock:
+            if self._pool and not self._is_pool_healthy(self._pool):
+                info("Decoder pool is not healthy, restarting it...")
+                self._pool.terminate()
+                self._pool = None
+            if not self._pool:
+                self._pool = multiprocessing.Pool(self._get_nr_of_workers(), initializer=init_decoder_process)
+            return self._pool
 
+    @staticmethod
+    def _is_pool_healthy(pool: multiprocessing.Pool) -> bool:
+        """
+        Sends a probe to the decoder processes. A pool which has been terminated refuses it, one whose workers are
+         stuck doesn't answer it in time.
+        """
+        try:
+            pool.apply_async(os.getpid).get(timeout=VtReader._pool_probe_timeout_seconds)
+            return True
+        except (ValueError, multiprocessing.TimeoutError):
+            return False
+
+    def _get_decoder_executor(self) -> Executor:
+        with self._pool_lock:
+            if not self._decoder_executor:
+                self._decoder_executor = create_decoder_executor(self._get_nr_of_workers())
+            return self._decoder_executor
+
+    def _shutdown_pools(self):
+        with self._pool_lock:
+            if self._pool:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+            if self._decoder_executor:
+                self._decoder_executor.shutdown(wait=True)
+                self._decoder_executor = None
+
+    def _get_decoder_submit_func(self) -> Callable[[Tuple], Future]:
+        """
+        Returns the function which starts decoding a single tile. The scheduler decides for each tile whether it's
+         decoded on the current thread or in parallel: on the decoding threads if the native decoder is used, on the
+         decoder processes otherwise.
+        """
         if self.native_decoding_supported:
-            decoder_func = decode_tile_native
+            decoder_func = partial(decode_tile_timed, decode_tile_native)
         else:
-            decoder_func = decode_tile_python
+            decoder_func = partial(decode_tile_timed, decode_tile_python)
+        parallel_submit_func = None
+
+        def submit(t: Tuple) -> Future:
+            nonlocal parallel_submit_func
+            if not self._decode_scheduler.decode_in_parallel(len(t[1])):
+                return run_inline(decoder_func, t)
+            if not parallel_submit_func:
+                info("Processing tiles in parallel...")
+                if self.native_decoding_supported:
+                    executor = self._get_decoder_executor()
+                    parallel_submit_func = partial(executor.submit, decoder_func)
+                else:
+                    parallel_submit_func = partial(submit_to_pool, self._get_pool(), decoder_func)
+            return parallel_submit_func(t)
 
-        tiles_with_encoded_data: List[Tuple] = [(t[0], self._unzip(t[1]), clip_tiles) for t in tiles_with_encoded_data]
-        tile_data_tuples: List[Tuple] = []
+        return submit
 
-        if len(tiles_with_encoded_data) <= self._nr_tiles_to_process_serial:
-            for t in tiles_with_encoded_data:
-                tile, decoded_data = decoder_func(t)
-                if decoded_data:
-                    tile_data_tuples.append((tile, decoded_data))
-        else:
+    def _load_decode_and_process_tiles(
+        self,
+        zoom_level: int,
+        tiles_to_load: set,
+        max_tiles: int,
+        cache: TileCache,
+        layer_filter,
+        cache_validators: Optional[Dict[Tuple[int, int], dict]] = None,
+    ) -> List[VectorTile]:
+        """
+        Loads, decodes and processes the tiles as a pipeline: Each tile is decoded as soon as the source returns it and
+         its features are processed as soon as it's decoded, while the source is still loading further tiles.
+         * The number of tiles being decoded at the same time is limited. While all decoders are busy, only a limited
+           number of tiles is taken from the source and the largest of them are decoded first.
+         * Tiles which the source confirmed as not modified since they have been cached are taken from the cache.
+           If only the original tile is cached, it's decoded again.
+         * The progress is the number of tiles whose features have been processed.
+        :param cache_validators: The validators of the expired cache entries by tile coordinate
+        :return: The tiles with data
+        """
+        clip_tiles = not self._loading_options["inspection_mode"]
+        decoder_layer_filter = layer_filter or None
+        nr_of_tiles = min(max_tiles, len(tiles_to_load)) if max_tiles else len(tiles_to_load)
+        self._update_progress(progress=0, max_progress=nr_of_tiles, msg="Loading {} tiles...".format(nr_of_tiles))
+        loaded_tiles = self._iter_tiles(
+            zoom_level=zoom_level,
+            tiles_to_load=tiles_to_load,
+            max_tiles=max_tiles,
+            raw_cache=self._get_raw_cache(),
+            cache_validators=cache_validators,
+        )
+        not_modified_tiles = []
+        memory_cache = get_memory_tile_cache()
 
-            def raise_error(e):
-                raise e
+        def take_not_modified_from_cache(tiles_with_data):
+            for tile, data in tiles_with_data:
+                if not tile.not_modified:
+                    yield tile, data
+                    continue
+                key = (zoom_level, tile.column, tile.row)
+                entry = cache.refresh_entry(key, validators=tile.cache_validators)
+                if entry and entry[0]:
+                    tile.decoded_data, expires_at, stored_size = entry
+                    memory_cache.put(self._get_memory_key(cache, key), tile.decoded_data, expires_at, stored_size)
+                    not_modified_tiles.append(tile)
+                elif data:
+                    tile.not_modified = False
+                    yield tile, data
+
+        shared_tiles = SharedTiles(share_decoded_data=not self.native_decoding_supported)
+        tiles_with_encoded_data = (
+            (tile, data, clip_tiles, decoder_layer_filter)
+            for tile, data in shared_tiles.filter(take_not_modified_from_cache(loaded_tiles))
+        )
+        nr_workers = self._get_nr_of_workers()
+        decoded_tiles = decode_tiles_streaming(
+            tiles_with_encoded_data,
+            submit_func=self._get_decoder_submit_func(),
+            max_in_flight=nr_workers * self._max_tiles_in_flight_per_worker,
+            should_cancel_func=lambda: self.cancel_requested,
+            size_func=lambda t: len(t[1]),
+            max_waiting=nr_workers * self._max_tiles_waiting_per_worker,
+        )
 
-            info("Processing tiles in parallel...")
-            pool = self._get_pool()
-            rs = pool.map_async(
-                func=decoder_func,
-                iterable=tiles_with_encoded_data,
-                callback=tile_data_tuples.extend,
-                error_callback=raise_error,
-            )
-            pool.close()
-            current_progress = 0
-            nr_of_tiles = len(tiles_with_encoded_data)
-            self._update_progress(max_progress=nr_of_tiles, msg="Decoding {} tiles...".format(nr_of_tiles))
-            while not rs.ready() and not self.cancel_requested:
-                time.sleep(0.02)
-                QApplication.processEvents()
-                remaining = rs._number_left
-                index = nr_of_tiles - remaining
-                progress = int(100.0 / nr_of_tiles * (index + 1)) if remaining else 100
-                if progress != current_progress:
-                    current_progress = progress
-                    self._update_progress(progress=progress)
+        tiles = []
+        tiles_to_cache = []
+
+        def cache_tiles():
+            """
+             * Stores the tiles on disk, and in memory with the size they've been stored with
+            """
+            stored_sizes = cache.put_many(tiles_to_cache)
+            now = time.time()
+            for key, decoded_data, validators in tiles_to_cache:
+                if key in stored_sizes:
+                    expires_at = get_expiry_time(now, validators)
+                    memory_cache.put(self._get_memory_key(cache, key), decoded_data, expires_at, stored_sizes[key])
+            tiles_to_cache.clear()
+
+        def add_tile(tile: VectorTile):
+            tiles.append(tile)
+            self._add_features_to_feature_collection(tile, layer_filter=layer_filter)
+            self._update_progress(progress=len(tiles))
+            if tile.not_modified:
+                return
+            tiles_to_cache.append(((zoom_level, tile.column, tile.row), tile.decoded_data, tile.cache_validators))
+            if len(tiles_to_cache) >= self._cache_batch_size:
+                cache_tiles()
+
+        def add_ready_tiles():
+            for t in shared_tiles.pop_ready() + not_modified_tiles:
+                add_tile(t)
+            not_modified_tiles.clear()
+
+        self._report_source_progress = False
+        try:
+            for tile, decoded_data, nr_bytes, seconds in decoded_tiles:
+                self._decode_scheduler.add_measurement(nr_bytes, seconds)
+                shared_tiles.set_decoded(tile, decoded_data)
+                if decoded_data:
+                    tile.decoded_data = decoded_data
+                    add_tile(tile)
+                add_ready_tiles()
+            add_ready_tiles()
+        finally:
+            self._report_source_progress = True
+            cache_tiles()
+            decoded_tiles.close()
+            loaded_tiles.close()
             if self.cancel_requested:
-                pool.terminate()
-            pool.join()
-
-        tiles_by_id = {}
-        for t, decoded_data in tile_data_tuples:
-            if not decoded_data:
-                continue
-
-            tile = tiles_by_id.setdefault(t.id(), t)
-            tile.decoded_data = {**tile.decoded_data, **decoded_data}
-        tiles = list(tiles_by_id.values())
+                # the running decoding can't be stopped otherwise, the pool is created again on the next load
+                with self._pool_lock:
+                    if self._pool:
+                        self._pool.terminate()
+                        self._pool = None
 
+        self._decode_scheduler.log_decisions()
         info("Decoding finished, {} tiles with data", len(tiles))
         return tiles
 
-    @staticmethod
-    def _unzip(data):
-        """
-        If the passed data is gzipped, it will be unzipped. Otherwise it will be returned untouched
-        :param data:
-        :return:
-        """
-
-        is_zipped = is_gzipped(data)
-        if is_zipped:
-            file_content = GzipFile("", "r", 0, BytesIO(data)).read()
-        else:
-            file_content = data
-        return file_content
-
     def _process_tiles(self, tiles: List[VectorTile], layer_filter):
         """
         Creates GeoJSON for all the specified tiles and reports the progress
@@ -741,7 +1024,8 @@ class VtReader(QObject):
 
         geo_type = geo_types[feature["type"]]
         coordinates = feature["geometry"]
-        properties = feature["properties"]
+        # the decoded data may be shared with other tiles, the properties of each tile's features are extended below
+        properties = dict(feature["properties"])
         if "id" in properties and properties["id"] < 0:
             properties["id"] = 0
 
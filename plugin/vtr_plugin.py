@@ -17,7 +17,6 @@ import ast
 import logging
 import os
 import platform
-import re
 import sys
 import traceback
 from typing import List, Optional, Tuple
@@ -30,10 +29,12 @@ from qgis.gui import QgsMessageBarItem
 
 from .style_converter import core
 from .ui.dialogs import AboutDialog, ConnectionsDialog, OptionsGroup
-from .util.file_helper import clear_cache, get_icons_directory, get_plugin_directory, get_temp_dir
+from .util.file_helper import clear_cache, get_icons_directory, get_plugin_version, get_temp_dir
 from .util.log_helper import critical, debug, info
 from .util.network_helper import http_get, url_exists
 from .util.qgis_helper import get_loaded_layers_of_connection
+from .util.sqlite_helper import close_idle_connections
+from .util.tile_cache import close_tile_caches
 from .util.tile_helper import (
     WORLD_BOUNDS,
     Bounds,
@@ -104,7 +105,7 @@ class VtrPlugin:
         plugin_version = " {}".format(version) if version else ""
         info("Vector Tiles Reader{} (Python {})".format(plugin_version, python_version))
         self.settings = QSettings("Vector Tile Reader", "vectortilereader")
-        self._clear_cache_when_version_changed()
+        self._log_version_change()
         self.connections_dialog = ConnectionsDialog(self._get_initial_browse_directory())
         self.connections_dialog.on_directory_change.connect(self._on_browse_dir_change)
         self.connections_dialog.on_connect.connect(self._on_connect)
@@ -137,7 +138,6 @@ class VtrPlugin:
         self._scale_to_load: int = None
         self.message_bar_item: QgsMessageBarItem = None
         self.progress_bar: QProgressBar = None
-        self._inspection_mode_active = False
         self._current_reader_sources: List[str] = None
         self._debouncer.start()
 
@@ -211,24 +211,17 @@ class VtrPlugin:
             last_browse_directory = os.path.expanduser("~")
         return last_browse_directory
 
-    def _clear_cache_when_version_changed(self):
-        latest_version = self._get_plugin_version()
+    def _log_version_change(self):
+        """
+         * The cached tiles of a previous version aren't cleared, as the version is part of the namespace of the cache.
+           They aren't used anymore and are removed lazily.
+        """
+        latest_version = get_plugin_version()
         local_version = self.settings.value("version", None)
         if not local_version or local_version != latest_version:
-            info("Plugin version changed from '{}' to '{}'. Cache will be cleared...", local_version, latest_version)
-            clear_cache()
+            info("Plugin version changed from '{}' to '{}'", local_version, latest_version)
         self.settings.setValue("version", latest_version)
 
-    @staticmethod
-    def _get_plugin_version() -> str:
-        version = None
-        with open(os.path.join(get_plugin_directory(), "metadata.txt"), "r") as f:
-            content = f.read()
-        match = re.search(r"version=\d+\.\d+.\d+", content)
-        if match:
-            version = match.group().replace("version=", "")
-        return version
-
     def _on_project_change(self):
         self.iface.mainWindow().statusBar().showMessage("")
         self._debouncer.stop()
@@ -240,7 +233,6 @@ class VtrPlugin:
         self._connect_to_first_source()
 
     def _load_features_overlapping_tile_extent(self):
-        clear_cache()
         self._reload_tiles(ignore_limit=True)
 
     def _have_extent_or_scale_changed(self) -> bool:
@@ -590,6 +582,7 @@ class VtrPlugin:
         if self._current_reader:
             current_connection = self._current_reader.connection()
         self._update_current_reader_sources()
+        self.connections_dialog.options.update_cache_statistics()
         self.connections_dialog.display(current_connection)
 
     def _get_zoom_of_current_mode(self):
@@ -762,9 +755,6 @@ class VtrPlugin:
         tile_limit = options.tile_number_limit()
         load_mask_layer = False
         inspection_mode = options.is_inspection_mode()
-        if self._inspection_mode_active != inspection_mode:
-            clear_cache()
-        self._inspection_mode_active = inspection_mode
         self._auto_zoom = options.auto_zoom_enabled()
         if ignore_limit:
             tile_limit = None
@@ -1007,6 +997,8 @@ class VtrPlugin:
         if self._current_reader:
             self._current_reader.get_source().close_connection()
             self._current_reader = None
+        close_idle_connections()
+        close_tile_caches()
 
         self.iface.mapCanvas().xyCoordinates.disconnect(self._handle_mouse_move)
         QgsProject.instance().layersWillBeRemoved.disconnect(self._on_remove)
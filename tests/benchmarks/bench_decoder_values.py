@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+Compares decoding the feature properties of a property heavy layer by parsing the value of each tag with decoding the
+value table of the layer once.
+
+Usage (from the plugin directory):
+    python3 -m tests.benchmarks.bench_decoder_values [path/to/tile.pbf] [layer]
+"""
+import os
+import site
+import sys
+import timeit
+
+_plugin_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+site.addsitedir(os.path.join(_plugin_dir, "ext-libs"))
+
+from mapbox_vector_tile import decoder  # noqa: E402
+
+_DEFAULT_PATH = os.path.join(_plugin_dir, "tests", "data", "uster.pbf")
+_DEFAULT_LAYER = "poi"
+_REPETITIONS = 20
+
+
+def _properties_per_tag(tile_data, layer):
+    keys = layer.keys
+    vals = layer.values
+    for feature in layer.features:
+        tags = feature.tags
+        props = {}
+        for key_idx, val_idx in zip(tags[::2], tags[1::2]):
+            props[keys[key_idx]] = tile_data.parse_value(vals[val_idx])
+
+
+def _properties_from_value_table(tile_data, layer):
+    keys = [decoder.intern(key) for key in layer.keys]
+    vals = tile_data.parse_values(layer.values)
+    for feature in layer.features:
+        tags = feature.tags
+        {keys[key_idx]: vals[val_idx] for key_idx, val_idx in zip(tags[::2], tags[1::2])}
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else _DEFAULT_PATH
+    layer_name = sys.argv[2] if len(sys.argv) > 2 else _DEFAULT_LAYER
+    with open(path, "rb") as f:
+        data = f.read()
+
+    tile_data = decoder.TileData()
+    layers = tile_data.parse_layers(data, [layer_name])
+    if not layers:
+        print("The tile has no layer '{}'".format(layer_name))
+        return
+    layer = layers[0]
+    nr_tags = sum(len(feature.tags) // 2 for feature in layer.features)
+    print(
+        "{}: {} features, {} tags, {} keys, {} values".format(
+            layer_name, len(layer.features), nr_tags, len(layer.keys), len(layer.values)
+        )
+    )
+
+    benchmarks = [("per tag", _properties_per_tag), ("value table", _properties_from_value_table)]
+    for name, func in benchmarks:
+        seconds = min(timeit.repeat(lambda: func(tile_data, layer), number=1, repeat=_REPETITIONS))
+        print("{}: {:.2f}ms".format(name, seconds * 1000.0))
+
+    seconds = min(
+        timeit.repeat(lambda: tile_data.getMessage(data, layer_filter=[layer_name]), number=1, repeat=_REPETITIONS)
+    )
+    print("decoding the layer: {:.2f}ms".format(seconds * 1000.0))
+
+
+if __name__ == "__main__":
+    main()
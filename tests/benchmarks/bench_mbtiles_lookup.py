@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+Compares the tile lookup of MBTilesSource, which looks up ranges of tiles in the index, with the previous lookup,
+which concatenated column and row and therefore couldn't use the (zoom_level, tile_column, tile_row) index.
+
+The lookup time of the ranges depends on the number of requested tiles, the one of the previous lookup on
+the number of tiles in the zoom level. Without a file, a synthetic mbtiles with a large zoom level is created.
+
+Usage (from the plugin directory, with the QGIS Python environment):
+    python3 -m tests.benchmarks.bench_mbtiles_lookup [path/to/planet.mbtiles zoom_level]
+"""
+import os
+import site
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+_plugin_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+site.addsitedir(os.path.join(_plugin_dir, "ext-libs"))
+
+from plugin.util.tile_source import MBTilesSource  # noqa: E402
+
+_SYNTHETIC_ZOOM_LEVEL = 14
+_SYNTHETIC_SIZE = 1024
+_WINDOW_SIZES = [1, 4, 10, 30, 60]
+_REPETITIONS = 5
+
+
+def _create_synthetic_mbtiles(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tiles (zoom_level integer, tile_column integer, tile_row integer, tile_data blob)")
+    conn.execute("CREATE UNIQUE INDEX tile_index on tiles (zoom_level, tile_column, tile_row)")
+    data = os.urandom(200)
+    conn.executemany(
+        "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+        ((_SYNTHETIC_ZOOM_LEVEL, col, row, data) for col in range(_SYNTHETIC_SIZE) for row in range(_SYNTHETIC_SIZE)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _get_legacy_where_clause(tiles_to_load, zoom_level):
+    tile_coords = str(["{};{}".format(x[0], x[1]) for x in tiles_to_load]).replace("[", "").replace("]", "")
+    return 'WHERE zoom_level = {} AND tile_column || ";" || tile_row IN ({})'.format(zoom_level, tile_coords)
+
+
+def _lookup_legacy(conn, zoom_level, tiles):
+    where_clause = _get_legacy_where_clause(tiles, zoom_level)
+    return conn.execute("SELECT tile_column, tile_row, tile_data FROM tiles {}".format(where_clause)).fetchall()
+
+
+def _lookup_ranges(conn, zoom_level, tiles):
+    sql, params = MBTilesSource._get_tiles_query(zoom_level, MBTilesSource._get_tile_ranges(tiles))
+    return [row[1:] for row in conn.execute(sql, params).fetchall()]
+
+
+def main():
+    if len(sys.argv) > 2:
+        path = sys.argv[1]
+        zoom_level = int(sys.argv[2])
+    else:
+        path = os.path.join(tempfile.gettempdir(), "vtr_bench_lookup.mbtiles")
+        zoom_level = _SYNTHETIC_ZOOM_LEVEL
+        if not os.path.isfile(path):
+            print("Creating {} with {} tiles...".format(path, _SYNTHETIC_SIZE * _SYNTHETIC_SIZE))
+            _create_synthetic_mbtiles(path)
+
+    conn = sqlite3.connect(path)
+    x_min, x_max, y_min, y_max, nr_tiles = conn.execute(
+        "SELECT min(tile_column), max(tile_column), min(tile_row), max(tile_row), count(*) FROM tiles"
+        " WHERE zoom_level = ?",
+        (zoom_level,),
+    ).fetchone()
+    print("Zoom level {}: {} tiles".format(zoom_level, nr_tiles))
+    center_x = (x_min + x_max) // 2
+    center_y = (y_min + y_max) // 2
+
+    for size in _WINDOW_SIZES:
+        tiles = {(center_x + x, center_y + y) for x in range(size) for y in range(size)}
+        assert sorted(_lookup_legacy(conn, zoom_level, tiles)) == sorted(_lookup_ranges(conn, zoom_level, tiles))
+        results = []
+        for name, func in [("concatenated", _lookup_legacy), ("ranges", _lookup_ranges)]:
+            seconds = min(timeit.repeat(lambda: func(conn, zoom_level, tiles), number=1, repeat=_REPETITIONS))
+            results.append("{}: {:.2f}ms".format(name, seconds * 1000.0))
+        print("{} tiles requested, {}".format(len(tiles), ", ".join(results)))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+"""
+Compares passing the tiles hex encoded to the native decoder with passing the raw bytes.
+
+Usage (from the plugin directory):
+    python3 -m tests.benchmarks.bench_native_handoff [path/to/file.mbtiles]
+"""
+import gzip
+import os
+import site
+import sqlite3
+import sys
+import timeit
+
+_plugin_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+site.addsitedir(os.path.join(_plugin_dir, "ext-libs"))
+
+from plugin.util import mp_helper  # noqa: E402
+
+_DEFAULT_PATH = os.path.join(_plugin_dir, "sample_data", "koh-samui_thailand.mbtiles")
+_REPETITIONS = 5
+
+
+def _read_tiles(path):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles").fetchall()
+    finally:
+        conn.close()
+    tiles = []
+    for zoom_level, col, row, data in rows:
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+        # the location only affects the output coordinates, not the decoding effort
+        tiles.append(([False, zoom_level, col, row, 0.0, 0.0, 1.0, 1.0], data))
+    return tiles
+
+
+def _decode_hex(tiles):
+    for location_args, data in tiles:
+        mp_helper._decode_native_hex(location_args, data, None)
+
+
+def _decode_raw(tiles):
+    for location_args, data in tiles:
+        mp_helper._decode_native_raw(location_args, data, None)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else _DEFAULT_PATH
+    tiles = _read_tiles(path)
+    nr_bytes = sum(len(data) for _, data in tiles)
+    print("{} tiles, {:.1f} MB uncompressed".format(len(tiles), nr_bytes / 1024.0 / 1024.0))
+
+    mp_helper.load_lib()
+    if not mp_helper.native_decoding_supported():
+        print("The native lib is not available on this platform")
+        return
+
+    benchmarks = [("hex", _decode_hex)]
+    if mp_helper.raw_decoding_supported():
+        benchmarks.append(("raw", _decode_raw))
+    else:
+        print("The native lib doesn't export decodeMvtBytesToJson, rebuild it to benchmark the raw path")
+
+    for name, func in benchmarks:
+        seconds = min(timeit.repeat(lambda: func(tiles), number=1, repeat=_REPETITIONS))
+        print("{}: {:.3f}s ({:.2f}ms per tile)".format(name, seconds, seconds * 1000.0 / len(tiles)))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,16 @@ def get_tests():
     from tests.test_vtreader import VtReaderTests
     from tests.test_tilejson import TileJsonTests
     from tests.test_networkhelper import NetworkHelperTests
+    from tests.test_decoder import DecoderTests
+    from tests.test_mp_helper import MpHelperTests
+    from tests.test_decode_scheduler import DecodeSchedulerTests
+    from tests.test_shared_tiles import SharedTilesTests
+    from tests.test_sqlite_helper import SqliteHelperTests
+    from tests.test_tile_stats import TileStatsTests
+    from tests.test_endpoint_balancer import EndpointBalancerTests
+    from tests.test_directory_source import DirectorySourceTests
+    from tests.test_pmtiles_source import PMTilesSourceTests
+    from tests.test_tile_cache import TileCacheTests
 
     from tests.style_converter_tests.test_filters import StyleConverterFilterTests
     from tests.style_converter_tests.test_helper import StyleConverterHelperTests
@@ -31,6 +41,16 @@ def get_tests():
         unittest.TestLoader().loadTestsFromTestCase(FileHelperTests),
         unittest.TestLoader().loadTestsFromTestCase(TileJsonTests),
         unittest.TestLoader().loadTestsFromTestCase(NetworkHelperTests),
+        unittest.TestLoader().loadTestsFromTestCase(DecoderTests),
+        unittest.TestLoader().loadTestsFromTestCase(MpHelperTests),
+        unittest.TestLoader().loadTestsFromTestCase(DecodeSchedulerTests),
+        unittest.TestLoader().loadTestsFromTestCase(SharedTilesTests),
+        unittest.TestLoader().loadTestsFromTestCase(SqliteHelperTests),
+        unittest.TestLoader().loadTestsFromTestCase(TileStatsTests),
+        unittest.TestLoader().loadTestsFromTestCase(EndpointBalancerTests),
+        unittest.TestLoader().loadTestsFromTestCase(DirectorySourceTests),
+        unittest.TestLoader().loadTestsFromTestCase(PMTilesSourceTests),
+        unittest.TestLoader().loadTestsFromTestCase(TileCacheTests),
         unittest.TestLoader().loadTestsFromTestCase(VtReaderTests),
         unittest.TestLoader().loadTestsFromTestCase(StyleConverterFilterTests),
         unittest.TestLoader().loadTestsFromTestCase(StyleConverterHelperTests),
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import sys
+import mock
+from plugin.util.decode_scheduler import DecodeScheduler
+
+
+class DecodeSchedulerTests(unittest.TestCase):
+    """
+    Tests for the decision whether a tile is decoded serially or in parallel
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def test_small_tiles_serial(self):
+        scheduler = DecodeScheduler(dispatch_overhead_seconds=0.01)
+        scheduler.add_measurement(nr_bytes=1000, seconds=0.001)
+        self.assertFalse(scheduler.decode_in_parallel(5000))
+        self.assertTrue(scheduler.decode_in_parallel(50000))
+
+    def test_throughput_measured(self):
+        scheduler = DecodeScheduler(dispatch_overhead_seconds=0.01)
+        scheduler.add_measurement(nr_bytes=1000, seconds=0.01)
+        self.assertEqual(100000, scheduler.bytes_per_second())
+        scheduler.add_measurement(nr_bytes=2000, seconds=0.01)
+        self.assertAlmostEqual(120000, scheduler.bytes_per_second())
+        self.assertAlmostEqual(0.5, scheduler.estimate_seconds(60000))
+
+    def test_invalid_measurement_ignored(self):
+        scheduler = DecodeScheduler(dispatch_overhead_seconds=0.01)
+        bytes_per_second = scheduler.bytes_per_second()
+        scheduler.add_measurement(nr_bytes=0, seconds=0.01)
+        scheduler.add_measurement(nr_bytes=1000, seconds=0)
+        self.assertEqual(bytes_per_second, scheduler.bytes_per_second())
+
+    @mock.patch("plugin.util.decode_scheduler.info")
+    def test_decisions_logged(self, mock_info):
+        scheduler = DecodeScheduler(dispatch_overhead_seconds=0)
+        scheduler.decode_in_parallel(100)
+        scheduler.log_decisions()
+        args = mock_info.call_args[0]
+        self.assertEqual((0, 0, 1, 100), args[1:5])
+
+
+def suite():
+    s = unittest.makeSuite(DecodeSchedulerTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
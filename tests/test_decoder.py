@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import os
+import sys
+from array import array
+import mapbox_vector_tile
+from mapbox_vector_tile import decoder
+
+
+class DecoderTests(unittest.TestCase):
+    """
+    Tests for the geometry decoding of mapbox_vector_tile
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(os.path.dirname(__file__), "data", "uster.pbf"), "rb") as f:
+            cls.data = f.read()
+        cls.tile = decoder.TileData()
+        cls.tile.tile.ParseFromString(cls.data)
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def test_nested_geometries_unchanged(self):
+        for layer in self.tile.tile.layers:
+            for feature in layer.features:
+                for y_coord_down in [True, False]:
+                    expected = _legacy_parse_geometry(feature.geometry, feature.type, layer.extent, y_coord_down)
+                    geometry = self.tile.parse_geometry(feature.geometry, feature.type, layer.extent, y_coord_down)
+                    self.assertEqual(expected, geometry)
+
+    def test_flat_geometries_match_nested(self):
+        for layer in self.tile.tile.layers:
+            for feature in layer.features:
+                nested = self.tile.parse_geometry(feature.geometry, feature.type, layer.extent, False)
+                flat = self.tile.parse_geometry_flat(feature.geometry, feature.type, layer.extent, False)
+                self.assertEqual(nested, _to_nested(feature.type, flat))
+
+    def test_layer_names(self):
+        names = [name for name, _ in decoder.iter_layers(self.data)]
+        self.assertEqual([layer.name for layer in self.tile.tile.layers], names)
+
+    def test_decode_with_layer_filter(self):
+        layer_filter = ["landcover", "place", "water_name"]
+        all_layers = mapbox_vector_tile.decode(self.data)
+        filtered_layers = mapbox_vector_tile.decode(self.data, layer_filter=layer_filter)
+        self.assertEqual({name: all_layers[name] for name in layer_filter}, filtered_layers)
+
+    def test_decode_with_empty_layer_filter(self):
+        self.assertEqual({}, mapbox_vector_tile.decode(self.data, layer_filter=[]))
+
+    def test_parse_values(self):
+        for layer in self.tile.tile.layers:
+            expected = [self.tile.parse_value(val) for val in layer.values]
+            self.assertEqual(expected, self.tile.parse_values(layer.values))
+
+    def test_property_keys_shared(self):
+        features = mapbox_vector_tile.decode(self.data, layer_filter=["poi"])["poi"]["features"]
+        keys_by_name = {}
+        for feature in features:
+            for key in feature["properties"]:
+                self.assertIs(keys_by_name.setdefault(key, key), key)
+
+    def test_decode_point(self):
+        coords, offsets = decoder.decode_geometry([9, 50, 34], decoder.POINT, 4096, True)
+        self.assertEqual(array("i", [25, 17]), coords)
+        self.assertEqual(array("i", [0, 1]), offsets)
+
+    def test_decode_polygon_is_closed(self):
+        coords, offsets = decoder.decode_geometry([9, 6, 12, 18, 10, 12, 24, 44, 15], decoder.POLYGON, 4096, True)
+        self.assertEqual(array("i", [3, 6, 8, 12, 20, 34, 3, 6]), coords)
+        self.assertEqual(array("i", [0, 4]), offsets)
+
+    def test_ring_area_signs(self):
+        coords = array("i", [0, 0, 10, 0, 10, 10, 0, 0, 0, 0, 0, 10, 10, 10, 0, 0, 5, 5, 5, 5])
+        offsets = array("i", [0, 4, 8, 10])
+        self.assertEqual([1, -1, 0], decoder.ring_area_signs(coords, offsets))
+
+    def test_numpy_geometry_format(self):
+        if decoder.np is None:
+            self.skipTest("numpy is not available")
+        for layer in self.tile.tile.layers:
+            feature = layer.features[0]
+            flat = self.tile.parse_geometry_flat(feature.geometry, feature.type, layer.extent, False)
+            numpy_buffers = self.tile.parse_geometry_flat(
+                feature.geometry, feature.type, layer.extent, False, as_numpy=True
+            )
+            self.assertEqual(flat["geometry"].tolist(), numpy_buffers["geometry"].tolist())
+            self.assertEqual(flat["ring_offsets"].tolist(), numpy_buffers["ring_offsets"].tolist())
+
+
+def _to_nested(geo_type, flat):
+    coords = flat["geometry"]
+    ring_offsets = flat["ring_offsets"]
+    rings = []
+    for r in range(len(ring_offsets) - 1):
+        rings.append([[coords[2 * i], coords[2 * i + 1]] for i in range(ring_offsets[r], ring_offsets[r + 1])])
+    if geo_type == decoder.POINT:
+        return rings[0]
+    if geo_type == decoder.LINESTRING:
+        if not rings:
+            return []
+        return rings[0] if len(rings) == 1 else rings
+    polygon_offsets = flat["polygon_offsets"]
+    polygons = [rings[polygon_offsets[p] : polygon_offsets[p + 1]] for p in range(len(polygon_offsets) - 1)]
+    return polygons[0] if len(polygons) == 1 else polygons
+
+
+def _legacy_parse_geometry(geom, ftype, extent, y_coord_down):
+    """
+     * The string based geometry decoding that has been used before, kept as reference
+    """
+    i = 0
+    coords = []
+    dx = 0
+    dy = 0
+    parts = []
+
+    def zero_pad(val):
+        return "0" + val if val[0] == "b" else val
+
+    def ensure_polygon_closed(c):
+        if c and c[0] != c[-1]:
+            c.append(c[0])
+
+    while i != len(geom):
+        item = bin(geom[i])
+        ilen = len(item)
+        cmd = int(zero_pad(item[(ilen - 3) : ilen]), 2)
+        cmd_len = int(zero_pad(item[: ilen - 3]), 2)
+        i = i + 1
+        if cmd == decoder.CMD_SEG_END:
+            if ftype == decoder.POLYGON:
+                ensure_polygon_closed(coords)
+            parts.append(coords)
+            coords = []
+        elif cmd == decoder.CMD_MOVE_TO or cmd == decoder.CMD_LINE_TO:
+            if coords and cmd == decoder.CMD_MOVE_TO:
+                if ftype in (decoder.LINESTRING, decoder.POLYGON):
+                    if ftype == decoder.POLYGON:
+                        ensure_polygon_closed(coords)
+                    parts.append(coords)
+                    coords = []
+            for _ in range(0, cmd_len):
+                x = geom[i]
+                y = geom[i + 1]
+                i = i + 2
+                x = ((x >> 1) ^ (-(x & 1))) + dx
+                y = ((y >> 1) ^ (-(y & 1))) + dy
+                dx = x
+                dy = y
+                if not y_coord_down:
+                    y = extent - y
+                coords.append([x, y])
+
+    if ftype == decoder.POINT:
+        return coords
+    elif ftype == decoder.LINESTRING:
+        if parts:
+            if coords:
+                parts.append(coords)
+            return parts[0] if len(parts) == 1 else parts
+        return coords
+    if coords:
+        parts.append(coords)
+
+    def area_sign(ring):
+        a = sum(ring[k][0] * ring[k + 1][1] - ring[k + 1][0] * ring[k][1] for k in range(0, len(ring) - 1))
+        return -1 if a < 0 else 1 if a > 0 else 0
+
+    polygon = []
+    polygons = []
+    winding = 0
+    for ring in parts:
+        a = area_sign(ring)
+        if a == 0:
+            continue
+        if winding == 0:
+            winding = a
+        if winding == a:
+            if polygon:
+                polygons.append(polygon)
+            polygon = [ring]
+        else:
+            polygon.append(ring)
+    if polygon:
+        polygons.append(polygon)
+    return polygons[0] if len(polygons) == 1 else polygons
+
+
+def suite():
+    s = unittest.makeSuite(DecoderTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
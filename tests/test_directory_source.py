@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+from plugin.util.tile_source import DirectorySource
+from plugin.util import tile_source
+
+
+class DirectorySourceTests(unittest.TestCase):
+    """
+    Tests for DirectorySource
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        with open(os.path.join(self.path, "metadata.json"), "w") as f:
+            f.write('{"name": "test", "bounds": [-180, -85, 180, 85], "vector_layers": [{"id": "water"}]}')
+        _write_tile(self.path, "14/1/2.pbf", b"pbf")
+        _write_tile(self.path, "14/1/3.mvt", b"mvt")
+        _write_tile(self.path, "14/2/2.pbf.gz", gzip.compress(b"gz"))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_load_tiles(self):
+        src = DirectorySource(self.path)
+        tiles = src.load_tiles(14, tiles_to_load=[(1, 2), (1, 3), (2, 2), (2, 3)])
+        data_by_coord = {t.coord(): data for t, data in tiles}
+        self.assertEqual({(1, 2), (1, 3), (2, 2)}, set(data_by_coord))
+        self.assertEqual(b"pbf", data_by_coord[(1, 2)])
+        self.assertEqual(b"mvt", data_by_coord[(1, 3)])
+        self.assertEqual(b"gz", gzip.decompress(data_by_coord[(2, 2)]))
+
+    def test_progress(self):
+        src = DirectorySource(self.path)
+        max_progress = []
+        progress = []
+        src.max_progress_changed.connect(max_progress.append)
+        src.progress_changed.connect(progress.append)
+        src.load_tiles(14, tiles_to_load=[(1, 2), (1, 3), (2, 2), (2, 3)])
+        self.assertEqual([4], max_progress)
+        self.assertEqual(4, progress[-1])
+
+    def test_load_tiles_with_limit(self):
+        src = DirectorySource(self.path)
+        tiles = src.load_tiles(14, tiles_to_load=[(1, 2), (1, 3), (2, 2)], max_tiles=1)
+        self.assertEqual(1, len(tiles))
+
+    def test_tile_file_candidates(self):
+        self.assertEqual(["2.pbf", "2.mvt", "2.pbf.gz"], tile_source._get_tile_file_candidates("2.pbf"))
+        self.assertEqual(["2.pbf.gz", "2.pbf", "2.mvt"], tile_source._get_tile_file_candidates("2.pbf.gz"))
+        self.assertEqual(["2.bin"], tile_source._get_tile_file_candidates("2.bin"))
+
+
+def _write_tile(directory, relative_path, content):
+    path = os.path.join(directory, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def suite():
+    s = unittest.makeSuite(DirectorySourceTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
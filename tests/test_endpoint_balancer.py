@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import sys
+from plugin.util.endpoint_balancer import EndpointBalancer
+
+
+class EndpointBalancerTests(unittest.TestCase):
+    """
+    Tests for choosing the endpoints of the tile requests
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def test_requests_spread(self):
+        balancer = EndpointBalancer(max_requests_per_host=2)
+        chosen = []
+        for _ in range(4):
+            url = balancer.choose(_URLS)
+            balancer.request_started(url)
+            chosen.append(url)
+        self.assertEqual(sorted(_URLS * 2), sorted(chosen))
+        self.assertIsNone(balancer.choose(_URLS))
+
+    def test_faster_endpoint_preferred(self):
+        balancer = EndpointBalancer()
+        _finish(balancer, "http://a.com/1", seconds=1.0)
+        _finish(balancer, "http://b.com/1", seconds=0.1)
+        self.assertEqual("http://b.com/1", balancer.choose(_URLS))
+
+    def test_faster_endpoint_busy(self):
+        balancer = EndpointBalancer()
+        _finish(balancer, "http://a.com/1", seconds=0.2)
+        _finish(balancer, "http://b.com/1", seconds=0.1)
+        balancer.request_started("http://b.com/1")
+        balancer.request_started("http://b.com/1")
+        self.assertEqual("http://a.com/1", balancer.choose(_URLS))
+
+    def test_failing_endpoint_avoided(self):
+        balancer = EndpointBalancer()
+        _finish(balancer, "http://a.com/1", seconds=0.1, failed=True)
+        _finish(balancer, "http://b.com/1", seconds=0.1)
+        self.assertEqual("http://b.com/1", balancer.choose(_URLS))
+
+    def test_excluded_hosts(self):
+        balancer = EndpointBalancer()
+        self.assertEqual("http://b.com/1", balancer.choose(_URLS, excluded_hosts={"a.com"}))
+        self.assertIsNone(balancer.choose(_URLS, excluded_hosts={"a.com", "b.com"}))
+
+    def test_backoff(self):
+        balancer = EndpointBalancer(max_requests_per_host=4)
+        for _ in range(2):
+            _finish(balancer, "http://a.com/1", seconds=0.1, failed=True)
+        self.assertTrue(balancer.is_backed_off("a.com"))
+        balancer.request_started("http://a.com/1")
+        self.assertIsNone(balancer.choose(["http://a.com/1"]))
+        balancer.request_finished("http://a.com/1", seconds=0.1, failed=False)
+        self.assertFalse(balancer.is_backed_off("a.com"))
+
+    def test_aborted_request_not_measured(self):
+        balancer = EndpointBalancer(max_requests_per_host=1)
+        balancer.request_started("http://a.com/1")
+        balancer.request_finished("http://a.com/1", seconds=None, failed=False)
+        self.assertEqual("http://a.com/1", balancer.choose(["http://a.com/1"]))
+        self.assertFalse(balancer.is_backed_off("a.com"))
+
+
+_URLS = ["http://a.com/1", "http://b.com/1"]
+
+
+def _finish(balancer, url, seconds, failed=False):
+    balancer.request_started(url)
+    balancer.request_finished(url, seconds=seconds, failed=failed)
+
+
+def suite():
+    s = unittest.makeSuite(EndpointBalancerTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
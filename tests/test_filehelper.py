@@ -13,9 +13,7 @@ from plugin.util.file_helper import (
     get_sample_data_directory,
     assure_temp_dirs_exist,
     get_styles,
-    get_cache_entry,
 )
-from plugin.util import file_helper
 
 
 class FileHelperTests(unittest.TestCase):
@@ -76,13 +74,6 @@ class FileHelperTests(unittest.TestCase):
     def test_get_styles(self):
         self.assertEqual(0, len(get_styles("total_random_name_that_doesnt_exist")))
 
-    def test_get_cached_tile(self):
-        self.assertIsNone(get_cache_entry("blabla", "zoom", "x", "y"))
-
-    def test_get_cached_tile_file_name(self):
-        path = os.path.join(get_cache_directory(), "test", "2", "3", "4.bin")
-        self.assertEqual(path, file_helper._get_cache_entry_path("test", zoom_level=2, x=3, y=4))
-
 
 def suite():
     s = unittest.makeSuite(FileHelperTests, "test")
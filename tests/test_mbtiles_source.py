@@ -112,10 +112,74 @@ class MbtileSourceTests(unittest.TestCase):
         self.assertEqual(1, len(all_tiles))
         self.assertEqual((8586, 10642), all_tiles[0][0].coord())
 
-    def test_where_clause(self):
+    def test_tiles_query(self):
         src = _create("uster_zh.mbtiles", directory=_sample_dir())
-        where_clause = src._get_where_clause(tiles_to_load=[], zoom_level=14)
-        self.assertEqual('WHERE zoom_level = 14 AND tile_column || ";" || tile_row IN ()', where_clause)
+        sql, params = src._get_tiles_query(zoom_level=14, tile_ranges=[(1, 2, 3), (4, 5, 5)])
+        self.assertTrue("VALUES (?, ?, ?), (?, ?, ?))" in sql)
+        self.assertEqual([1, 2, 3, 4, 5, 5, 14], params)
+
+    def test_load_tiles_of_multiple_ranges(self):
+        src = _create("uster_zh.mbtiles", directory=_sample_dir())
+        tiles_to_load = [(8586, 10642), (8586, 10643), (8587, 10642)]
+        all_tiles = src.load_tiles(14, tiles_to_load=tiles_to_load)
+        self.assertEqual(sorted(tiles_to_load), sorted(t.coord() for t, _ in all_tiles))
+
+    def test_iter_tiles(self):
+        src = _create("uster_zh.mbtiles", directory=_sample_dir())
+        tiles = src.iter_tiles(14, tiles_to_load=[(8586, 10642), (8587, 10642)])
+        tile, data = next(tiles)
+        self.assertTrue(data)
+        self.assertEqual(1, len(list(tiles)))
+
+    def test_iter_from_db_in_batches(self):
+        src = _create("uster_zh.mbtiles", directory=_sample_dir())
+        rows = list(src._iter_from_db("select zoom_level from tiles where zoom_level = ?", params=(14,), batch_size=2))
+        self.assertEqual(len(src._get_from_db("select zoom_level from tiles where zoom_level = 14")), len(rows))
+
+    def test_deduplicated_schema(self):
+        self.assertFalse(_create("uster_zh.mbtiles", directory=_sample_dir())._is_deduplicated())
+        self.assertTrue(_create("koh-samui_thailand.mbtiles", directory=_sample_dir())._is_deduplicated())
+
+    def test_load_deduplicated_tiles(self):
+        src = _create("koh-samui_thailand.mbtiles", directory=_sample_dir())
+        tiles_to_load = [(col, row) for col in range(12738, 12748) for row in range(8621, 8632)]
+        all_tiles = src.load_tiles(14, tiles_to_load=tiles_to_load)
+        self.assertEqual(sorted(tiles_to_load), sorted(t.coord() for t, _ in all_tiles))
+        expected = {}
+        for row in src._get_from_db("select tile_column, tile_row, tile_data from tiles where zoom_level = 14"):
+            expected[(row["tile_column"], row["tile_row"])] = row["tile_data"]
+        self.assertEqual(expected, {t.coord(): data for t, data in all_tiles})
+        content_ids = [t.content_id for t, _ in all_tiles]
+        self.assertNotIn(None, content_ids)
+        self.assertLess(len(set(content_ids)), len(content_ids))
+        for tile, _ in all_tiles:
+            self.assertEqual(content_ids.count(tile.content_id), tile.nr_of_tiles_with_content)
+
+    def test_deduplicated_tiles_query(self):
+        sql, params = MBTilesSource._get_tiles_query(zoom_level=14, tile_ranges=[(1, 2, 3)], deduplicated=True)
+        self.assertTrue("CROSS JOIN map" in sql)
+        self.assertTrue("tile_id" in sql)
+        self.assertEqual([1, 2, 3, 14], params)
+
+    def test_connection_reused_after_release(self):
+        src = _create("koh-samui_thailand.mbtiles", directory=_sample_dir())
+        conn = src._get_connection()
+        src.release_connection()
+        other_src = _create("koh-samui_thailand.mbtiles", directory=_sample_dir())
+        self.assertIs(conn, other_src._get_connection())
+        other_src.close_connection()
+
+    def test_zoom_stats(self):
+        src = _create("koh-samui_thailand.mbtiles", directory=_sample_dir())
+        stats = src._compute_zoom_stats(zoom_level=14)
+        self.assertEqual(110, stats["nr_of_tiles"])
+        self.assertEqual((12738, 12747, 8621, 8631), (stats["x_min"], stats["x_max"], stats["y_min"], stats["y_max"]))
+        self.assertGreater(stats["average_tile_size"], 0)
+        self.assertEqual(stats, src._get_zoom_stats(zoom_level=14))
+
+    def test_tile_ranges(self):
+        tiles = {(2, 7), (1, 3), (1, 1), (1, 2), (2, 5), (2, 6), (3, 1)}
+        self.assertEqual([(1, 1, 3), (2, 5, 7), (3, 1, 1)], MBTilesSource._get_tile_ranges(tiles))
 
 
 def _sample_dir():
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import gzip
+import os
+import sys
+import time
+from ctypes import addressof, create_string_buffer, string_at
+import mock
+from plugin.util import mp_helper
+from plugin.util.tile_helper import VectorTile
+
+
+class MpHelperTests(unittest.TestCase):
+    """
+    Tests for decoding tiles on the decoder threads and processes
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(os.path.dirname(__file__), "data", "uster.pbf"), "rb") as f:
+            cls.data = f.read()
+        mp_helper.load_lib()
+        cls.executor = mp_helper.create_decoder_executor(nr_threads=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+        mp_helper.unload_lib()
+
+    def _skip_without_native_lib(self):
+        if not mp_helper.native_decoding_supported():
+            self.skipTest("The native lib is not available on this platform")
+
+    def _get_tiles(self, nr_tiles):
+        return [(VectorTile("xyz", 14, 8580 + i, 5738), self.data, True, None) for i in range(nr_tiles)]
+
+    def test_streaming_limits_tiles_in_flight(self):
+        loaded = []
+
+        def load_tiles():
+            for i in range(20):
+                loaded.append(i)
+                yield i
+
+        decoded = []
+        for result in mp_helper.decode_tiles_streaming(
+            load_tiles(), submit_func=lambda t: self.executor.submit(_decode_slowly, t), max_in_flight=3
+        ):
+            self.assertLessEqual(len(loaded) - len(decoded), 3)
+            decoded.append(result)
+        self.assertEqual(list(range(20)), sorted(decoded))
+
+    def test_streaming_inline(self):
+        results = mp_helper.decode_tiles_streaming(
+            range(5), submit_func=lambda t: mp_helper.run_inline(_decode_slowly, t), max_in_flight=2
+        )
+        self.assertEqual(list(range(5)), list(results))
+
+    def test_streaming_cancelled(self):
+        decoded = []
+        results = mp_helper.decode_tiles_streaming(
+            range(100),
+            submit_func=lambda t: self.executor.submit(_decode_slowly, t),
+            max_in_flight=4,
+            should_cancel_func=lambda: len(decoded) >= 5,
+        )
+        for result in results:
+            decoded.append(result)
+        self.assertLess(len(decoded), 100)
+
+    def test_lib_reloaded_after_unload(self):
+        self._skip_without_native_lib()
+        tile = self._get_tiles(1)[0]
+        expected = mp_helper.decode_tile_native(tile)[1]
+        mp_helper.unload_lib()
+        self.assertFalse(mp_helper.native_decoding_supported())
+        mp_helper.load_lib()
+        self.assertEqual(expected, mp_helper.decode_tile_native(tile)[1])
+
+    def test_native_layer_filter_matches_python_decoder(self):
+        self._skip_without_native_lib()
+        for layer_filter in [None, ["landcover", "water_name"], []]:
+            tile = (VectorTile("xyz", 14, 8580, 5738), self.data, True, layer_filter)
+            native_layers = mp_helper.decode_tile_native(tile)[1]
+            python_layers = mp_helper.decode_tile_python(tile)[1]
+            self.assertEqual(sorted(python_layers), sorted(native_layers))
+        self.assertEqual({}, native_layers)
+
+    def test_raw_decoding_passes_tile_data_without_hex_encoding(self):
+        decoded_json = create_string_buffer(b'{"water": {}}')
+        lib = mock.Mock(spec=["decodeMvtBytesToJson", "freeme"])
+        lib.decodeMvtBytesToJson.return_value = addressof(decoded_json)
+        data = bytearray(self.data)
+        with mock.patch.object(mp_helper, "_native_lib_handle", lib):
+            self.assertTrue(mp_helper.raw_decoding_supported())
+            result = mp_helper._decode_native_raw(["location"], data, ["water"])
+        self.assertEqual(b'{"water": {}}', result)
+        location, buffer, length, layer_names, nr_layer_names = lib.decodeMvtBytesToJson.call_args[0]
+        self.assertEqual("location", location)
+        self.assertEqual(len(self.data), length)
+        self.assertEqual(self.data, string_at(addressof(buffer), length))
+        self.assertEqual(addressof(buffer), addressof((type(buffer)).from_buffer(data)))
+        self.assertEqual([b"water"], list(layer_names))
+        self.assertEqual(1, nr_layer_names)
+        lib.freeme.assert_called_once_with(addressof(decoded_json))
+
+    def test_raw_decoding_matches_hex_decoding(self):
+        self._skip_without_native_lib()
+        if not mp_helper.raw_decoding_supported():
+            self.skipTest("The native lib doesn't support raw tile data")
+        location_args = mp_helper._get_location_args(VectorTile("xyz", 14, 8580, 5738), True)
+        raw = mp_helper._decode_native_raw(location_args, self.data, None)
+        hex_encoded, _ = mp_helper._decode_native_hex(location_args, self.data, None)
+        self.assertEqual(hex_encoded, raw)
+
+    def test_unzip(self):
+        self.assertEqual(self.data, mp_helper.unzip(gzip.compress(self.data)))
+
+    def test_unzip_multiple_members(self):
+        self.assertEqual(self.data + self.data, mp_helper.unzip(gzip.compress(self.data) + gzip.compress(self.data)))
+
+    def test_unzip_uncompressed(self):
+        self.assertIs(self.data, mp_helper.unzip(self.data))
+
+
+def _decode_slowly(t):
+    time.sleep(0.001)
+    return t
+
+
+def suite():
+    s = unittest.makeSuite(MpHelperTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
@@ -1,5 +1,10 @@
 from qgis.testing import unittest
-from plugin.util.network_helper import url_exists
+from PyQt5.QtCore import QByteArray, QObject, QTimer, QUrl, pyqtSignal
+from PyQt5.QtNetwork import QNetworkReply, QNetworkRequest
+import mock
+from plugin.util import network_helper
+from plugin.util.endpoint_balancer import EndpointBalancer
+from plugin.util.network_helper import get_max_age, load_tiles_async, url_exists
 
 
 class NetworkHelperTests(unittest.TestCase):
@@ -23,3 +28,158 @@ class NetworkHelperTests(unittest.TestCase):
     def test_url_exists_not(self):
         exists, error, _ = url_exists("https://traaadsfadsfadssfdsfdsfdsvis-ci.org/")
         self.assertFalse(exists)
+
+    def test_load_tiles(self):
+        fake = _FakeNetwork()
+        urls = [("http://a.com/{}".format(i), i, 0) for i in range(10)]
+        progress = []
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = list(load_tiles_async(urls, on_progress_changed=progress.append, max_requests_per_host=3))
+        self.assertEqual(
+            [((i, 0), "http://a.com/{}".format(i).encode()) for i in range(10)], sorted(r[:2] for r in results)
+        )
+        self.assertEqual(list(range(1, 11)), progress)
+        self.assertEqual(3, fake.max_running_by_host["a.com"])
+
+    def test_load_tiles_limited_per_host(self):
+        fake = _FakeNetwork()
+        urls = [("http://{}.com/{}".format(host, i), i, 0) for i in range(6) for host in ["a", "b"]]
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = list(load_tiles_async(urls, max_requests_per_host=2))
+        self.assertEqual(12, len(results))
+        self.assertEqual({"a.com": 2, "b.com": 2}, fake.max_running_by_host)
+
+    def test_load_tiles_with_errors(self):
+        fake = _FakeNetwork(failing_urls={"http://a.com/1"})
+        urls = [("http://a.com/{}".format(i), i, 0) for i in range(3)]
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = list(load_tiles_async(urls))
+        self.assertEqual([(0, 0), (2, 0)], sorted(coord for coord, _, _ in results))
+
+    def test_load_tiles_revalidated(self):
+        fake = _FakeNetwork(not_modified_urls={"http://a.com/1"})
+        urls = [("http://a.com/{}".format(i), i, 0) for i in range(2)]
+        validators = {(1, 0): {"etag": '"abc"'}}
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = sorted(load_tiles_async(urls, validators_by_coord=validators))
+        self.assertEqual([None, {"etag": '"abc"'}], fake.validators)
+        self.assertEqual(((1, 0), None, {"etag": '"abc"', "last_modified": None, "max_age": 60}), results[1])
+        self.assertEqual(b"http://a.com/0", results[0][1])
+
+    def test_load_tiles_retried_on_other_endpoint(self):
+        fake = _FakeNetwork(failing_urls={"http://a.com/1"})
+        urls = [(["http://a.com/{}".format(i), "http://b.com/{}".format(i)], i, 0) for i in range(4)]
+        balancer = EndpointBalancer()
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = list(load_tiles_async(urls, balancer=balancer))
+        self.assertEqual([(i, 0) for i in range(4)], sorted(coord for coord, _, _ in results))
+        self.assertIn("http://b.com/1", [r.url_string for r in fake.replies])
+        self.assertEqual({"a.com", "b.com"}, set(fake.max_running_by_host))
+
+    def test_load_tiles_not_held_up_by_busy_host(self):
+        fake = _FakeNetwork()
+        urls = [("http://a.com/0", 0, 0), ("http://a.com/1", 1, 0), ("http://b.com/2", 2, 0)]
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = list(load_tiles_async(urls, max_requests_per_host=1))
+        self.assertEqual(3, len(results))
+        self.assertEqual(
+            ["http://a.com/0", "http://b.com/2", "http://a.com/1"], [r.url_string for r in fake.replies]
+        )
+
+    def test_max_age(self):
+        self.assertIsNone(get_max_age(None))
+        self.assertIsNone(get_max_age("public"))
+        self.assertEqual(3600, get_max_age("public, max-age=3600"))
+        self.assertEqual(0, get_max_age("max-age=3600, no-cache"))
+        self.assertEqual(0, get_max_age("no-store"))
+
+    def test_load_tiles_aborted_when_cancelled(self):
+        fake = _FakeNetwork()
+        urls = [("http://a.com/{}".format(i), i, 0) for i in range(10)]
+        results = []
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            for result in load_tiles_async(urls, cancelling_func=lambda: len(results) >= 2, max_requests_per_host=3):
+                results.append(result)
+        self.assertEqual(2, len(results))
+        self.assertLess(len(fake.replies), 10)
+        self.assertTrue(all(r.isFinished() for r in fake.replies))
+        self.assertTrue(all(r.deleted for r in fake.replies))
+
+    def test_load_tiles_finished_synchronously(self):
+        fake = _FakeNetwork(failing_urls={"http://a.com/0"}, synchronous_urls={"http://a.com/0", "http://b.com/0"})
+        urls = [(["http://a.com/{}".format(i), "http://b.com/{}".format(i)], i, 0) for i in range(4)]
+        with mock.patch.object(network_helper, "http_get_async", side_effect=fake.get):
+            results = list(load_tiles_async(urls, max_requests_per_host=1))
+        self.assertEqual([(i, 0) for i in range(4)], sorted(coord for coord, _, _ in results))
+        self.assertEqual(5, len(fake.replies))
+        self.assertTrue(all(r.deleted for r in fake.replies))
+
+
+class _FakeNetwork:
+    def __init__(self, failing_urls=(), not_modified_urls=(), synchronous_urls=()):
+        self.failing_urls = failing_urls
+        self.not_modified_urls = not_modified_urls
+        self.synchronous_urls = synchronous_urls
+        self.replies = []
+        self.validators = []
+        self.max_running_by_host = {}
+
+    def get(self, url, validators=None):
+        self.validators.append(validators)
+        reply = _FakeReply(url, error=url in self.failing_urls, not_modified=url in self.not_modified_urls)
+        if url in self.synchronous_urls:
+            reply._finish()
+        self.replies.append(reply)
+        host = QUrl(url).host()
+        running = len([r for r in self.replies if QUrl(r.url_string).host() == host and not r.isFinished()])
+        self.max_running_by_host[host] = max(self.max_running_by_host.get(host, 0), running)
+        return reply
+
+
+class _FakeReply(QObject):
+    finished = pyqtSignal()
+
+    def __init__(self, url, error=False, not_modified=False):
+        QObject.__init__(self)
+        self.url_string = url
+        self._error = error
+        self._not_modified = not_modified
+        self._finished = False
+        self.deleted = False
+        QTimer.singleShot(1, self._finish)
+
+    def _finish(self):
+        if not self._finished:
+            self._finished = True
+            self.finished.emit()
+
+    def abort(self):
+        self._error = True
+        self._finish()
+
+    def isFinished(self):
+        return self._finished
+
+    def deleteLater(self):
+        self.deleted = True
+
+    def error(self):
+        return QNetworkReply.UnknownNetworkError if self._error else QNetworkReply.NoError
+
+    def attribute(self, attribute):
+        if attribute == QNetworkRequest.HttpStatusCodeAttribute and not self._error:
+            return 304 if self._not_modified else 200
+        return None
+
+    def errorString(self):
+        return "error"
+
+    def url(self):
+        return QUrl(self.url_string)
+
+    def rawHeader(self, name):
+        headers = {b"ETag": b'"abc"', b"Cache-Control": b"max-age=60"} if self._not_modified else {}
+        return QByteArray(headers.get(name, b""))
+
+    def readAll(self):
+        return QByteArray(self.url_string.encode())
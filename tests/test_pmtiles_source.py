@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import gzip
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from plugin.util.pmtiles import PMTilesArchive, zxy_to_tile_id
+from plugin.util.tile_source import MBTilesSource, PMTilesSource
+
+
+class PMTilesSourceTests(unittest.TestCase):
+    """
+    Tests for PMTilesSource
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        src = MBTilesSource(os.path.join(os.path.dirname(__file__), "..", "sample_data", "koh-samui_thailand.mbtiles"))
+        tiles_to_load = [(col, row) for col in range(12738, 12748) for row in range(8621, 8632)]
+        # the rows of PMTiles are xyz, the rows of the mbtiles file are tms
+        tiles = src.load_tiles(14, tiles_to_load)
+        cls.data_by_coord = {(t.column, (1 << 14) - 1 - t.row): data for t, data in tiles}
+        src.close_connection()
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_tile_ids(self):
+        self.assertEqual(0, zxy_to_tile_id(0, 0, 0))
+        self.assertEqual([1, 2, 3, 4], [zxy_to_tile_id(1, x, y) for x, y in [(0, 0), (0, 1), (1, 1), (1, 0)]])
+        self.assertEqual(5, zxy_to_tile_id(2, 0, 0))
+        self.assertEqual(20, zxy_to_tile_id(2, 3, 0))
+        with self.assertRaises(ValueError):
+            zxy_to_tile_id(1, 2, 0)
+
+    def test_load_tiles(self):
+        src = PMTilesSource(self._write("tiles.pmtiles"))
+        tiles = src.load_tiles(14, tiles_to_load=list(self.data_by_coord) + [(0, 0)])
+        self.assertEqual(self.data_by_coord, {t.coord(): data for t, data in tiles})
+        content_ids = [t.content_id for t, _ in tiles]
+        self.assertEqual(len(set(self.data_by_coord.values())), len(set(content_ids)))
+        src.close_connection()
+
+    def test_load_tiles_from_leaf_directories(self):
+        src = PMTilesSource(self._write("leaves.pmtiles", max_root_entries=4))
+        tiles = src.load_tiles(14, tiles_to_load=list(self.data_by_coord))
+        self.assertEqual(self.data_by_coord, {t.coord(): data for t, data in tiles})
+        src.close_connection()
+
+    def test_load_tiles_with_limit(self):
+        src = PMTilesSource(self._write("limit.pmtiles"))
+        tiles = src.load_tiles(14, tiles_to_load=list(self.data_by_coord), max_tiles=5)
+        self.assertEqual(5, len(tiles))
+        src.close_connection()
+
+    def test_duplicates_read_once(self):
+        path = self._write("duplicates.pmtiles")
+        src = PMTilesSource(path)
+        reads = []
+        archive = src._get_archive()
+        read = archive.read
+        archive.read = lambda offset, length: reads.append(offset) or read(offset, length)
+        src.load_tiles(14, tiles_to_load=list(self.data_by_coord))
+        tile_reads = [offset for offset in reads if offset >= archive.header["tile_data_offset"]]
+        self.assertEqual(len(set(self.data_by_coord.values())), len(tile_reads))
+        src.close_connection()
+
+    def test_metadata(self):
+        src = PMTilesSource(self._write("metadata.pmtiles"))
+        self.assertEqual("koh-samui", src.name())
+        self.assertEqual([{"id": "water"}], src.vector_layers())
+        self.assertEqual((14, 14), (src.min_zoom(), src.max_zoom()))
+        self.assertEqual("xyz", src.scheme())
+        self.assertEqual((99.9, 9.5, 100.1, 9.6), src.bounds())
+        src.close_connection()
+
+    def test_directory_cached(self):
+        archive = PMTilesArchive(self._write("cached.pmtiles", max_root_entries=4))
+        tile_id = zxy_to_tile_id(14, 12738, (1 << 14) - 1 - 8621)
+        archive.find_tile(tile_id)
+        nr_directories = len(archive._directories)
+        archive.find_tile(tile_id)
+        self.assertEqual(nr_directories, len(archive._directories))
+        archive.close()
+
+    def test_non_pmtiles(self):
+        path = os.path.join(os.path.dirname(__file__), "data", "textfile.txt")
+        with self.assertRaises(RuntimeError) as ctx:
+            PMTilesSource(path)
+        self.assertTrue("is not a valid PMTiles file" in str(ctx.exception))
+
+    def _write(self, name, max_root_entries=None):
+        path = os.path.join(self.directory, name)
+        _write_pmtiles(path, 14, self.data_by_coord, max_root_entries=max_root_entries)
+        return path
+
+
+def _write_pmtiles(path, zoom_level, data_by_coord, max_root_entries=None):
+    """
+     * Writes a PMTiles v3 archive with gzipped directories. Tiles with the same content are stored once, consecutive
+       tiles with the same content become a run. If max_root_entries is set, the entries are moved to leaf directories.
+    """
+    tiles = sorted((zxy_to_tile_id(zoom_level, x, y), data) for (x, y), data in data_by_coord.items())
+    tile_data = b""
+    offsets_by_data = {}
+    entries = []
+    for tile_id, data in tiles:
+        offset = offsets_by_data.get(data)
+        if entries and offset is not None and entries[-1][2] == offset and sum(entries[-1][:2]) == tile_id:
+            entries[-1][1] += 1
+            continue
+        if offset is None:
+            offset = len(tile_data)
+            offsets_by_data[data] = offset
+            tile_data += data
+        entries.append([tile_id, 1, offset, len(data)])
+
+    leaves = b""
+    if max_root_entries and len(entries) > max_root_entries:
+        leaf_size = (len(entries) + max_root_entries - 1) // max_root_entries
+        root_entries = []
+        for i in range(0, len(entries), leaf_size):
+            leaf = gzip.compress(_serialize_directory(entries[i : i + leaf_size]))
+            root_entries.append([entries[i][0], 0, len(leaves), len(leaf)])
+            leaves += leaf
+        entries = root_entries
+    root = gzip.compress(_serialize_directory(entries))
+    metadata = gzip.compress(json.dumps({"name": "koh-samui", "vector_layers": [{"id": "water"}]}).encode("utf-8"))
+
+    offset = 127
+    sections = []
+    for section in [root, metadata, leaves, tile_data]:
+        sections.append((offset, len(section)))
+        offset += len(section)
+    header = struct.pack(
+        "<7sB8Q3Q4B2B4iB2i",
+        b"PMTiles",
+        3,
+        *[value for section in sections for value in section],
+        len(tiles),
+        len(entries),
+        len(offsets_by_data),
+        1,
+        2,
+        2,
+        1,
+        zoom_level,
+        zoom_level,
+        999000000,
+        95000000,
+        1001000000,
+        96000000,
+        zoom_level,
+        1000000000,
+        95500000,
+    )
+    with open(path, "wb") as f:
+        f.write(header + root + metadata + leaves + tile_data)
+
+
+def _serialize_directory(entries):
+    data = bytearray(_varint(len(entries)))
+    last_tile_id = 0
+    for tile_id, _, _, _ in entries:
+        data += _varint(tile_id - last_tile_id)
+        last_tile_id = tile_id
+    for entry in entries:
+        data += _varint(entry[1])
+    for entry in entries:
+        data += _varint(entry[3])
+    for entry in entries:
+        data += _varint(entry[2] + 1)
+    return bytes(data)
+
+
+def _varint(value):
+    data = bytearray()
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def suite():
+    s = unittest.makeSuite(PMTilesSourceTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
@@ -29,13 +29,27 @@ class ServerSourceTests(unittest.TestCase):
         self.assertTrue(error in str(ctx.exception))
 
     @mock.patch("plugin.util.tile_source.TileJSON")
-    @mock.patch("plugin.util.tile_source.load_tiles_async", return_value=[((1, 2), "data")])
+    @mock.patch("plugin.util.tile_source.load_tiles_async", return_value=[((1, 2), "data", {})])
     @mock.patch("plugin.util.tile_source.url_exists", return_value=(True, None, "https://localhost"))
     def test_load(self, mock_url_exists, mock_load_tiles_async, mock_tile_json):
+        mock_tile_json.return_value.tiles.return_value = ["https://localhost/{z}/{x}/{y}.pbf"]
         src = ServerSource("https://localhost")
         mock_url_exists.assert_called_with("https://localhost")
         tiles = src.load_tiles(14, [(1, 1)])
         self.assertEqual(1, len(tiles))
+        urls_with_col_and_row = mock_load_tiles_async.call_args[1]["urls_with_col_and_row"]
+        self.assertEqual([(["https://localhost/14/1/1.pbf"], 1, 1)], urls_with_col_and_row)
+
+    @mock.patch("plugin.util.tile_source.TileJSON")
+    @mock.patch("plugin.util.tile_source.url_exists", return_value=(True, None, "https://localhost"))
+    def test_endpoints(self, mock_url_exists, mock_tile_json):
+        mock_tile_json.return_value.tiles.return_value = [
+            "https://{s}.localhost/{z}/{x}/{y}.pbf",
+            "https://other.localhost/{z}/{x}/{y}.pbf",
+        ]
+        src = ServerSource("https://localhost")
+        expected = ["https://{}.localhost/{{z}}/{{x}}/{{y}}.pbf".format(s) for s in ["a", "b", "c", "d", "other"]]
+        self.assertEqual(expected, src._get_endpoints())
 
 
 def suite():
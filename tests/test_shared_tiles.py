@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import gzip
+import sys
+from plugin.util.shared_tiles import SharedTiles
+from plugin.util.tile_helper import VectorTile
+
+
+class SharedTilesTests(unittest.TestCase):
+    """
+    Tests for decoding tiles which share their data only once
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def test_tiles_without_content_id(self):
+        tiles = [(_create_tile(1), b"a"), (_create_tile(2), b"a")]
+        shared = SharedTiles(share_decoded_data=True)
+        self.assertEqual(tiles, list(shared.filter(tiles)))
+
+    def test_duplicates_get_decoded_data(self):
+        tiles = [(_create_tile(1, "x"), b"a"), (_create_tile(2, "x"), b"a"), (_create_tile(3, "y"), b"b")]
+        shared = SharedTiles(share_decoded_data=True)
+        to_decode = list(shared.filter(tiles))
+        self.assertEqual([1, 3], [t.column for t, _ in to_decode])
+        self.assertEqual([], shared.pop_ready())
+
+        decoded_data = {"layer": {}}
+        shared.set_decoded(to_decode[0][0], decoded_data)
+        ready = shared.pop_ready()
+        self.assertEqual([2], [t.column for t in ready])
+        self.assertIs(decoded_data, ready[0].decoded_data)
+        self.assertEqual([], shared.pop_ready())
+
+    def test_duplicate_after_decoding(self):
+        shared = SharedTiles(share_decoded_data=True)
+        first = _create_tile(1, "x")
+        list(shared.filter([(first, b"a")]))
+        shared.set_decoded(first, {"layer": {}})
+        self.assertEqual([], list(shared.filter([(_create_tile(2, "x"), b"a")])))
+        self.assertEqual([2], [t.column for t in shared.pop_ready()])
+
+    def test_duplicates_of_empty_tile(self):
+        tiles = [(_create_tile(1, "x"), b"a"), (_create_tile(2, "x"), b"a")]
+        shared = SharedTiles(share_decoded_data=True)
+        to_decode = list(shared.filter(tiles))
+        shared.set_decoded(to_decode[0][0], None)
+        self.assertEqual([], shared.pop_ready())
+
+    def test_data_decompressed_once_if_not_shared(self):
+        data = gzip.compress(b"tile data")
+        tiles = [(_create_tile(1, "x", 2), data), (_create_tile(2, "x", 2), data)]
+        shared = SharedTiles(share_decoded_data=False)
+        to_decode = list(shared.filter(tiles))
+        self.assertEqual([1, 2], [t.column for t, _ in to_decode])
+        self.assertEqual(b"tile data", to_decode[0][1])
+        self.assertIs(to_decode[0][1], to_decode[1][1])
+
+    def test_data_of_single_tile_passed_compressed(self):
+        data = gzip.compress(b"tile data")
+        shared = SharedTiles(share_decoded_data=False)
+        to_decode = list(shared.filter([(_create_tile(1, "x"), data)]))
+        self.assertIs(data, to_decode[0][1])
+
+
+def _create_tile(col, content_id=None, nr_of_tiles_with_content=1):
+    tile = VectorTile("xyz", 14, col, 0)
+    tile.content_id = content_id
+    tile.nr_of_tiles_with_content = nr_of_tiles_with_content
+    return tile
+
+
+def suite():
+    s = unittest.makeSuite(SharedTilesTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
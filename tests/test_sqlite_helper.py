@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+from plugin.util import sqlite_helper
+
+
+class SqliteHelperTests(unittest.TestCase):
+    """
+    Tests for the pool of read-only SQLite connections
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "with space.mbtiles")
+        _create_db(self.path, value=1)
+
+    def tearDown(self):
+        sqlite_helper.close_idle_connections()
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_only_uri(self):
+        uri = sqlite_helper.get_read_only_uri(self.path)
+        self.assertTrue(uri.startswith("file:"))
+        self.assertTrue(uri.endswith("with%20space.mbtiles?mode=ro&immutable=1"))
+
+    def test_connection_is_read_only(self):
+        conn = sqlite_helper.acquire_connection(self.path)
+        self.assertEqual(1, conn.execute("select value from test").fetchone()["value"])
+        with self.assertRaises(sqlite3.Error):
+            conn.execute("insert into test values (2)")
+        sqlite_helper.release_connection(conn)
+
+    def test_connection_reused_by_other_thread(self):
+        conn = sqlite_helper.acquire_connection(self.path)
+        sqlite_helper.release_connection(conn)
+        connections = []
+
+        def load():
+            c = sqlite_helper.acquire_connection(self.path)
+            c.execute("select value from test").fetchone()
+            connections.append(c)
+            sqlite_helper.release_connection(c)
+
+        thread = threading.Thread(target=load)
+        thread.start()
+        thread.join()
+        self.assertEqual([conn], connections)
+
+    def test_acquired_connections_not_shared(self):
+        conn = sqlite_helper.acquire_connection(self.path)
+        other_conn = sqlite_helper.acquire_connection(self.path)
+        self.assertIsNot(conn, other_conn)
+        sqlite_helper.release_connection(conn)
+        sqlite_helper.release_connection(other_conn)
+
+    def test_replaced_file_not_read_with_previous_connection(self):
+        conn = sqlite_helper.acquire_connection(self.path)
+        sqlite_helper.release_connection(conn)
+        os.remove(self.path)
+        _create_db(self.path, value=2)
+        os.utime(self.path, ns=(0, 0))
+        new_conn = sqlite_helper.acquire_connection(self.path)
+        self.assertIsNot(conn, new_conn)
+        self.assertEqual(2, new_conn.execute("select value from test").fetchone()["value"])
+        sqlite_helper.release_connection(new_conn)
+
+
+def _create_db(path, value):
+    conn = sqlite3.connect(path)
+    conn.execute("create table test (value integer)")
+    conn.execute("insert into test values (?)", (value,))
+    conn.commit()
+    conn.close()
+
+
+def suite():
+    s = unittest.makeSuite(SqliteHelperTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import os
+import sqlite3
+import sys
+import time
+from plugin.util import tile_cache
+from plugin.util.file_helper import clear_cache, get_cache_directory
+from plugin.util.tile_cache import (
+    TIER_RAW,
+    MemoryTileCache,
+    clean_up_caches,
+    estimate_size,
+    get_memory_tile_cache,
+    get_raw_tile_cache,
+    get_tile_cache,
+    set_cache_budgets,
+)
+
+
+class TileCacheTests(unittest.TestCase):
+    """
+    Tests for util.tile_cache
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        tile_cache.close_tile_caches()
+
+    def tearDown(self):
+        set_cache_budgets(tile_cache.DEFAULT_MAX_BYTES_PER_CACHE, tile_cache.DEFAULT_MAX_TOTAL_BYTES)
+        set_cache_budgets(
+            tile_cache.DEFAULT_MAX_RAW_BYTES_PER_CACHE, tile_cache.DEFAULT_MAX_RAW_TOTAL_BYTES, tier=TIER_RAW
+        )
+
+    def test_cache_path(self):
+        cache = get_tile_cache("my source.1234")
+        self.assertEqual(os.path.join(get_cache_directory(), "my_source.1234.sqlite"), cache.path)
+
+    def test_get_uncached(self):
+        self.assertEqual(({}, {}), get_tile_cache("test_uncached").get_many([(14, 1, 2)]))
+
+    def test_get_many(self):
+        cache = get_tile_cache("test_get_many")
+        cache.put_many([((14, 1, 2), {"layer": {"a": 1}}, None), ((14, 3, 4), {"layer": {"b": 2}}, None)])
+        data, validators = cache.get_many([(14, 1, 2), (14, 3, 4), (14, 1, 4), (13, 1, 2)])
+        self.assertEqual({(14, 1, 2): {"layer": {"a": 1}}, (14, 3, 4): {"layer": {"b": 2}}}, data)
+        self.assertEqual({}, validators)
+
+    def test_cached_tile_fresh(self):
+        cache = get_tile_cache("test_fresh")
+        cache.put_many([((14, 1, 2), {"layer": {}}, {"etag": '"a"', "max_age": 60})])
+        self.assertEqual(({(14, 1, 2): {"layer": {}}}, {}), cache.get_many([(14, 1, 2)]))
+
+    def test_expired_tile_with_validators_kept(self):
+        cache = get_tile_cache("test_expired")
+        validators = {"etag": '"a"', "last_modified": None, "max_age": 0}
+        cache.put_many([((14, 1, 2), {"layer": {}}, validators)])
+        _make_old(cache, (14, 1, 2))
+        self.assertEqual(({}, {(14, 1, 2): validators}), cache.get_many([(14, 1, 2)]))
+
+    def test_expired_tile_without_validators_removed(self):
+        cache = get_tile_cache("test_removed")
+        cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        _make_old(cache, (14, 1, 2), age_in_seconds=tile_cache.max_cache_age_minutes * 60 + 10)
+        self.assertEqual(({}, {}), cache.get_many([(14, 1, 2)]))
+        self.assertEqual(0, _count_entries(cache))
+
+    def test_refresh(self):
+        cache = get_tile_cache("test_refresh")
+        cache.put_many([((14, 1, 2), {"layer": {}}, {"etag": '"a"', "max_age": 60})])
+        _make_old(cache, (14, 1, 2))
+        decoded_data = cache.refresh((14, 1, 2), validators={"etag": None, "max_age": 120})
+        self.assertEqual({"layer": {}}, decoded_data)
+        self.assertEqual(({(14, 1, 2): {"layer": {}}}, {}), cache.get_many([(14, 1, 2)]))
+        _make_old(cache, (14, 1, 2))
+        self.assertEqual({(14, 1, 2): {"etag": '"a"', "max_age": 120}}, cache.get_many([(14, 1, 2)])[1])
+
+    def test_refresh_uncached(self):
+        self.assertIsNone(get_tile_cache("test_refresh_uncached").refresh((14, 1, 2), validators={}))
+
+    def test_tile_without_data_not_cached(self):
+        cache = get_tile_cache("test_without_data")
+        cache.put_many([((14, 1, 2), {}, None)])
+        self.assertEqual(({}, {}), cache.get_many([(14, 1, 2)]))
+
+    def test_cleared(self):
+        cache = get_tile_cache("test_cleared")
+        cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        clear_cache()
+        cache = get_tile_cache("test_cleared")
+        self.assertEqual(({}, {}), cache.get_many([(14, 1, 2)]))
+        cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        self.assertTrue(os.path.isfile(cache.path))
+
+    def test_files_of_previous_versions_removed(self):
+        directory = os.path.join(get_cache_directory(), "test_previous", "14", "1")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "2.bin"), "wb") as f:
+            f.write(b"data")
+        get_tile_cache("test_previous").get_many([(14, 1, 2)])
+        self.assertFalse(os.path.isdir(os.path.join(get_cache_directory(), "test_previous")))
+
+    def test_statistics(self):
+        cache = get_tile_cache("test_statistics")
+        cache.put_many([((14, 1, 2), {"layer": {"a": 1}}, None)])
+        cache.get_many([(14, 1, 2), (14, 3, 4)])
+        statistics = cache.statistics()
+        self.assertEqual((1, 1, 0.5), (statistics.hits, statistics.misses, statistics.hit_ratio()))
+        self.assertTrue(statistics.written_bytes > 0)
+        self.assertEqual(statistics.written_bytes, statistics.stored_bytes)
+
+    def test_stored_bytes_of_replaced_entry(self):
+        cache = get_tile_cache("test_replaced")
+        cache.put_many([((14, 1, 2), {"layer": {"a": 1}}, None)])
+        stored_bytes = cache.stored_bytes
+        cache.put_many([((14, 1, 2), {"layer": {"a": 1}}, None)])
+        self.assertEqual(stored_bytes, cache.stored_bytes)
+        cache.close()
+        get_tile_cache("test_replaced").get_many([])
+        self.assertEqual(stored_bytes, _sum_sizes(cache))
+
+    def test_least_recently_used_evicted(self):
+        cache = get_tile_cache("test_evict")
+        cache.put_many([((14, col, 2), {"layer": {"col": col}}, None) for col in range(3)])
+        _make_old(cache, (14, 0, 2), column="accessed_at")
+        _make_old(cache, (14, 2, 2), column="accessed_at", age_in_seconds=1800)
+        cache.get_many([(14, 0, 2)])
+        cache.evict(cache.stored_bytes - 1)
+        self.assertEqual([(14, 0, 2), (14, 1, 2)], sorted(cache.get_many([(14, col, 2) for col in range(3)])[0]))
+        statistics = cache.statistics()
+        self.assertEqual(1, statistics.evictions)
+        self.assertEqual(statistics.written_bytes - statistics.evicted_bytes, statistics.stored_bytes)
+
+    def test_budget_per_cache(self):
+        cache = get_tile_cache("test_budget")
+        cache.put_many([((14, col, 2), {"layer": {"col": col}}, None) for col in range(10)])
+        set_cache_budgets(cache.stored_bytes // 2, tile_cache.DEFAULT_MAX_TOTAL_BYTES)
+        clean_up_caches()
+        self.assertTrue(cache.stored_bytes <= cache.statistics().written_bytes // 2 * tile_cache._LOW_WATER_MARK)
+        self.assertEqual(cache.stored_bytes, _sum_sizes(cache))
+
+    def test_total_budget(self):
+        old_cache = get_tile_cache("test_total_old")
+        new_cache = get_tile_cache("test_total_new")
+        old_cache.put_many([((14, col, 2), {"layer": {"col": col}}, None) for col in range(10)])
+        new_cache.put_many([((14, col, 2), {"layer": {"col": col}}, None) for col in range(10)])
+        for col in range(10):
+            _make_old(old_cache, (14, col, 2), column="accessed_at")
+        total_bytes = tile_cache.get_cache_statistics().stored_bytes
+        set_cache_budgets(tile_cache.DEFAULT_MAX_BYTES_PER_CACHE, total_bytes - new_cache.stored_bytes // 2)
+        clean_up_caches()
+        self.assertEqual(0, new_cache.statistics().evictions)
+        self.assertTrue(old_cache.stored_bytes < old_cache.statistics().written_bytes)
+
+    def test_expired_entries_removed_by_clean_up(self):
+        cache = get_tile_cache("test_clean_up_expired")
+        validators = {"etag": '"a"', "max_age": 0}
+        cache.put_many([((14, 1, 2), {"layer": {}}, None), ((14, 3, 4), {"layer": {}}, validators)])
+        _make_old(cache, (14, 1, 2), age_in_seconds=tile_cache.max_cache_age_minutes * 60 + 10)
+        _make_old(cache, (14, 3, 4), age_in_seconds=tile_cache.max_cache_age_minutes * 60 + 10)
+        clean_up_caches()
+        self.assertEqual(1, _count_entries(cache))
+        self.assertEqual(cache.stored_bytes, _sum_sizes(cache))
+
+    def test_unused_cache_removed_by_clean_up(self):
+        unused_cache = get_tile_cache("test_unused.namespace")
+        used_cache = get_tile_cache("test_used.namespace")
+        unused_cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        used_cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        unused_for = tile_cache._UNUSED_CACHE_MAX_AGE_SECONDS + 10
+        _make_old(unused_cache, (14, 1, 2), age_in_seconds=unused_for, column="accessed_at")
+        clean_up_caches()
+        self.assertFalse(os.path.isfile(unused_cache.path))
+        self.assertEqual(1, _count_entries(used_cache))
+        self.assertEqual(({}, {}), get_tile_cache("test_unused.namespace").get_many([(14, 1, 2)]))
+
+    def test_janitor_evicts_when_budget_exceeded(self):
+        cache = get_tile_cache("test_janitor")
+        set_cache_budgets(1, tile_cache.DEFAULT_MAX_TOTAL_BYTES)
+        cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        for _ in range(50):
+            if not cache.stored_bytes:
+                break
+            time.sleep(0.1)
+        self.assertEqual(0, _count_entries(cache))
+        self.assertEqual(1, cache.statistics().evictions)
+
+    def test_previous_schema_recreated(self):
+        path = os.path.join(get_cache_directory(), "test_previous_schema.sqlite")
+        os.makedirs(get_cache_directory(), exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, data BLOB)")
+        conn.commit()
+        conn.close()
+        cache = get_tile_cache("test_previous_schema")
+        cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        self.assertEqual(({(14, 1, 2): {"layer": {}}}, {}), cache.get_many([(14, 1, 2)]))
+
+    def test_get_entries(self):
+        cache = get_tile_cache("test_get_entries")
+        cache.put_many([((14, 1, 2), {"layer": {}}, {"etag": '"a"', "max_age": 60})])
+        entries, validators = cache.get_entries([(14, 1, 2)])
+        decoded_data, expires_at, stored_size = entries[(14, 1, 2)]
+        self.assertEqual({"layer": {}}, decoded_data)
+        self.assertAlmostEqual(time.time() + 60, expires_at, delta=5)
+        self.assertEqual(_sum_sizes(cache), stored_size)
+
+    def test_put_many_returns_stored_sizes(self):
+        cache = get_tile_cache("test_put_many_sizes")
+        stored_sizes = cache.put_many([((14, 1, 2), {"layer": {}}, None), ((14, 3, 4), {}, None)])
+        self.assertEqual({(14, 1, 2): _sum_sizes(cache)}, stored_sizes)
+
+    def test_refresh_entry(self):
+        cache = get_tile_cache("test_refresh_entry")
+        stored_sizes = cache.put_many([((14, 1, 2), {"layer": {}}, {"etag": '"a"', "max_age": 60})])
+        _make_old(cache, (14, 1, 2))
+        decoded_data, expires_at, stored_size = cache.refresh_entry((14, 1, 2), validators={"max_age": 120})
+        self.assertEqual({"layer": {}}, decoded_data)
+        self.assertAlmostEqual(time.time() + 120, expires_at, delta=5)
+        self.assertEqual(stored_sizes[(14, 1, 2)], stored_size)
+
+    def test_raw_cache(self):
+        cache = get_raw_tile_cache("test_raw")
+        cache.put_many([((14, 1, 2), b"\x1f\x8b raw", {"etag": '"a"', "max_age": 60})])
+        self.assertEqual(os.path.join(get_cache_directory(), "test_raw.raw.sqlite"), cache.path)
+        self.assertEqual(({(14, 1, 2): b"\x1f\x8b raw"}, {}), cache.get_many([(14, 1, 2)]))
+        self.assertEqual(len(b"\x1f\x8b raw"), _sum_sizes(cache))
+
+    def test_raw_cache_separate_from_decoded_cache(self):
+        decoded_cache = get_tile_cache("test_tiers")
+        raw_cache = get_raw_tile_cache("test_tiers")
+        decoded_cache.put_many([((14, 1, 2), {"layer": {}}, None)])
+        raw_cache.put_many([((14, 1, 2), b"raw", None)])
+        self.assertNotEqual(decoded_cache.path, raw_cache.path)
+        set_cache_budgets(1, 1, tier=TIER_RAW)
+        clean_up_caches()
+        self.assertEqual(0, _count_entries(raw_cache))
+        self.assertEqual(1, _count_entries(decoded_cache))
+
+    def test_memory_cache(self):
+        cache = MemoryTileCache(max_bytes=1024 * 1024)
+        cache.put(("source", 14, 1, 2), {"layer": {"a": 1}}, expires_at=time.time() + 60, stored_size=20)
+        self.assertEqual({("source", 14, 1, 2): {"layer": {"a": 1}}}, cache.get_many([("source", 14, 1, 2), ("a", 1)]))
+        statistics = cache.statistics()
+        self.assertEqual((1, 1), (statistics.hits, statistics.misses))
+        self.assertEqual(estimate_size(20), statistics.stored_bytes)
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        size = estimate_size(20)
+        cache = MemoryTileCache(max_bytes=2 * size)
+        expires_at = time.time() + 60
+        cache.put(1, {"layer": {"a": 1}}, expires_at, stored_size=20)
+        cache.put(2, {"layer": {"a": 2}}, expires_at, stored_size=20)
+        cache.get_many([1])
+        cache.put(3, {"layer": {"a": 3}}, expires_at, stored_size=20)
+        self.assertEqual([1, 3], sorted(cache.get_many([1, 2, 3])))
+        self.assertEqual((1, 2 * size), (cache.statistics().evictions, cache.stored_bytes))
+
+    def test_memory_cache_expired(self):
+        cache = MemoryTileCache(max_bytes=1024 * 1024)
+        cache.put(1, {"layer": {}}, expires_at=time.time() - 1, stored_size=20)
+        self.assertEqual({}, cache.get_many([1]))
+        self.assertEqual(0, cache.stored_bytes)
+
+    def test_memory_cache_cleared_with_cache(self):
+        get_memory_tile_cache().put(1, {"layer": {}}, expires_at=time.time() + 60, stored_size=20)
+        clear_cache()
+        self.assertEqual({}, get_memory_tile_cache().get_many([1]))
+
+
+def _make_old(cache, key, age_in_seconds=3600, column="stored_at"):
+    with cache._lock:
+        conn = cache._get_connection()
+        with conn:
+            conn.execute(
+                """UPDATE tiles SET {0} = {0} - ?
+                WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?""".format(column),
+                (age_in_seconds, *key),
+            )
+
+
+def _count_entries(cache):
+    with cache._lock:
+        return cache._get_connection().execute("SELECT count(*) FROM tiles").fetchone()[0]
+
+
+def _sum_sizes(cache):
+    with cache._lock:
+        return cache._get_connection().execute("SELECT total(size) FROM tiles").fetchone()[0]
+
+
+def suite():
+    s = unittest.makeSuite(TileCacheTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# This code is licensed under the GPL 2.0 license.
+#
+from qgis.testing import unittest
+import mock
+import os
+import shutil
+import sys
+import tempfile
+from plugin.util import tile_stats
+
+
+class TileStatsTests(unittest.TestCase):
+    """
+    Tests for the persisted statistics of the tiles of each zoom level
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "tiles.mbtiles")
+        with open(self.path, "wb") as f:
+            f.write(b"tiles")
+        self.stats_dir_patch = mock.patch.object(
+            tile_stats, "get_tile_stats_directory", return_value=os.path.join(self.temp_dir, "stats")
+        )
+        self.stats_dir_patch.start()
+        tile_stats._stats_by_path.clear()
+
+    def tearDown(self):
+        self.stats_dir_patch.stop()
+        tile_stats._stats_by_path.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_computed_once(self):
+        compute_func = mock.Mock(return_value={"nr_of_tiles": 3})
+        stats = tile_stats.get_tile_stats(self.path)
+        self.assertEqual({"nr_of_tiles": 3}, stats.get(14, compute_func))
+        self.assertEqual({"nr_of_tiles": 3}, tile_stats.get_tile_stats(self.path).get(14, compute_func))
+        compute_func.assert_called_once_with(14)
+
+    def test_persisted(self):
+        tile_stats.get_tile_stats(self.path).get(14, lambda zoom: {"nr_of_tiles": 3})
+        tile_stats._stats_by_path.clear()
+        compute_func = mock.Mock()
+        self.assertEqual({"nr_of_tiles": 3}, tile_stats.get_tile_stats(self.path).get(14, compute_func))
+        compute_func.assert_not_called()
+
+    def test_invalid_after_file_changed(self):
+        tile_stats.get_tile_stats(self.path).get(14, lambda zoom: {"nr_of_tiles": 3})
+        with open(self.path, "ab") as f:
+            f.write(b"more tiles")
+        tile_stats._stats_by_path.clear()
+        self.assertEqual(
+            {"nr_of_tiles": 5}, tile_stats.get_tile_stats(self.path).get(14, lambda zoom: {"nr_of_tiles": 5})
+        )
+
+    def test_failed_computation_not_stored(self):
+        stats = tile_stats.get_tile_stats(self.path)
+        self.assertIsNone(stats.get(14, lambda zoom: None))
+        self.assertEqual({"nr_of_tiles": 3}, stats.get(14, lambda zoom: {"nr_of_tiles": 3}))
+
+
+def suite():
+    s = unittest.makeSuite(TileStatsTests, "test")
+    return s
+
+
+# run all tests using unittest skipping nose or testplugin
+def run_all():
+    unittest.TextTestRunner(verbosity=3, stream=sys.stdout).run(suite())
+
+
+if __name__ == "__main__":
+    run_all()
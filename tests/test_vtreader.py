@@ -12,6 +12,7 @@ import mock
 import shutil
 from osgeo import gdal
 from plugin.util.file_helper import clear_cache, get_style_folder
+from plugin.util.tile_cache import TileCache
 from plugin.util.tile_helper import Bounds
 from qgis.core import QgsProject
 from PyQt5.QtWidgets import QApplication
@@ -77,7 +78,7 @@ class VtReaderTests(unittest.TestCase):
         QgsProject.instance().removeAllMapLayers()
         clear_cache()
 
-        self._load(iface=iface, max_tiles=2, serial_tile_processing_limit=1)
+        self._load(iface=iface, max_tiles=2, decode_in_parallel=True)
 
         print(mock_info.call_args_list)
         mock_info.assert_any_call("Native decoding supported!!! ({}, {}bit)", "Linux", "64")
@@ -161,14 +162,42 @@ class VtReaderTests(unittest.TestCase):
         mock_info.assert_any_call("Native decoding not supported. ({}, {}bit)", "Linux", "64")
         mock_info.assert_any_call("Import complete")
 
+    @mock.patch("plugin.vt_reader.info")
+    @mock.patch("plugin.vt_reader.critical")
+    def test_load_from_vtreader_8_from_memory(self, mock_critical, mock_info):
+        global iface
+        clear_cache()
+        self._load(iface=iface, max_tiles=10)
+        with mock.patch.object(TileCache, "get_entries") as mock_get_entries:
+            self._load(iface=iface, max_tiles=10)
+        print(mock_critical.call_args_list)
+        mock_get_entries.assert_not_called()
+        mock_info.assert_any_call("{} tiles in cache. Max. {} will be loaded additionally.", 6, 0)
+        mock_info.assert_any_call("Import complete")
+
+    @mock.patch("plugin.vt_reader.info")
+    @mock.patch("plugin.vt_reader.critical")
+    def test_load_from_vtreader_9_cache_kept_when_inspection_mode_toggled(self, mock_critical, mock_info):
+        global iface
+        clear_cache()
+        self._load(iface=iface, max_tiles=10)
+        self._load(iface=iface, max_tiles=10, inspection_mode=True)
+        mock_info.assert_any_call("{} tiles in cache. Max. {} will be loaded additionally.", 0, 6)
+        mock_info.reset_mock()
+        self._load(iface=iface, max_tiles=10)
+        print(mock_critical.call_args_list)
+        mock_info.assert_any_call("{} tiles in cache. Max. {} will be loaded additionally.", 6, 0)
+        mock_info.assert_any_call("Import complete")
+
     def _load(
         self,
         iface,
         max_tiles: int,
-        serial_tile_processing_limit: int = None,
+        decode_in_parallel: bool = False,
         merge_tiles: bool = False,
         clip_tiles: bool = False,
         apply_styles: bool = False,
+        inspection_mode: bool = False,
     ):
         conn = copy.deepcopy(MBTILES_CONNECTION_TEMPLATE)
         gdal.PushErrorHandler("CPLQuietErrorHandler")
@@ -182,12 +211,13 @@ class VtReaderTests(unittest.TestCase):
             max_tiles=max_tiles,
             layer_filter=["landcover", "place", "water_name"],
             apply_styles=apply_styles,
+            is_inspection_mode=inspection_mode,
         )
 
         reader._loading_options["zoom_level"] = 14
         reader._loading_options["bounds"] = bounds
-        if serial_tile_processing_limit:
-            reader._nr_tiles_to_process_serial = serial_tile_processing_limit
+        if decode_in_parallel:
+            reader._decode_scheduler.dispatch_overhead_seconds = 0
         reader._load_tiles()
         for _ in range(1, 100):
             time.sleep(0.01)